@@ -1,14 +1,106 @@
-import requests
+import argparse
 import asyncio
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
-from langchain_community.utilities.dalle_image_generator import DallEAPIWrapper
+from pathlib import Path
 import os
 
+from graph.workflow import create_workflow_graph
+from tools.image_tools import agenerate_image_url
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools
+from tools.mcp_pool import MCPSessionPool
+from tools.pinata import PinataClient
+from tools.story_api import StoryAPIClient, StoryAPIError
+from utils.helpers import (
+    ainput,
+    create_config,
+    create_memory_saver,
+    process_user_input,
+)
+from utils.interrupts import COMPLETED, ConsoleResponder, InterruptDispatcher
+from utils.speculation import Prefetcher
+
 # Carga las variables de entorno desde el archivo .env
 load_dotenv(dotenv_path="/Users/lucascapdevila/LANGGRAPH-MCP-AGENT/.env")
 print("OPENAI_API_KEY cargada correctamente" if os.getenv('OPENAI_API_KEY') else "OPENAI_API_KEY no encontrada")
 
-async def run_agent():
+
+async def upload_image(client, image_url, pinata_client=None):
+    """Upload an image to IPFS and return its URI.
+
+    A cached image's file:// URL is pinned from its bytes through Pinata;
+    the Story API only fetches http(s) URLs.
+    """
+    if image_url.startswith("file://"):
+        if pinata_client is None:
+            raise ValueError(
+                f"Cannot upload local image {image_url} without PINATA_JWT"
+            )
+        path = Path(image_url[len("file://") :])
+        data = await asyncio.to_thread(path.read_bytes)
+        return await pinata_client.pin_bytes(data, f"{path.name}.png", "image/png")
+
+    upload_data = await client.upload_image_to_ipfs(image_url)
+    return upload_data.get("ipfs_uri")
+
+
+async def mint_image(client, image_url, pinata_client=None):
+    """Upload an image, register it as an IP asset and mint its license tokens."""
+    try:
+        # Step 2: Upload the image to IPFS
+        print("Uploading image to IPFS...")
+        ipfs_uri = await upload_image(client, image_url, pinata_client)
+        print(f"Image uploaded to IPFS: {ipfs_uri}")
+
+        # Step 3: Create IP metadata
+        print("Creating IP metadata...")
+        metadata_data = await client.create_ip_metadata(
+            image_uri=ipfs_uri,
+            name="Futuristic Cityscape",
+            description="A futuristic cityscape generated by DALL-E",
+            attributes=[],
+        )
+        registration_metadata = metadata_data.get("registration_metadata")
+        print(f"Metadata created: {registration_metadata}")
+
+        # Step 4: Mint and register IP with terms
+        print("Minting and registering IP asset...")
+        mint_payload = {
+            "commercial_rev_share": 20,
+            "derivatives_allowed": True,
+            "registration_metadata": registration_metadata
+        }
+        print(f"Sending mint request with payload: {mint_payload}")
+        mint_data = await client.mint_and_register_ip_with_terms(**mint_payload)
+        print(f"Mint response body: {mint_data}")
+        ip_id = mint_data.get("ip_id")
+        license_terms_ids = mint_data.get("license_terms_ids")
+        if not ip_id or not license_terms_ids:
+            print(f"Error: Mint response missing required fields - ip_id: {ip_id}, license_terms_ids: {license_terms_ids}")
+            return None
+        print(f"IP Asset minted: {ip_id}, License Terms IDs: {license_terms_ids}")
+
+        # Step 5: Mint license tokens
+        print("Minting license tokens...")
+        license_data = await client.mint_license_tokens(
+            licensor_ip_id=ip_id, license_terms_id=license_terms_ids[0]
+        )
+        print(f"License response body: {license_data}")
+        license_token_ids = license_data.get("license_token_ids")
+        print(f"License tokens minted: {license_token_ids}")
+    except StoryAPIError as e:
+        print(f"Error calling {e.endpoint}: {e.body}")
+        return None
+
+    return {
+        "ipfs_uri": ipfs_uri,
+        "ip_id": ip_id,
+        "license_terms_ids": license_terms_ids,
+        "license_token_ids": license_token_ids,
+    }
+
+
+async def run_agent(client=None):
     """Run a simplified Story IP Creator agent."""
     print("\n=== Story IP Creator ===")
     print(
@@ -23,87 +115,80 @@ async def run_agent():
     print(f'"{image_prompt}"')
     print("\nStarting the creation process...\n")
 
+    # Cached images can only be reused from disk when they are pinned here
+    pinata_client = PinataClient() if os.getenv("PINATA_JWT") else None
+
     # Step 1: Generate the image using DALL-E
     print("Generating image with DALL-E...")
-    dalle = DallEAPIWrapper()
-    image_url = dalle.run(image_prompt)
+    image_url = await agenerate_image_url(
+        image_prompt, model="dall-e-2", local=pinata_client is not None
+    )
     print(f"Image generated: {image_url}")
 
-    # Step 2: Upload the image to IPFS
-    print("Uploading image to IPFS...")
-    response = requests.post(
-        "http://127.0.0.1:8000/upload_image_to_ipfs",
-        json={"image_data": image_url}
-    )
-    if response.status_code != 200:
-        print(f"Error uploading to IPFS: {response.json()}")
-        return
-    ipfs_uri = response.json().get("ipfs_uri")
-    print(f"Image uploaded to IPFS: {ipfs_uri}")
-
-    # Step 3: Create IP metadata
-    print("Creating IP metadata...")
-    metadata_response = requests.post(
-        "http://127.0.0.1:8000/create_ip_metadata",
-        json={
-            "image_uri": ipfs_uri,
-            "name": "Futuristic Cityscape",
-            "description": "A futuristic cityscape generated by DALL-E",
-            "attributes": []
-        }
-    )
-    if metadata_response.status_code != 200:
-        print(f"Error creating metadata: {metadata_response.json()}")
-        return
-    registration_metadata = metadata_response.json().get("registration_metadata")
-    print(f"Metadata created: {registration_metadata}")
-
-    # Step 4: Mint and register IP with terms
-    print("Minting and registering IP asset...")
-    mint_payload = {
-        "commercial_rev_share": 20,
-        "derivatives_allowed": True,
-        "registration_metadata": registration_metadata
-    }
-    print(f"Sending mint request with payload: {mint_payload}")
-    mint_response = requests.post(
-        "http://127.0.0.1:8000/mint_and_register_ip_with_terms",
-        json=mint_payload
-    )
-    print(f"Mint response status: {mint_response.status_code}")
-    print(f"Mint response body: {mint_response.json()}")
-    if mint_response.status_code != 200:
-        print(f"Error minting IP: {mint_response.json()}")
-        return
-    mint_data = mint_response.json()
-    ip_id = mint_data.get("ip_id")
-    license_terms_ids = mint_data.get("license_terms_ids")
-    if not ip_id or not license_terms_ids:
-        print(f"Error: Mint response missing required fields - ip_id: {ip_id}, license_terms_ids: {license_terms_ids}")
+    try:
+        if client is None:
+            async with StoryAPIClient() as client:
+                result = await mint_image(client, image_url, pinata_client)
+        else:
+            result = await mint_image(client, image_url, pinata_client)
+    finally:
+        if pinata_client is not None:
+            await pinata_client.aclose()
+
+    if result is None:
         return
-    print(f"IP Asset minted: {ip_id}, License Terms IDs: {license_terms_ids}")
 
-    # Step 5: Mint license tokens
-    print("Minting license tokens...")
-    license_payload = {
-        "licensor_ip_id": ip_id,
-        "license_terms_id": license_terms_ids[0]
-    }
-    license_response = requests.post(
-        "http://127.0.0.1:8000/mint_license_tokens",
-        json=license_payload
+    print("\n=== Process Complete ===")
+    print("Your IP has been successfully created and registered with Story!")
+    print("Thank you for using the Story IP Creation Agent.")
+
+
+async def run_workflow():
+    """Run the LangGraph workflow, asking its review and terms questions on
+    the terminal."""
+    print("\n=== Story IP Creator ===")
+    image_prompt = await ainput(
+        "What image would you like to create? (e.g., 'an anime style image of a person snowboarding'): "
     )
-    print(f"License response status: {license_response.status_code}")
-    print(f"License response body: {license_response.json()}")
-    if license_response.status_code != 200:
-        print(f"Error minting license tokens: {license_response.json()}")
+
+    async with AsyncExitStack() as stack:
+        pool = await stack.enter_async_context(MCPSessionPool(size=1))
+        memory = stack.enter_context(create_memory_saver())
+        prefetcher = Prefetcher()
+        graph = create_workflow_graph(
+            get_specific_tools(await get_ipfs_tools(pool)),
+            memory=memory,
+            prefetcher=prefetcher,
+        )
+        dispatcher = await stack.enter_async_context(
+            InterruptDispatcher(graph, ConsoleResponder(), prefetcher=prefetcher)
+        )
+        run = dispatcher.submit(process_user_input(image_prompt), create_config())
+        run = await dispatcher.wait(run.thread_id)
+
+    if run.status != COMPLETED:
+        print(f"\nThe workflow stopped: {run.error or run.status}")
         return
-    license_token_ids = license_response.json().get("license_token_ids")
-    print(f"License tokens minted: {license_token_ids}")
 
     print("\n=== Process Complete ===")
     print("Your IP has been successfully created and registered with Story!")
-    print("Thank you for using the Story IP Creation Agent.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Create an image and mint it as an IP asset on Story."
+    )
+    parser.add_argument(
+        "--workflow",
+        action="store_true",
+        help="Run the LangGraph workflow, with image review and terms "
+        "negotiation, instead of the Story API pipeline",
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    asyncio.run(run_agent())
\ No newline at end of file
+    if parse_args().workflow:
+        asyncio.run(run_workflow())
+    else:
+        asyncio.run(run_agent())
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from graph.workflow import create_workflow_graph
+from nodes.metadata import metadata_parse_stats
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools
+from tools.mcp_pool import MCPSessionPool
+from tools.signer_pool import SignerPool
+from utils.batch import load_manifest, run_batch
+from utils.chain import ChainClient
+from utils.helpers import create_memory_saver
+from utils.llm_cache import DiskLLMCache
+from utils.metrics import node_metrics
+from utils.nonces import nonce_manager_from_env
+from utils.workers import run_sharded_batch
+
+load_dotenv()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Create and mint IP assets for every prompt in a manifest."
+    )
+    parser.add_argument("manifest", help="JSONL or CSV file with a 'prompt' column")
+    parser.add_argument(
+        "--output", default="batch_results.jsonl", help="JSONL file for results"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Maximum threads in flight"
+    )
+    parser.add_argument(
+        "--mcp-sessions",
+        type=int,
+        default=4,
+        help="Number of warm story-sdk MCP server processes",
+    )
+    parser.add_argument(
+        "--sessions-per-signer",
+        type=int,
+        default=2,
+        help="MCP server processes per key when WALLET_PRIVATE_KEYS is set",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Image variants generated per review round",
+    )
+    parser.add_argument(
+        "--rev-share",
+        type=int,
+        default=None,
+        help="Commercial revenue share for rows that do not set one "
+        "(default: decided by the term rules)",
+    )
+    parser.add_argument(
+        "--no-derivatives",
+        action="store_true",
+        help="Disallow derivative works for rows that do not set it "
+        "(default: decided by the term rules)",
+    )
+    parser.add_argument(
+        "--no-auto-approve",
+        action="store_true",
+        help="Park threads at image review instead of approving them",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, each with its own graph and MCP sessions; "
+        "--concurrency and --mcp-sessions apply per worker",
+    )
+    parser.add_argument(
+        "--metrics-output",
+        default="batch_metrics.json",
+        help="JSON file for the per-node latency and token summary",
+    )
+    parser.add_argument(
+        "--prometheus-output",
+        default=None,
+        help="Also write the node metrics in the Prometheus text format",
+    )
+    parser.add_argument(
+        "--keep-checkpoints",
+        action="store_true",
+        help="Keep the checkpoints of finished threads (default: deleted)",
+    )
+    return parser.parse_args()
+
+
+def report_metrics(args):
+    """Write the node metrics and print their p50/p95."""
+    summary = node_metrics.summary()
+    node_metrics.write_summary(args.metrics_output)
+    if args.prometheus_output:
+        Path(args.prometheus_output).write_text(
+            node_metrics.prometheus(), encoding="utf-8"
+        )
+
+    print(f"\n{'':<38}{'calls':>7}{'p50 s':>9}{'p95 s':>9}{'tokens':>9}")
+    for name, node in summary["nodes"].items():
+        tokens = node["prompt_tokens"] + node["completion_tokens"]
+        print(
+            f"{name:<38}{node['calls']:>7}{node['seconds']['p50']:>9.3f}"
+            f"{node['seconds']['p95']:>9.3f}{tokens:>9}"
+        )
+    for name, tool in summary["tools"].items():
+        print(
+            f"{'tool ' + name:<38}{tool['calls']:>7}{tool['seconds']['p50']:>9.3f}"
+            f"{tool['seconds']['p95']:>9.3f}{'':>9}"
+        )
+    print(f"Node metrics: {args.metrics_output}")
+
+
+async def run_workers(args, rows, defaults):
+    """Shard the manifest over worker processes."""
+    print(f"\n=== Story IP Batch: {len(rows)} prompts on {args.workers} workers ===\n")
+    started = time.perf_counter()
+    results = await run_sharded_batch(
+        rows,
+        args.output,
+        workers=args.workers,
+        options={
+            "concurrency": args.concurrency,
+            "mcp_sessions": args.mcp_sessions,
+            "sessions_per_signer": args.sessions_per_signer,
+            "candidates": args.candidates,
+            "defaults": defaults,
+            "prune_finished": not args.keep_checkpoints,
+        },
+    )
+    completed = sum(1 for r in results if r["status"] == "completed")
+    print(f"\n=== Batch Complete in {time.perf_counter() - started:.1f}s ===")
+    print(f"{completed}/{len(results)} IP assets minted. Results: {args.output}")
+    report_metrics(args)
+
+
+async def main():
+    args = parse_args()
+    rows = load_manifest(args.manifest)
+
+    defaults = {
+        "auto_approve": not args.no_auto_approve,
+        "commercial_rev_share": args.rev_share,
+        "derivatives_allowed": False if args.no_derivatives else None,
+    }
+
+    if args.workers > 1:
+        await run_workers(args, rows, defaults)
+        return
+
+    llm_cache = DiskLLMCache()
+    chain = ChainClient.from_env()
+    # At most one mint per session holds an unsent nonce
+    nonces = nonce_manager_from_env(chain, max_in_flight=args.mcp_sessions)
+    async with AsyncExitStack() as stack:
+        if nonces is not None:
+            # Stops the gap watcher however the batch ends
+            stack.push_async_callback(nonces.close)
+        pool = await stack.enter_async_context(MCPSessionPool(size=args.mcp_sessions))
+        # Parked threads are checkpointed to SQLite and survive a restart
+        memory = stack.enter_context(create_memory_saver())
+        # Mints are spread over every key in WALLET_PRIVATE_KEYS, if set
+        signers = SignerPool.from_env(
+            chain, sessions_per_signer=args.sessions_per_signer
+        )
+        if signers is not None:
+            await stack.enter_async_context(signers)
+            print(f"Minting from {len(signers.signers)} signers")
+
+        ipfs_tools = await get_ipfs_tools(pool)
+        graph = create_workflow_graph(
+            get_specific_tools(ipfs_tools),
+            memory=memory,
+            num_candidates=args.candidates,
+            llm_cache=llm_cache,
+            negotiation="rules",
+            chain=chain,
+            nonces=nonces,
+            signers=signers,
+        )
+
+        print(f"\n=== Story IP Batch: {len(rows)} prompts, concurrency {args.concurrency} ===\n")
+        started = time.perf_counter()
+        results = await run_batch(
+            graph,
+            rows,
+            args.output,
+            concurrency=args.concurrency,
+            defaults=defaults,
+            prune_finished=not args.keep_checkpoints,
+        )
+
+    completed = sum(1 for r in results if r["status"] == "completed")
+    print(f"\n=== Batch Complete in {time.perf_counter() - started:.1f}s ===")
+    print(f"{completed}/{len(results)} IP assets minted. Results: {args.output}")
+
+    stats = llm_cache.stats()
+    print(
+        f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"(hit ratio {stats['hit_ratio']:.0%}, {stats['entries']} entries)"
+    )
+
+    parse = metadata_parse_stats.summary()
+    print(
+        f"Metadata drafts: {parse['complete']}/{parse['drafts']} matched the schema "
+        f"({parse['partial']} cut off, {parse['fallback']} plain text)"
+    )
+    report_metrics(args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
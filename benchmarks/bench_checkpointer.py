@@ -0,0 +1,208 @@
+"""Resident memory of MemorySaver vs SQLiteCheckpointer over many threads.
+
+Every thread runs a small graph on the workflow State: a few regeneration
+rounds append messages of --message-bytes each, an image review interrupt is
+answered, then minting outputs are written. Each checkpointer runs in its
+own process, which reports its RSS every --report-every threads. With the
+SQLiteCheckpointer, finished threads are deleted as the batch runner does.
+
+The restart check parks --parked threads at the review interrupt in one
+process, which exits without closing the checkpointer, and resumes them
+from the same database in a fresh process.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.graph import END, START, StateGraph  # noqa: E402
+from langgraph.types import Command, interrupt  # noqa: E402
+
+from models.state import State  # noqa: E402
+from utils.checkpointer import SQLiteCheckpointer  # noqa: E402
+
+CHECKPOINTERS = ("memory", "sqlite")
+# Options passed on to the child processes
+FORWARDED = ("threads", "rounds", "message_bytes", "report_every", "parked")
+
+
+def rss_mib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def build_graph(checkpointer, rounds, message_bytes):
+    def generate(state):
+        attempt = len(state["messages"])
+        return {
+            "messages": [
+                AIMessage(content=f"attempt {attempt} " + "x" * message_bytes),
+                HumanMessage(content="feedback: brighter colors"),
+            ],
+            "image_urls": [f"https://example.com/{uuid.uuid4().hex}.png"],
+        }
+
+    def review(state):
+        if len(state["messages"]) < 1 + 2 * rounds:
+            return {}
+        answer = interrupt({"image_url": state["image_urls"][0]})
+        return {"image_url": state["image_urls"][0], "terms": answer}
+
+    def mint(state):
+        return {"minting_data": {"ip_id": "0x" + uuid.uuid4().hex, "tx_hash": "ab"}}
+
+    workflow = StateGraph(State)
+    workflow.add_node("generate", generate)
+    workflow.add_node("review", review)
+    workflow.add_node("mint", mint)
+    workflow.add_edge(START, "generate")
+    workflow.add_edge("generate", "review")
+    workflow.add_conditional_edges(
+        "review", lambda s: "mint" if s.get("terms") else "generate"
+    )
+    workflow.add_edge("mint", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def new_checkpointer(kind, path):
+    return MemorySaver() if kind == "memory" else SQLiteCheckpointer(path)
+
+
+async def start_thread(graph, thread_id):
+    config = {"configurable": {"thread_id": thread_id}}
+    await graph.ainvoke({"messages": [HumanMessage(content="Generate a fox")]}, config)
+    return config
+
+
+async def run_threads(args):
+    checkpointer = new_checkpointer(args.child, args.db)
+    graph = build_graph(checkpointer, args.rounds, args.message_bytes)
+    samples = [(0, round(rss_mib(), 1))]
+    started = time.perf_counter()
+    for done in range(1, args.threads + 1):
+        config = await start_thread(graph, str(uuid.uuid4()))
+        await graph.ainvoke(Command(resume={"commercial_rev_share": 15}), config)
+        if args.child == "sqlite":
+            await checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        if done % args.report_every == 0:
+            samples.append((done, round(rss_mib(), 1)))
+    return {
+        "rss": samples,
+        "threads per second": round(args.threads / (time.perf_counter() - started)),
+    }
+
+
+async def park_threads(args):
+    graph = build_graph(SQLiteCheckpointer(args.db), args.rounds, args.message_bytes)
+    thread_ids = [str(uuid.uuid4()) for _ in range(args.parked)]
+    for thread_id in thread_ids:
+        await start_thread(graph, thread_id)
+    # Exit as a crash would: no close(), nothing flushed on the way out
+    print(json.dumps({"thread_ids": thread_ids}), flush=True)
+    os._exit(0)
+
+
+async def resume_threads(args):
+    graph = build_graph(SQLiteCheckpointer(args.db), args.rounds, args.message_bytes)
+    thread_ids = json.loads(args.thread_ids)
+    parked = resumed = 0
+    for thread_id in thread_ids:
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = await graph.aget_state(config)
+        # The locked langgraph only lists interrupts per task
+        if any(task.interrupts for task in snapshot.tasks):
+            parked += 1
+            await graph.ainvoke(Command(resume={"commercial_rev_share": 15}), config)
+            snapshot = await graph.aget_state(config)
+            resumed += bool((snapshot.values.get("minting_data") or {}).get("ip_id"))
+    return {"found parked": parked, "resumed to mint": resumed}
+
+
+def child(mode, args, extra=()):
+    """Run this script in a fresh process and return its JSON result."""
+    forwarded = [
+        f"--{name.replace('_', '-')}={getattr(args, name)}" for name in FORWARDED
+    ]
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--db", args.db]
+        + forwarded
+        + list(extra),
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--message-bytes", type=int, default=2000)
+    parser.add_argument("--report-every", type=int, default=500)
+    parser.add_argument("--parked", type=int, default=50)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--thread-ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child in CHECKPOINTERS:
+        print(json.dumps(asyncio.run(run_threads(args))))
+        return
+    if args.child == "park":
+        asyncio.run(park_threads(args))
+        return
+    if args.child == "resume":
+        print(json.dumps(asyncio.run(resume_threads(args))))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_checkpointer_")
+    results = {}
+    for kind in CHECKPOINTERS:
+        args.db = os.path.join(workdir, f"{kind}.sqlite")
+        results[kind] = child(kind, args)
+
+    print(
+        f"\n{args.threads} threads, {args.rounds} review rounds each, "
+        f"{args.message_bytes}-byte messages: RSS in MiB"
+    )
+    print(f"{'threads':<12}" + "".join(f"{k:>10}" for k in CHECKPOINTERS))
+    for index, (done, _) in enumerate(results["memory"]["rss"]):
+        print(
+            f"{done:<12}"
+            + "".join(f"{results[k]['rss'][index][1]:>10}" for k in CHECKPOINTERS)
+        )
+    print(
+        f"{'threads/s':<12}"
+        + "".join(f"{results[k]['threads per second']:>10}" for k in CHECKPOINTERS)
+    )
+    size = os.path.getsize(os.path.join(workdir, "sqlite.sqlite"))
+    print(f"SQLite file after the run: {size / 1024:.0f} KiB")
+
+    args.db = os.path.join(workdir, "restart.sqlite")
+    parked = child("park", args)
+    restart = child(
+        "resume", args, [f"--thread-ids={json.dumps(parked['thread_ids'])}"]
+    )
+    print(
+        f"\nRestart: parked {args.parked} threads and exited without closing; "
+        f"the next process found {restart['found parked']} parked and resumed "
+        f"{restart['resumed to mint']} to the mint"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Hundreds of threads at review interrupts: recursive resumes vs the
+InterruptDispatcher.
+
+Every thread goes through --rounds image reviews, each answered by a
+simulated reviewer who takes --think-seconds. "recursive" answers the way
+the old helpers.handle_interrupt did: blocking for the answer inside the
+coroutine, then resuming by calling the event loop function again from
+within itself. "dispatcher" parks every interrupt on an InterruptDispatcher
+without a responder and a reviewer task resumes them, each answer awaited
+without blocking.
+
+Reported: wall time, the longest event loop stall (a ticker measures how
+late its 10 ms sleeps wake up), the deepest Python stack seen when an
+answer is given, and how many threads were parked at once.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.graph import END, START, StateGraph  # noqa: E402
+from langgraph.types import Command, interrupt  # noqa: E402
+
+from models.state import State  # noqa: E402
+from utils.interrupts import PARKED, InterruptDispatcher  # noqa: E402
+
+MODES = ("recursive", "dispatcher")
+TICK_SECONDS = 0.01
+
+
+def build_graph(rounds):
+    def generate(state):
+        return {
+            "messages": [AIMessage(content=f"image {len(state['messages'])}")],
+            "image_urls": [f"https://example.com/{uuid.uuid4().hex}.png"],
+        }
+
+    def review(state):
+        answer = interrupt({"image_url": state["image_urls"][0]})
+        if len(state["messages"]) < 2 * rounds:
+            return {"messages": [HumanMessage(content=answer["data"])]}
+        return {"image_url": state["image_urls"][0]}
+
+    workflow = StateGraph(State)
+    workflow.add_node("generate", generate)
+    workflow.add_node("review", review)
+    workflow.add_edge(START, "generate")
+    workflow.add_edge("generate", "review")
+    workflow.add_conditional_edges(
+        "review", lambda s: END if s.get("image_url") else "generate"
+    )
+    return workflow.compile(checkpointer=MemorySaver())
+
+
+def stack_depth():
+    depth, frame = 0, sys._getframe()
+    while frame is not None:
+        depth, frame = depth + 1, frame.f_back
+    return depth
+
+
+def answer(rounds_done):
+    return {"action": "feedback", "data": f"try again ({rounds_done})"}
+
+
+async def ticker(stats, stop):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        late = time.perf_counter() - before - TICK_SECONDS
+        stats["max stall ms"] = max(stats["max stall ms"], round(late * 1000, 1))
+
+
+async def run_recursive(graph, thread_ids, args, stats):
+    async def run_thread(thread_id):
+        config = {"configurable": {"thread_id": thread_id}}
+        rounds = 0
+
+        async def process_events(command):
+            nonlocal rounds
+            interrupted = False
+            async for event in graph.astream(command, config, stream_mode="updates"):
+                interrupted = interrupted or "__interrupt__" in event
+            if interrupted:
+                stats["max stack depth"] = max(stats["max stack depth"], stack_depth())
+                time.sleep(args.think_seconds)  # input() blocks the loop
+                rounds += 1
+                await process_events(Command(resume=answer(rounds)))
+
+        await process_events({"messages": [HumanMessage(content="Generate a fox")]})
+
+    await asyncio.gather(*(run_thread(thread_id) for thread_id in thread_ids))
+
+
+async def run_dispatcher(graph, thread_ids, args, stats):
+    async with InterruptDispatcher(graph) as dispatcher:
+        rounds = {thread_id: 0 for thread_id in thread_ids}
+
+        async def review(thread_id):
+            await asyncio.sleep(args.think_seconds)
+            stats["max stack depth"] = max(stats["max stack depth"], stack_depth())
+            rounds[thread_id] += 1
+            dispatcher.resume(thread_id, answer(rounds[thread_id]))
+            return await dispatcher.wait(thread_id)
+
+        runs = [
+            dispatcher.submit(
+                {"messages": [HumanMessage(content="Generate a fox")]},
+                {"configurable": {"thread_id": thread_id}},
+            )
+            for thread_id in thread_ids
+        ]
+        await asyncio.gather(*(dispatcher.wait(run.thread_id) for run in runs))
+        while parked := [run for run in runs if run.status == PARKED]:
+            stats["max parked at once"] = max(stats["max parked at once"], len(parked))
+            await asyncio.gather(*(review(run.thread_id) for run in parked))
+
+
+async def bench(mode, args):
+    graph = build_graph(args.rounds)
+    thread_ids = [str(uuid.uuid4()) for _ in range(args.threads)]
+    stats = {"max stall ms": 0.0, "max stack depth": 0, "max parked at once": 0}
+    stop = asyncio.Event()
+    ticks = asyncio.create_task(ticker(stats, stop))
+    started = time.perf_counter()
+    if mode == "recursive":
+        await run_recursive(graph, thread_ids, args, stats)
+    else:
+        await run_dispatcher(graph, thread_ids, args, stats)
+    wall = time.perf_counter() - started
+    stop.set()
+    await ticks
+
+    finished = 0
+    for thread_id in thread_ids:
+        snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+        finished += bool(snapshot.values.get("image_url")) and not snapshot.next
+    return {"wall seconds": round(wall, 2), "threads finished": finished, **stats}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--think-seconds", type=float, default=0.01)
+    args = parser.parse_args()
+
+    results = {mode: await bench(mode, args) for mode in MODES}
+
+    print(
+        f"\n{args.threads} threads, {args.rounds} reviews each, "
+        f"{args.think_seconds} s per answer"
+    )
+    print(f"{'':<20}" + "".join(f"{m:>12}" for m in MODES))
+    for key in results[MODES[0]]:
+        print(f"{key:<20}" + "".join(f"{results[m][key]:>12}" for m in MODES))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
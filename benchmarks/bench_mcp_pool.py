@@ -0,0 +1,101 @@
+"""Compare MCP tool-call latency: a fresh server per call versus a warm pool.
+
+Runs against benchmarks/standins/story_mcp_server.py by default. Pass
+--server-args to point it at the real story-sdk-mcp server instead.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.mcp_pool import MCPSession, MCPSessionPool  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+
+
+def summarize(label, latencies, wall):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{label:<16} calls={len(latencies):<5} wall={wall:7.2f}s "
+        f"p50={statistics.median(latencies) * 1000:8.1f}ms p95={p95 * 1000:8.1f}ms"
+    )
+
+
+async def spawn_per_call(args, env, calls, concurrency):
+    """Today's behaviour: every call pays for a fresh server process."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            session = MCPSession(i, sys.executable, args, env=env)
+            await session.start()
+            try:
+                await session.call_tool(
+                    "upload_image_to_ipfs", {"image_data": f"https://example/{i}.png"}
+                )
+            finally:
+                await session.close()
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(calls)))
+    return latencies, time.perf_counter() - started
+
+
+async def pooled(args, env, calls, concurrency, size):
+    """Calls dispatched across a pool of warm sessions."""
+    async with MCPSessionPool(
+        size=size, command=sys.executable, args=args, env=env
+    ) as pool:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await pool.call_tool(
+                    "upload_image_to_ipfs", image_data=f"https://example/{i}.png"
+                )
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(calls)))
+        return latencies, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--server-args", nargs="+", default=[STANDIN_SERVER])
+    parser.add_argument(
+        "--startup-delay",
+        default="0.5",
+        help="Simulated SDK import time for the stand-in server (seconds)",
+    )
+    args = parser.parse_args()
+
+    env = {**os.environ, "STANDIN_STARTUP_DELAY": args.startup_delay}
+
+    latencies, wall = await spawn_per_call(
+        args.server_args, env, args.calls, args.concurrency
+    )
+    summarize("spawn-per-call", latencies, wall)
+
+    latencies, wall = await pooled(
+        args.server_args, env, args.calls, args.concurrency, args.pool_size
+    )
+    summarize(f"pool(size={args.pool_size})", latencies, wall)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
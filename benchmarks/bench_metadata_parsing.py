@@ -0,0 +1,167 @@
+"""Parse-failure rate of metadata drafts: free-text replies vs the schema tool call.
+
+Replays a corpus of reply shapes that the free-text prompt gets back from
+chat models (fenced JSON, prose around the object, trailing commas, Python
+style quotes, replies cut off at the token limit, ...). The same drafts are
+then streamed as IPMetadata tool-call arguments through MetadataStream, the
+way strict tool calling returns them: always valid JSON, unless the reply is
+cut off.
+
+A draft counts as a failure when any of name, description or attributes
+falls back to the defaults.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessageChunk  # noqa: E402
+from langchain_core.outputs import ChatGenerationChunk  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from nodes.metadata import (  # noqa: E402
+    DEFAULT_ATTRIBUTES,
+    DEFAULT_DESCRIPTION,
+    DEFAULT_NAME,
+    MetadataStream,
+    ParseStats,
+    metadata_from_response,
+    parse_metadata_draft,
+)
+import nodes.metadata  # noqa: E402
+
+
+def draft(i):
+    return {
+        "name": f"Lantern Harbor {i}",
+        "description": f"A quiet harbor at dusk, lanterns reflecting on the water ({i})",
+        "attributes": [
+            {"trait_type": "style", "value": "watercolor"},
+            {"trait_type": "mood", "value": "calm"},
+            {"trait_type": "setting", "value": "harbor"},
+        ],
+    }
+
+
+def cut(text):
+    return text[: int(len(text) * 0.7)]
+
+
+# Reply shape -> (relative frequency, renders a draft as free text, cut off)
+SHAPES = {
+    "bare json": (40, lambda d: json.dumps(d, indent=2), False),
+    "fenced json": (20, lambda d: f"```json\n{json.dumps(d, indent=2)}\n```", False),
+    "prose around": (
+        10,
+        lambda d: f"Here is the metadata:\n{json.dumps(d)}\nLet me know if you want changes.",
+        False,
+    ),
+    "braces in note": (
+        6,
+        lambda d: f"{json.dumps(d)}\n\nNote: swap {{style}} for your own trait.",
+        False,
+    ),
+    "trailing comma": (
+        6,
+        lambda d: json.dumps(d, indent=2)[:-2] + ",\n}",
+        False,
+    ),
+    "python quotes": (4, lambda d: repr(d), False),
+    "attributes as object": (
+        4,
+        lambda d: json.dumps(
+            {**d, "attributes": {a["trait_type"]: a["value"] for a in d["attributes"]}}
+        ),
+        False,
+    ),
+    "cut off": (4, lambda d: cut(json.dumps(d)), True),
+}
+
+
+def failed(metadata):
+    return (
+        metadata["name"] == DEFAULT_NAME
+        or metadata["description"] == DEFAULT_DESCRIPTION
+        or metadata["attributes"] == DEFAULT_ATTRIBUTES
+    )
+
+
+async def stream_tool_call(draft_dict, truncated, pieces=12):
+    """Feed a draft to MetadataStream as streamed tool-call chunks."""
+    arguments = json.dumps(draft_dict)
+    if truncated:
+        arguments = cut(arguments)
+    size = max(1, -(-len(arguments) // pieces))
+
+    stream = MetadataStream()
+    message = AIMessageChunk(
+        content="",
+        tool_call_chunks=[
+            {"name": "IPMetadata", "args": "", "id": "call_0", "index": 0}
+        ],
+    )
+    for i in range(0, len(arguments), size):
+        chunk = AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": None, "args": arguments[i : i + size], "id": None, "index": 0}
+            ],
+        )
+        message = message + chunk
+        await stream.on_llm_new_token("", chunk=ChatGenerationChunk(message=chunk))
+
+    if stream.ready.done():
+        nodes.metadata.metadata_parse_stats.record("complete")
+        return stream.ready.result().model_dump()
+    return metadata_from_response(message, stream.arguments)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--drafts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Cut-off arguments log a schema warning each
+    logger.disable("nodes.metadata")
+    rng = random.Random(args.seed)
+    names = list(SHAPES)
+    weights = [SHAPES[n][0] for n in names]
+    sample = rng.choices(names, weights=weights, k=args.drafts)
+
+    before = {name: [0, 0] for name in names}
+    after = {name: [0, 0] for name in names}
+    nodes.metadata.metadata_parse_stats = ParseStats()
+    for i, shape in enumerate(sample):
+        _, render, truncated = SHAPES[shape]
+        d = draft(i)
+        before[shape][0] += 1
+        before[shape][1] += failed(parse_metadata_draft(render(d)))
+        after[shape][0] += 1
+        after[shape][1] += failed(await stream_tool_call(d, truncated))
+
+    print(f"\nParse failures over {args.drafts} drafts")
+    print(f"{'reply shape':<22}{'drafts':>8}{'free text':>12}{'tool call':>12}")
+    for name in names:
+        total = before[name][0]
+        if total:
+            print(
+                f"{name:<22}{total:>8}"
+                f"{before[name][1] / total:>12.1%}{after[name][1] / total:>12.1%}"
+            )
+    print(
+        f"{'all':<22}{args.drafts:>8}"
+        f"{sum(v[1] for v in before.values()) / args.drafts:>12.1%}"
+        f"{sum(v[1] for v in after.values()) / args.drafts:>12.1%}"
+    )
+    # partial: salvaged from cut-off arguments, so not a failure above
+    print(f"Tool-call outcomes: {nodes.metadata.metadata_parse_stats.summary()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""Mint outcomes under injected failures: blind retry vs receipt-driven retry.
+
+Mints run through the MCP stand-in against the chain stand-in
+(benchmarks/standins/chain_server.py), with STANDIN_MINT_FAULTS making a
+share of the calls fail before sending, revert, time out waiting for the
+receipt, or lose the response after the transaction landed.
+
+"blind" re-sends the mint whenever the result has no IP ID, as
+MintRegisterIP used to. "receipt" is MintRegisterIP with a ChainClient:
+it re-sends only mints that provably did not land. Double mints are read
+from the chain stand-in.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standins.chain_server import start_server  # noqa: E402
+from nodes.minting import MintRegisterIP, parse_tool_result  # noqa: E402
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools  # noqa: E402
+from tools.mcp_pool import MCPSessionPool  # noqa: E402
+from utils.chain import ChainClient  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+POLICIES = ("blind", "receipt")
+
+
+def mint_state():
+    uri = f"ipfs://Qm{uuid.uuid4().hex}"
+    return {
+        "terms": {"commercial_rev_share": 15, "derivatives_allowed": True},
+        "registration_metadata": {
+            "ip_metadata_uri": uri + "ip",
+            "ip_metadata_hash": "11" * 32,
+            "nft_metadata_uri": uri,
+            "nft_metadata_hash": "22" * 32,
+        },
+    }
+
+
+class CountingTool:
+    """Wraps the mint tool to count calls."""
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.calls = 0
+
+    async def ainvoke(self, args):
+        self.calls += 1
+        return await self.tool.ainvoke(args)
+
+
+async def blind_mint(tool, state):
+    """The old behaviour: one more call whenever no IP ID came back."""
+    metadata = state["registration_metadata"]
+    args = {
+        "commercial_rev_share": "15",
+        "derivatives_allowed": "true",
+        "registration_metadata": {
+            **metadata,
+            "ip_metadata_hash": "0x" + metadata["ip_metadata_hash"],
+            "nft_metadata_hash": "0x" + metadata["nft_metadata_hash"],
+        },
+    }
+    parsed = parse_tool_result(await tool.ainvoke(args))
+    if not parsed["ip_id"]:
+        parsed = parse_tool_result(await tool.ainvoke(args))
+    return "landed" if parsed["ip_id"] else "failed"
+
+
+async def run_policy(policy, tools_dict, rpc_url, chain_server, mints, concurrency):
+    tool = CountingTool(tools_dict["mint_register_ip_tool"])
+    node = MintRegisterIP(tool, ChainClient(rpc_url=rpc_url, receipt_timeout=2.0))
+    semaphore = asyncio.Semaphore(concurrency)
+    states = [mint_state() for _ in range(mints)]
+
+    async def one(state):
+        async with semaphore:
+            if policy == "blind":
+                return await blind_mint(tool, state)
+            update = await node.ainvoke(state)
+            return (update.get("minting_data") or {}).get("status") or "error"
+
+    started = time.perf_counter()
+    reported = await asyncio.gather(*(one(state) for state in states))
+    wall = time.perf_counter() - started
+
+    counts = [
+        chain_server.chain.mint_counts.get(
+            state["registration_metadata"]["nft_metadata_uri"], 0
+        )
+        for state in states
+    ]
+    return {
+        "tool calls": tool.calls,
+        "reported landed": reported.count("landed"),
+        "reported unknown": reported.count("unknown"),
+        "reported failed": sum(1 for r in reported if r not in ("landed", "unknown")),
+        "minted once": sum(1 for c in counts if c == 1),
+        "double mints": sum(1 for c in counts if c > 1),
+        "not minted": sum(1 for c in counts if c == 0),
+        # Reported failed or unknown although the chain has the IP
+        "landed, not reported": sum(
+            1 for c, r in zip(counts, reported) if c and r != "landed"
+        ),
+        "wall seconds": round(wall, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mints", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--faults", default="rejected=0.05,reverted=0.05,timeout=0.05,lost=0.05"
+    )
+    args = parser.parse_args()
+
+    chain_server, rpc_url = start_server()
+    env = {
+        **os.environ,
+        "STANDIN_CHAIN_URL": rpc_url,
+        "STANDIN_MINT_FAULTS": args.faults,
+    }
+    try:
+        async with MCPSessionPool(
+            size=4, command=sys.executable, args=[STANDIN_SERVER], env=env
+        ) as pool:
+            tools_dict = get_specific_tools(await get_ipfs_tools(pool))
+            results = {
+                policy: await run_policy(
+                    policy,
+                    tools_dict,
+                    rpc_url,
+                    chain_server,
+                    args.mints,
+                    args.concurrency,
+                )
+                for policy in POLICIES
+            }
+    finally:
+        chain_server.shutdown()
+
+    print(f"\n{args.mints} mints, faults {args.faults}")
+    print(f"{'':<24}" + "".join(f"{p:>10}" for p in POLICIES))
+    for key in results[POLICIES[0]]:
+        print(f"{key:<24}" + "".join(f"{results[p][key]:>10}" for p in POLICIES))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
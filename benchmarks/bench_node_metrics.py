@@ -0,0 +1,131 @@
+"""Per-node latency and tokens under load, and what recording them costs.
+
+A batch of --prompts rows runs through the batch runner, --concurrency
+threads at a time, against the local stand-ins
+(benchmarks/standins/openai_server.py and story_mcp_server.py): once on a
+graph built with metrics=False and once with a NodeMetrics
+(utils/metrics.py). Rows are fresh prompts each time so no cache is warm.
+
+Reported: wall time of both runs, then from the NodeMetrics summary the
+calls, p50/p95 seconds and tokens of the main nodes and tools. The summary
+is written to --summary and the Prometheus text to --prometheus.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep caches out of the working tree; set before they are created
+_workdir = tempfile.mkdtemp(prefix="bench_node_metrics_")
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(_workdir, "images")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_workdir, "blobs")
+os.environ["CHECKPOINT_PATH"] = os.path.join(_workdir, "checkpoints.sqlite")
+os.environ["MINT_LEDGER_PATH"] = os.path.join(_workdir, "mint_ledger.sqlite")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_workdir, "llm_cache.sqlite")
+os.environ.pop("PINATA_JWT", None)
+os.environ.pop("MANAGE_NONCES", None)
+
+from benchmarks.standins.openai_server import start_server  # noqa: E402
+from graph.workflow import create_workflow_graph  # noqa: E402
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools  # noqa: E402
+from tools.mcp_pool import MCPSessionPool  # noqa: E402
+from utils.batch import run_batch  # noqa: E402
+from utils.helpers import create_memory_saver  # noqa: E402
+from utils.metrics import NodeMetrics  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+
+NODES = ["call_llm", "run_tool", "run_ipfs_tool", "negotiate_terms", "mint_register_ip"]
+TOOLS = ["generate_image", "upload_image_to_ipfs", "mint_and_register_ip_with_terms"]
+
+
+async def run(pool, memory, metrics, label, args):
+    graph = create_workflow_graph(
+        get_specific_tools(await get_ipfs_tools(pool)),
+        memory=memory,
+        negotiation="rules",
+        metrics=metrics,
+    )
+    rows = [
+        {"id": str(i), "prompt": f"{label} image {i}"} for i in range(args.prompts)
+    ]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run_batch(
+            graph,
+            rows,
+            os.path.join(_workdir, f"{label}.jsonl"),
+            concurrency=args.concurrency,
+        )
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chat-delay", type=float, default=0.05)
+    parser.add_argument("--image-delay", type=float, default=0.2)
+    parser.add_argument("--tool-delay", default="0.05")
+    parser.add_argument(
+        "--summary", default=os.path.join(_workdir, "node_metrics.json")
+    )
+    parser.add_argument(
+        "--prometheus", default=os.path.join(_workdir, "node_metrics.prom")
+    )
+    args = parser.parse_args()
+
+    openai_server, base_url = start_server(args.chat_delay, args.image_delay)
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "standin")
+    env = {**os.environ, "STANDIN_CALL_DELAY": args.tool_delay}
+
+    metrics = NodeMetrics()
+    try:
+        async with MCPSessionPool(
+            size=4, command=sys.executable, args=[STANDIN_SERVER], env=env
+        ) as pool:
+            with create_memory_saver() as memory:
+                plain = await run(pool, memory, False, "plain", args)
+                measured = await run(pool, memory, metrics, "measured", args)
+    finally:
+        openai_server.shutdown()
+
+    metrics.write_summary(args.summary)
+    with open(args.prometheus, "w", encoding="utf-8") as f:
+        f.write(metrics.prometheus())
+    summary = metrics.summary()
+
+    print(f"\n{args.prompts} prompts, {args.concurrency} in flight")
+    print(f"{'wall seconds, metrics off':<38}{plain:>9.2f}")
+    print(f"{'wall seconds, metrics on':<38}{measured:>9.2f}")
+    print(f"\n{'':<38}{'calls':>7}{'p50 s':>9}{'p95 s':>9}{'tokens':>9}")
+    for name in NODES:
+        node = summary["nodes"].get(name)
+        if node is not None:
+            tokens = node["prompt_tokens"] + node["completion_tokens"]
+            print(
+                f"{name:<38}{node['calls']:>7}{node['seconds']['p50']:>9.3f}"
+                f"{node['seconds']['p95']:>9.3f}{tokens:>9}"
+            )
+    for name in TOOLS:
+        tool = summary["tools"].get(name)
+        if tool is not None:
+            print(
+                f"{'tool ' + name:<38}{tool['calls']:>7}"
+                f"{tool['seconds']['p50']:>9.3f}{tool['seconds']['p95']:>9.3f}"
+            )
+    print(f"\nSummary: {args.summary}\nPrometheus: {args.prometheus}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+"""Concurrent mints from one signer: SDK nonces vs a local NonceManager.
+
+All mints run at once through the MCP stand-in against the chain stand-in
+(benchmarks/standins/chain_server.py), which mines a block every
+--block-time seconds, enforces nonce order and refuses a second
+transaction with a nonce already in its mempool. STANDIN_MINT_FAULTS makes a
+share of the mints fail before sending or get dropped from the mempool,
+leaving nonce gaps.
+
+"sdk" lets the MCP server read the nonce from the chain, as the Story SDK
+does. "managed" passes nonces from a NonceManager, which fills the gaps with
+zero-value transfers. The managed run starts on a chain the sdk run already
+used, so its first nonce comes from resyncing.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_account import Account  # noqa: E402
+
+from benchmarks.standins.chain_server import start_server  # noqa: E402
+from nodes.minting import MintRegisterIP  # noqa: E402
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools  # noqa: E402
+from tools.mcp_pool import MCPSessionPool  # noqa: E402
+from utils.chain import ChainClient  # noqa: E402
+from utils.nonces import NonceManager, nonce_taken  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+POLICIES = ("sdk", "managed")
+
+
+def mint_state():
+    uri = f"ipfs://Qm{uuid.uuid4().hex}"
+    return {
+        "terms": {"commercial_rev_share": 15, "derivatives_allowed": True},
+        "registration_metadata": {
+            "ip_metadata_uri": uri + "ip",
+            "ip_metadata_hash": "11" * 32,
+            "nft_metadata_uri": uri,
+            "nft_metadata_hash": "22" * 32,
+        },
+    }
+
+
+class CountingTool:
+    """Wraps the mint tool to count calls and nonce collisions."""
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.calls = 0
+        self.nonce_errors = 0
+
+    async def ainvoke(self, args):
+        self.calls += 1
+        result = await self.tool.ainvoke(args)
+        if nonce_taken(str(result)):
+            self.nonce_errors += 1
+        return result
+
+
+async def run_policy(policy, tools_dict, rpc_url, chain_server, private_key, args):
+    tool = CountingTool(tools_dict["mint_register_ip_tool"])
+    chain = ChainClient(rpc_url=rpc_url, receipt_timeout=2.0)
+    nonces = None
+    if policy == "managed":
+        nonces = NonceManager(
+            chain,
+            private_key,
+            stuck_seconds=args.stuck_seconds,
+            check_interval=args.stuck_seconds / 4,
+            max_in_flight=args.sessions,
+        )
+    node = MintRegisterIP(tool, chain, nonces=nonces)
+    states = [mint_state() for _ in range(args.mints)]
+
+    async def one(state):
+        update = await node.ainvoke(state)
+        return (update.get("minting_data") or {}).get("status") or "error"
+
+    started = time.perf_counter()
+    reported = await asyncio.gather(*(one(state) for state in states))
+    wall = time.perf_counter() - started
+    if nonces is not None:
+        await nonces.close()
+
+    counts = [
+        chain_server.chain.mint_counts.get(
+            state["registration_metadata"]["nft_metadata_uri"], 0
+        )
+        for state in states
+    ]
+    landed = reported.count("landed")
+    return {
+        "tool calls": tool.calls,
+        "nonce collisions": tool.nonce_errors,
+        "gaps filled": len(nonces.filled) if nonces else 0,
+        "reported landed": landed,
+        "reported failed": len(reported) - landed,
+        "minted once": sum(1 for c in counts if c == 1),
+        "double mints": sum(1 for c in counts if c > 1),
+        "not minted": sum(1 for c in counts if c == 0),
+        "wall seconds": round(wall, 2),
+        "landed per second": round(landed / wall, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mints", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--block-time", type=float, default=0.5)
+    parser.add_argument("--stuck-seconds", type=float, default=2.0)
+    parser.add_argument("--receipt-timeout", type=float, default=10.0)
+    parser.add_argument("--faults", default="rejected=0.03,dropped=0.03")
+    args = parser.parse_args()
+
+    private_key = Account.create().key.hex()
+    chain_server, rpc_url = start_server(block_time=args.block_time)
+    env = {
+        **os.environ,
+        "STANDIN_CHAIN_URL": rpc_url,
+        "STANDIN_MINT_FAULTS": args.faults,
+        "STANDIN_RECEIPT_TIMEOUT": str(args.receipt_timeout),
+        # Without a nonce from the caller, read it from the chain as the SDK does
+        "STANDIN_SDK_NONCES": "1",
+        "WALLET_PRIVATE_KEY": private_key,
+    }
+    try:
+        async with MCPSessionPool(
+            size=args.sessions,
+            command=sys.executable,
+            args=[STANDIN_SERVER],
+            env=env,
+        ) as pool:
+            tools_dict = get_specific_tools(await get_ipfs_tools(pool))
+            results = {}
+            for policy in POLICIES:
+                results[policy] = await run_policy(
+                    policy, tools_dict, rpc_url, chain_server, private_key, args
+                )
+    finally:
+        chain_server.shutdown()
+
+    print(
+        f"\n{args.mints} concurrent mints from one signer over {args.sessions} "
+        f"MCP sessions, {args.block_time} s blocks, faults {args.faults}"
+    )
+    print(f"{'':<20}" + "".join(f"{p:>10}" for p in POLICIES))
+    for key in results[POLICIES[0]]:
+        print(f"{key:<20}" + "".join(f"{results[p][key]:>10}" for p in POLICIES))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
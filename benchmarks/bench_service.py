@@ -0,0 +1,166 @@
+"""Many users sharing one job service (utils/job_service.py).
+
+The service runs the workflow graph against the local stand-ins
+(benchmarks/standins/openai_server.py and story_mcp_server.py) and is
+served by uvicorn on a local port. --users clients each submit --jobs
+prompts over HTTP at once, follow every job's event stream, answer its
+interrupts with the batch runner's ReviewPolicy and fetch the result. A
+submit answered with 429 is retried after a short pause.
+
+Reported: jobs completed, 429 answers, interrupts answered, throughput and
+the p50/p95 time from first submit to result.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep caches out of the working tree; set before they are created
+_workdir = tempfile.mkdtemp(prefix="bench_service_")
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(_workdir, "images")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_workdir, "blobs")
+os.environ["CHECKPOINT_PATH"] = os.path.join(_workdir, "checkpoints.sqlite")
+os.environ["MINT_LEDGER_PATH"] = os.path.join(_workdir, "mint_ledger.sqlite")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_workdir, "llm_cache.sqlite")
+os.environ.pop("PINATA_JWT", None)
+os.environ.pop("MANAGE_NONCES", None)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.standins.openai_server import start_server  # noqa: E402
+from graph.workflow import create_workflow_graph  # noqa: E402
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools  # noqa: E402
+from tools.mcp_pool import MCPSessionPool  # noqa: E402
+from utils.batch import ReviewPolicy  # noqa: E402
+from utils.helpers import create_memory_saver  # noqa: E402
+from utils.job_service import JobService, create_app  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+
+
+async def events(client, thread_id):
+    """Parse the job's server-sent events."""
+    async with client.stream("GET", f"/jobs/{thread_id}/events") as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
+
+
+async def run_job(client, prompt, stats):
+    started = time.perf_counter()
+    while True:
+        response = await client.post("/jobs", json={"prompt": prompt})
+        if response.status_code != 429:
+            break
+        stats["429 answers"] += 1
+        await asyncio.sleep(0.2)
+    response.raise_for_status()
+    thread_id = response.json()["thread_id"]
+
+    policy = ReviewPolicy()
+    async for event in events(client, thread_id):
+        if event["type"] == "status" and event["status"] == "parked":
+            payload = policy.answer(event["interrupt"]["value"])
+            response = await client.post(f"/jobs/{thread_id}/resume", json=payload)
+            response.raise_for_status()
+            stats["interrupts answered"] += 1
+
+    result = (await client.get(f"/jobs/{thread_id}/result")).json()
+    stats["latencies"].append(time.perf_counter() - started)
+    if result["status"] == "completed":
+        stats["jobs completed"] += 1
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=5, help="Jobs per user")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--max-queued", type=int, default=16)
+    parser.add_argument("--chat-delay", type=float, default=0.2)
+    parser.add_argument("--image-delay", type=float, default=0.3)
+    parser.add_argument("--tool-delay", default="0.1")
+    args = parser.parse_args()
+
+    openai_server, base_url = start_server(args.chat_delay, args.image_delay)
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "standin")
+    env = {**os.environ, "STANDIN_CALL_DELAY": args.tool_delay}
+
+    stats = {"jobs completed": 0, "429 answers": 0, "interrupts answered": 0}
+    stats["latencies"] = []
+    try:
+        async with MCPSessionPool(
+            size=4, command=sys.executable, args=[STANDIN_SERVER], env=env
+        ) as pool:
+            graph = create_workflow_graph(
+                get_specific_tools(await get_ipfs_tools(pool)),
+                memory=create_memory_saver(),
+            )
+            async with JobService(
+                graph, max_in_flight=args.max_in_flight, max_queued=args.max_queued
+            ) as service:
+                server = uvicorn.Server(
+                    uvicorn.Config(
+                        create_app(service=service),
+                        host="127.0.0.1",
+                        port=0,
+                        log_level="warning",
+                    )
+                )
+                serving = asyncio.create_task(server.serve())
+                while not server.started:
+                    await asyncio.sleep(0.05)
+                port = server.servers[0].sockets[0].getsockname()[1]
+
+                started = time.perf_counter()
+                async with httpx.AsyncClient(
+                    base_url=f"http://127.0.0.1:{port}",
+                    timeout=None,
+                    limits=httpx.Limits(max_connections=None),
+                ) as client:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        await asyncio.gather(
+                            *(
+                                run_job(client, f"user {user} image {job}", stats)
+                                for user in range(args.users)
+                                for job in range(args.jobs)
+                            )
+                        )
+                wall = time.perf_counter() - started
+                server.should_exit = True
+                await serving
+    finally:
+        openai_server.shutdown()
+
+    latencies = sorted(stats.pop("latencies"))
+    total = args.users * args.jobs
+    print(
+        f"\n{total} jobs from {args.users} users, {args.max_in_flight} in flight, "
+        f"{args.max_queued} queued at most"
+    )
+    for key, value in stats.items():
+        print(f"{key:<22}{value:>10}")
+    print(f"{'jobs per second':<22}{total / wall:>10.2f}")
+    print(f"{'p50 seconds':<22}{statistics.median(latencies):>10.2f}")
+    print(
+        f"{'p95 seconds':<22}"
+        f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:>10.2f}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,199 @@
+"""Minting throughput with 1, 2 and 4 funded signers.
+
+The chain stand-in (benchmarks/standins/chain_server.py) mines a block
+every --block-time seconds with at most --per-block transactions from each
+sender, like a node's per-account limits. Every run sends the same mints
+concurrently through a SignerPool with the same total number of MCP
+sessions, split between its signers, plus one unfunded signer that must be
+skipped. The recorded signer of every landed mint is checked against the
+sender of its transaction.
+
+A second case has one worker mint with one key and leave its mints
+unconfirmed in a shared ledger, then has a worker with another key take
+them over, as a batch worker does with a dead worker's threads. Every mint
+must be settled from the ledger against the first signer, none re-sent.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_account import Account  # noqa: E402
+
+from benchmarks.standins.chain_server import start_server  # noqa: E402
+from nodes.minting import MintRegisterIP, ledger_key  # noqa: E402
+from tools.signer_pool import SignerPool  # noqa: E402
+from utils.chain import ChainClient  # noqa: E402
+from utils.mint_ledger import MintLedger  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+SIGNER_COUNTS = (1, 2, 4)
+
+
+def mint_state():
+    uri = f"ipfs://Qm{uuid.uuid4().hex}"
+    return {
+        "terms": {"commercial_rev_share": 15, "derivatives_allowed": True},
+        "registration_metadata": {
+            "ip_metadata_uri": uri + "ip",
+            "ip_metadata_hash": "11" * 32,
+            "nft_metadata_uri": uri,
+            "nft_metadata_hash": "22" * 32,
+        },
+    }
+
+
+async def run(signer_count, chain_server, rpc_url, args):
+    keys = [Account.create().key.hex() for _ in range(signer_count + 1)]
+    unfunded = Account.from_key(keys[-1]).address
+    chain_server.chain.balances[unfunded.lower()] = 0
+
+    chain = ChainClient(rpc_url=rpc_url, receipt_timeout=2.0)
+    env = {
+        **os.environ,
+        "STANDIN_CHAIN_URL": rpc_url,
+        "STANDIN_RECEIPT_TIMEOUT": "30",
+    }
+    async with SignerPool(
+        keys,
+        chain,
+        sessions_per_signer=max(1, args.sessions // signer_count),
+        # The stand-in server accepts a nonce argument
+        manage_nonces=True,
+        command=sys.executable,
+        args=[STANDIN_SERVER],
+        env=env,
+    ) as signers:
+        node = MintRegisterIP(None, chain, signers=signers)
+        states = [mint_state() for _ in range(args.mints)]
+
+        started = time.perf_counter()
+        updates = await asyncio.gather(*(node.ainvoke(state) for state in states))
+        wall = time.perf_counter() - started
+
+    minted = [update.get("minting_data") or {} for update in updates]
+    landed = [data for data in minted if data.get("status") == "landed"]
+    receipts = chain_server.chain.receipts
+    by_signer = {}
+    for data in landed:
+        by_signer[data["signer"]] = by_signer.get(data["signer"], 0) + 1
+    return {
+        "landed": len(landed),
+        "landed per second": round(len(landed) / wall, 1),
+        "wall seconds": round(wall, 2),
+        "busiest signer": max(by_signer.values(), default=0),
+        "quietest signer": min(by_signer.values(), default=0),
+        "unfunded signer": by_signer.get(unfunded, 0),
+        "signer mismatches": sum(
+            1
+            for data in landed
+            if receipts["0x" + data["tx_hash"]]["from"].lower()
+            != data["signer"].lower()
+        ),
+    }
+
+
+async def takeover(rpc_url, args):
+    keys = [Account.create().key.hex() for _ in range(2)]
+    first_signer, second_signer = (Account.from_key(key).address for key in keys)
+    chain = ChainClient(rpc_url=rpc_url, receipt_timeout=2.0)
+    env = {
+        **os.environ,
+        "STANDIN_CHAIN_URL": rpc_url,
+        "STANDIN_RECEIPT_TIMEOUT": "30",
+    }
+    states = [
+        {**mint_state(), "image_cid": f"Qm{uuid.uuid4().hex}"}
+        for _ in range(min(args.mints, 24))
+    ]
+
+    def pool(worker_keys):
+        return SignerPool(
+            worker_keys,
+            chain,
+            sessions_per_signer=args.sessions,
+            manage_nonces=True,
+            command=sys.executable,
+            args=[STANDIN_SERVER],
+            env=env,
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = MintLedger(os.path.join(directory, "mint_ledger.sqlite"))
+
+        async with pool(keys[:1]) as signers:
+            node = MintRegisterIP(None, chain, ledger=ledger, signers=signers)
+            first = await asyncio.gather(*(node.ainvoke(state) for state in states))
+        # The first worker died before it could confirm its mints
+        for state, update in zip(states, first):
+            image_cid, metadata_hash = ledger_key(state)
+            unconfirmed = {
+                **update["minting_data"],
+                "ip_id": None,
+                "status": "unknown",
+            }
+            await ledger.arecord(image_cid, "minted", unconfirmed, metadata_hash)
+
+        async with pool(keys[1:]) as signers:
+            node = MintRegisterIP(None, chain, ledger=ledger, signers=signers)
+            second = await asyncio.gather(*(node.ainvoke(state) for state in states))
+
+    taken = [update.get("minting_data") or {} for update in second]
+    return {
+        "mints": len(states),
+        "settled from ledger": sum(
+            1
+            for data in taken
+            if data.get("status") == "landed" and data.get("signer") == first_signer
+        ),
+        "re-sent": sum(1 for data in taken if data.get("signer") == second_signer),
+        "failed": sum(1 for update in second if "minting_data" not in update),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mints", type=int, default=120)
+    parser.add_argument("--sessions", type=int, default=12)
+    parser.add_argument("--block-time", type=float, default=0.5)
+    parser.add_argument("--per-block", type=int, default=3)
+    args = parser.parse_args()
+
+    chain_server, rpc_url = start_server(
+        block_time=args.block_time, max_per_sender=args.per_block
+    )
+    try:
+        results = {
+            count: await run(count, chain_server, rpc_url, args)
+            for count in SIGNER_COUNTS
+        }
+        taken_over = await takeover(rpc_url, args)
+    finally:
+        chain_server.shutdown()
+
+    print(
+        f"\n{args.mints} concurrent mints over {args.sessions} MCP sessions, "
+        f"{args.block_time} s blocks, {args.per_block} transactions per sender "
+        f"per block"
+    )
+    print(f"{'signers':<20}" + "".join(f"{c:>10}" for c in SIGNER_COUNTS))
+    for key in results[SIGNER_COUNTS[0]]:
+        print(
+            f"{key:<20}" + "".join(f"{results[c][key]:>10}" for c in SIGNER_COUNTS)
+        )
+
+    print("\nUnconfirmed mints taken over by a worker with another signer")
+    for key, value in taken_over.items():
+        print(f"{key:<20}{value:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
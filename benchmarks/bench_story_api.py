@@ -0,0 +1,87 @@
+"""Measure agent.py pipeline throughput: blocking requests versus the pooled async client.
+
+Both variants run the four Story API calls for every pipeline against a
+local stand-in server that adds a fixed delay per request.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import mint_image  # noqa: E402
+from benchmarks.standins.story_api_server import start_server  # noqa: E402
+from tools.story_api import StoryAPIClient  # noqa: E402
+
+
+def blocking_pipeline(base_url):
+    """The previous implementation: a new connection per blocking call."""
+    ipfs_uri = requests.post(
+        f"{base_url}/upload_image_to_ipfs", json={"image_data": "https://example/x.png"}
+    ).json()["ipfs_uri"]
+    registration_metadata = requests.post(
+        f"{base_url}/create_ip_metadata",
+        json={"image_uri": ipfs_uri, "name": "n", "description": "d", "attributes": []},
+    ).json()["registration_metadata"]
+    mint_data = requests.post(
+        f"{base_url}/mint_and_register_ip_with_terms",
+        json={
+            "commercial_rev_share": 20,
+            "derivatives_allowed": True,
+            "registration_metadata": registration_metadata,
+        },
+    ).json()
+    requests.post(
+        f"{base_url}/mint_license_tokens",
+        json={
+            "licensor_ip_id": mint_data["ip_id"],
+            "license_terms_id": mint_data["license_terms_ids"][0],
+        },
+    )
+
+
+async def blocking(base_url, pipelines):
+    # The old run_agent coroutines blocked the loop, so they ran one at a time
+    async def one():
+        blocking_pipeline(base_url)
+
+    await asyncio.gather(*(one() for _ in range(pipelines)))
+
+
+async def pooled(base_url, pipelines):
+    async with StoryAPIClient(base_url=base_url) as client:
+        await asyncio.gather(
+            *(mint_image(client, "https://example/x.png") for _ in range(pipelines))
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pipelines", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, base_url = start_server(delay=args.delay)
+    try:
+        for label, runner in (("blocking", blocking), ("async-pooled", pooled)):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await runner(base_url, args.pipelines)
+            wall = time.perf_counter() - started
+            print(
+                f"{label:<14} pipelines={args.pipelines:<5} wall={wall:6.2f}s "
+                f"throughput={args.pipelines / wall:7.1f} pipelines/s"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""Compare per-stage timings of the linear and the parallel workflow graph.
+
+Both graphs run against local stand-ins: benchmarks/standins/openai_server.py
+for the chat and image endpoints and benchmarks/standins/story_mcp_server.py
+for the Story tools. Interrupts are answered right away (as in batch mode)
+unless --review-seconds simulates a reviewer looking at the image, which
+gives the speculative LLM calls a head start.
+
+Each stage is reported as the time after approval at which it finished.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep caches out of the working tree; set before the image cache is created
+_workdir = tempfile.mkdtemp(prefix="bench_topology_")
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(_workdir, "images")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_workdir, "blobs")
+os.environ.pop("PINATA_JWT", None)
+
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.types import Command  # noqa: E402
+
+from benchmarks.standins.openai_server import start_server  # noqa: E402
+from graph.workflow import TOPOLOGIES, create_workflow_graph  # noqa: E402
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools  # noqa: E402
+from tools.mcp_pool import MCPSessionPool  # noqa: E402
+from utils.helpers import process_user_input  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+
+STAGES = [
+    "human_review_node",
+    "run_ipfs_tool",
+    "generate_metadata",
+    "create_metadata",
+    "negotiate_terms",
+    "mint_register_ip",
+    "mint_license_tokens",
+]
+
+
+async def run_once(graph, review_seconds):
+    """One thread from prompt to license tokens; returns stage finish offsets."""
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    finished = {}
+    command = process_user_input(f"a benchmark image {uuid.uuid4().hex[:8]}")
+    approved_at = None
+
+    while command is not None:
+        interrupt_data = None
+        async for event in graph.astream(command, config, stream_mode="updates"):
+            if "__interrupt__" in event:
+                interrupt_data = event["__interrupt__"][0].value
+                continue
+            if approved_at is not None:
+                for node_name in event:
+                    if not node_name.startswith("__"):
+                        finished[node_name] = time.perf_counter() - approved_at
+
+        if interrupt_data is None:
+            command = None
+        elif "image_url" in interrupt_data:
+            await asyncio.sleep(review_seconds)
+            approved_at = time.perf_counter()
+            command = Command(resume={"action": "continue"})
+        else:
+            # Only the first terms prompt is timed; the answer is immediate
+            finished.setdefault("terms prompt", time.perf_counter() - approved_at)
+            command = Command(
+                resume={"commercial_rev_share": 15, "derivatives_allowed": True}
+            )
+
+    snapshot = await graph.aget_state(config)
+    if not snapshot.values.get("license_data"):
+        raise RuntimeError(f"Thread did not reach license minting: {finished}")
+
+    finished["total"] = max(finished.values())
+    return finished
+
+
+async def bench(topology, tools_dict, runs, review_seconds):
+    graph = create_workflow_graph(tools_dict, memory=MemorySaver(), topology=topology)
+    samples = []
+    for _ in range(runs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples.append(await run_once(graph, review_seconds))
+    return {
+        stage: statistics.median(s[stage] for s in samples if stage in s)
+        for stage in STAGES + ["terms prompt", "total"]
+        if any(stage in s for s in samples)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--chat-delay", type=float, default=0.6)
+    parser.add_argument("--image-delay", type=float, default=1.0)
+    parser.add_argument(
+        "--tool-delay", default="0.4", help="Per-call delay of the MCP stand-in"
+    )
+    parser.add_argument("--review-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.chat_delay, args.image_delay)
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "standin")
+    env = {**os.environ, "STANDIN_CALL_DELAY": args.tool_delay}
+
+    try:
+        async with MCPSessionPool(
+            size=2, command=sys.executable, args=[STANDIN_SERVER], env=env
+        ) as pool:
+            tools_dict = get_specific_tools(await get_ipfs_tools(pool))
+            results = {
+                topology: await bench(
+                    topology, tools_dict, args.runs, args.review_seconds
+                )
+                for topology in TOPOLOGIES
+            }
+    finally:
+        server.shutdown()
+
+    print(
+        f"\nSeconds after approval at which each stage finished "
+        f"(median of {args.runs} runs)"
+    )
+    print(f"{'stage':<22}" + "".join(f"{t:>12}" for t in TOPOLOGIES))
+    for stage in STAGES + ["terms prompt", "total"]:
+        row = [results[t].get(stage) for t in TOPOLOGIES]
+        print(
+            f"{stage:<22}"
+            + "".join(f"{v:>12.2f}" if v is not None else f"{'-':>12}" for v in row)
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
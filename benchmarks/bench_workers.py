@@ -0,0 +1,131 @@
+"""Batch throughput with 1 to N worker processes (utils/workers.py).
+
+Every worker builds its own graph and MCP session pool against the local
+stand-ins (benchmarks/standins/openai_server.py and story_mcp_server.py);
+all of them share one SQLite checkpointer. The batch runs once per worker
+count in --workers, each time with fresh prompts so no cache is warm.
+
+With --kill-after N, one worker of the largest pool is killed after N
+results; its threads are taken over by the others from their checkpoints.
+
+Reported per worker count: rows completed, takeovers, wall time, prompts
+per second and the speed-up over the first count. Speed-up is bounded by
+the cores available (os.cpu_count() is printed).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep caches out of the working tree; set before they are created. Spawned
+# workers import this module again and must keep the parent's directory.
+if "BENCH_WORKERS_DIR" not in os.environ:
+    os.environ["BENCH_WORKERS_DIR"] = tempfile.mkdtemp(prefix="bench_workers_")
+_workdir = os.environ["BENCH_WORKERS_DIR"]
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(_workdir, "images")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_workdir, "blobs")
+os.environ["CHECKPOINT_PATH"] = os.path.join(_workdir, "checkpoints.sqlite")
+os.environ["MINT_LEDGER_PATH"] = os.path.join(_workdir, "mint_ledger.sqlite")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_workdir, "llm_cache.sqlite")
+os.environ.pop("PINATA_JWT", None)
+os.environ.pop("MANAGE_NONCES", None)
+os.environ.pop("WALLET_PRIVATE_KEYS", None)
+
+from benchmarks.standins.openai_server import start_server  # noqa: E402
+from utils.workers import WorkerPool, workflow_graph  # noqa: E402
+
+STANDIN_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "standins", "story_mcp_server.py"
+)
+
+
+@asynccontextmanager
+async def quiet_graph(index, workers, options):
+    """workflow_graph without the per-node progress prints."""
+    sys.stdout = open(os.devnull, "w")
+    async with workflow_graph(index, workers, options) as graph:
+        yield graph
+
+
+async def bench(workers, args, options):
+    rows = [
+        {"id": str(i), "prompt": f"{workers} workers, image {i}"}
+        for i in range(args.prompts)
+    ]
+    kill_after = args.kill_after if workers == max(args.workers) > 1 else None
+    completed = 0
+
+    async with WorkerPool(workers, quiet_graph, options) as pool:
+        started = time.perf_counter()
+        for row in rows:
+            pool.submit(row)
+        results = 0
+        async for record in pool.results():
+            results += 1
+            completed += record["status"] == "completed"
+            if results == kill_after:
+                pool.processes[0].kill()
+        wall = time.perf_counter() - started
+
+    return {
+        "rows completed": completed,
+        "takeovers": pool.takeovers,
+        "wall seconds": round(wall, 1),
+        "prompts per second": round(args.prompts / wall, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=1000)
+    parser.add_argument(
+        "--workers",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=[1, 2, 4],
+        help="Comma-separated worker counts",
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Per worker")
+    parser.add_argument("--mcp-sessions", type=int, default=2, help="Per worker")
+    parser.add_argument("--kill-after", type=int, default=None)
+    parser.add_argument("--chat-delay", type=float, default=0.05)
+    parser.add_argument("--image-delay", type=float, default=0.05)
+    parser.add_argument("--tool-delay", default="0.02")
+    args = parser.parse_args()
+
+    openai_server, base_url = start_server(args.chat_delay, args.image_delay)
+    # Inherited by the workers
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "standin")
+    options = {
+        "concurrency": args.concurrency,
+        "mcp_sessions": args.mcp_sessions,
+        "mcp_command": sys.executable,
+        "mcp_args": [STANDIN_SERVER],
+        "mcp_env": {**os.environ, "STANDIN_CALL_DELAY": args.tool_delay},
+    }
+
+    results = {}
+    try:
+        for workers in args.workers:
+            results[workers] = await bench(workers, args, options)
+    finally:
+        openai_server.shutdown()
+
+    first = results[args.workers[0]]["prompts per second"]
+    for stats in results.values():
+        stats["speed-up"] = round(stats["prompts per second"] / first, 2)
+
+    print(f"\n{args.prompts} prompts, {os.cpu_count()} cores")
+    print(f"{'workers':<20}" + "".join(f"{w:>10}" for w in args.workers))
+    for key in results[args.workers[0]]:
+        print(f"{key:<20}" + "".join(f"{results[w][key]:>10}" for w in args.workers))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
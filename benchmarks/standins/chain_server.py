@@ -0,0 +1,380 @@
+"""Stand-in for the Story chain's JSON-RPC endpoint.
+
+Serves what ChainClient and NonceManager use (eth_chainId, eth_blockNumber,
+eth_gasPrice, eth_getBalance, eth_getTransactionCount, eth_getTransactionByHash,
+eth_getTransactionReceipt, eth_getLogs, eth_sendRawTransaction) from an in-memory chain. The MCP
+stand-in sends mints to it with the non-standard standin_sendMint method;
+they are mined in nonce order with IPRegistered and LicenseTermsAttached
+logs (or reverted, with no logs). standin_mintCount tells how many times an
+NFT metadata URI was registered, to catch double mints.
+"""
+
+import hashlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_abi import encode
+from eth_account import Account
+from eth_account.typed_transactions import TypedTransaction
+from hexbytes import HexBytes
+from web3 import Web3
+
+from utils.chain import (
+    IP_ASSET_REGISTRY,
+    IP_REGISTERED_TOPIC,
+    LICENSE_TERMS_ATTACHED_TOPIC,
+)
+
+CHAIN_ID = 1315
+LICENSING_MODULE = "0x04fbd8a2e56dd85CFD5500A4A4DfA955B9f1dE6f"
+PIL_TEMPLATE = "0x2E896b0b2Fdb7457499B56AAaA4AE55BCB4Cd316"
+SPG_NFT = "0xc32A8a0FF3beDDDa58393d022aF433e78739FAbc"
+WALLET = "0x" + "77" * 20
+GAS_PRICE = 10**9
+FUNDED_BALANCE = 10**20
+
+
+def word(value):
+    """A 32-byte topic from an int or an address."""
+    if isinstance(value, str):
+        value = int(value, 16)
+    return "0x" + value.to_bytes(32, "big").hex()
+
+
+class RPCError(Exception):
+    """A JSON-RPC error, as a node reports a rejected transaction."""
+
+
+class Chain:
+    """In-memory chain with per-sender nonces and a mempool.
+
+    A transaction is mined once every lower nonce of its sender has been;
+    until then it waits in the mempool, where a transaction with the same
+    nonce only replaces it for a 10% higher fee. With block_time 0 every
+    send is mined at once, otherwise a block is mined every block_time
+    seconds, with at most max_per_sender transactions from each sender.
+    Every address holds FUNDED_BALANCE unless balances says otherwise.
+    """
+
+    def __init__(self, block_time=0.0, max_per_sender=None):
+        self.lock = threading.Lock()
+        self.block_number = 1
+        self.block_time = block_time
+        self.max_per_sender = max_per_sender
+        # Lowercase address -> balance in wei
+        self.balances = {}
+        self.receipts = {}
+        # Hash -> transaction, mined or in the mempool
+        self.transactions = {}
+        self.logs = []
+        self.mint_counts = {}
+        self.token_ids = itertools.count(1)
+        # Sender -> nonce of its next mined transaction
+        self.nonces = {}
+        # Sender -> {nonce: transaction} waiting to be mined
+        self.mempool = {}
+        if block_time:
+            threading.Thread(target=self.mine_blocks, daemon=True).start()
+
+    def transaction_count(self, sender, pending=False):
+        sender = sender.lower()
+        count = self.nonces.get(sender, 0)
+        if pending:
+            queued = self.mempool.get(sender, {})
+            while count in queued:
+                count += 1
+        return count
+
+    def submit(self, tx):
+        """Add a transaction to the mempool, as eth_sendRawTransaction does."""
+        sender = tx["from"].lower()
+        with self.lock:
+            expected = self.nonces.get(sender, 0)
+            if tx["nonce"] < expected:
+                raise RPCError(
+                    f"nonce too low: next nonce {expected}, tx nonce {tx['nonce']}"
+                )
+            queued = self.mempool.setdefault(sender, {})
+            existing = queued.get(tx["nonce"])
+            if existing is not None:
+                if existing["hash"] == tx["hash"]:
+                    raise RPCError("already known")
+                if tx["fee"] < existing["fee"] * 1.1:
+                    raise RPCError("replacement transaction underpriced")
+            if not tx.get("dropped"):
+                if existing is not None:
+                    del self.transactions[existing["hash"]]
+                queued[tx["nonce"]] = tx
+                self.transactions[tx["hash"]] = tx
+            if not self.block_time:
+                self.mine()
+        return tx["hash"]
+
+    def mine_blocks(self):
+        while True:
+            time.sleep(self.block_time)
+            with self.lock:
+                self.mine()
+
+    def mine(self):
+        """Mine every executable transaction into one block; holds the lock."""
+        executable = []
+        for sender, queued in self.mempool.items():
+            nonce = first = self.nonces.get(sender, 0)
+            while nonce in queued and (
+                self.max_per_sender is None or nonce - first < self.max_per_sender
+            ):
+                executable.append(queued.pop(nonce))
+                nonce += 1
+            self.nonces[sender] = nonce
+        if not executable:
+            return
+        self.block_number += 1
+        block = self.block_number
+        block_hash = "0x" + hashlib.sha256(f"block{block}".encode()).hexdigest()
+        for index, tx in enumerate(executable):
+            tx.update(block=block, block_hash=block_hash, index=index)
+            logs = self.execute(tx)
+            for log_index, log in enumerate(logs):
+                log.update(
+                    blockHash=block_hash,
+                    blockNumber=hex(block),
+                    transactionHash=tx["hash"],
+                    transactionIndex=hex(index),
+                    logIndex=hex(log_index),
+                    removed=False,
+                )
+            self.logs.extend(logs)
+            self.receipts[tx["hash"]] = {
+                "blockHash": block_hash,
+                "blockNumber": hex(block),
+                "contractAddress": None,
+                "cumulativeGasUsed": "0x5208",
+                "effectiveGasPrice": hex(tx["fee"]),
+                "from": tx["from"],
+                "gasUsed": "0x5208",
+                "logs": logs,
+                "logsBloom": "0x" + "00" * 256,
+                "status": "0x0" if tx.get("reverted") else "0x1",
+                "to": tx["to"],
+                "transactionHash": tx["hash"],
+                "transactionIndex": hex(index),
+                "type": "0x2",
+            }
+
+    def execute(self, tx):
+        """The logs of a mined transaction; plain transfers have none."""
+        if tx.get("kind") != "mint" or tx.get("reverted"):
+            return []
+        uri = tx["nft_metadata_uri"]
+        self.mint_counts[uri] = self.mint_counts.get(uri, 0) + 1
+        return [
+            {
+                "address": IP_ASSET_REGISTRY,
+                "topics": [
+                    "0x" + IP_REGISTERED_TOPIC.hex().removeprefix("0x"),
+                    word(CHAIN_ID),
+                    word(SPG_NFT),
+                    word(tx["token_id"]),
+                ],
+                "data": "0x"
+                + encode(
+                    ["address", "string", "string", "uint256"],
+                    [
+                        tx["ip_id"],
+                        f"{CHAIN_ID}: Stand-in #{tx['token_id']}",
+                        uri,
+                        int(time.time()),
+                    ],
+                ).hex(),
+            },
+            {
+                "address": LICENSING_MODULE,
+                "topics": [
+                    "0x" + LICENSE_TERMS_ATTACHED_TOPIC.hex().removeprefix("0x"),
+                    word(tx["from"]),
+                    word(tx["ip_id"]),
+                ],
+                "data": "0x"
+                + encode(
+                    ["address", "uint256"], [PIL_TEMPLATE, tx["license_terms_id"]]
+                ).hex(),
+            },
+        ]
+
+    def send_mint(self, params):
+        """Send a mint as the MCP stand-in's signer would.
+
+        params has nft_metadata_uri and optionally reverted, dropped
+        (accepted but never mined), sender and nonce; without a nonce the
+        sender's pending count is used.
+        """
+        sender = params.get("sender", WALLET)
+        nonce = params.get("nonce")
+        if nonce is None:
+            with self.lock:
+                nonce = self.transaction_count(sender, pending=True)
+        token_id = next(self.token_ids)
+        seed = f"{sender}|{nonce}|{params['nft_metadata_uri']}|{time.time_ns()}"
+        tx = {
+            "kind": "mint",
+            "from": sender,
+            "to": SPG_NFT,
+            "nonce": nonce,
+            "fee": params.get("fee", GAS_PRICE),
+            "hash": "0x" + hashlib.sha256(seed.encode()).hexdigest(),
+            "nft_metadata_uri": params["nft_metadata_uri"],
+            "reverted": params.get("reverted", False),
+            "dropped": params.get("dropped", False),
+            "token_id": token_id,
+            "ip_id": Web3.to_checksum_address(
+                "0x" + hashlib.sha256(f"ip{token_id}".encode()).hexdigest()[:40]
+            ),
+            "license_terms_id": 1000 + token_id,
+        }
+        self.submit(tx)
+        return {
+            "tx_hash": tx["hash"],
+            "nonce": nonce,
+            "ip_id": tx["ip_id"],
+            "license_terms_id": tx["license_terms_id"],
+        }
+
+    def send_raw_transaction(self, raw):
+        """Accept a signed transaction; only its nonce, fee and sender matter."""
+        fields = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+        tx = {
+            "kind": "transfer",
+            "from": Account.recover_transaction(raw),
+            "to": fields.get("to") and Web3.to_checksum_address(fields["to"]),
+            "nonce": fields["nonce"],
+            "fee": fields["maxFeePerGas"],
+            "hash": Web3.keccak(hexstr=raw).hex(),
+        }
+        if not tx["hash"].startswith("0x"):
+            tx["hash"] = "0x" + tx["hash"]
+        return self.submit(tx)
+
+    def get_transaction(self, tx_hash):
+        with self.lock:
+            tx = self.transactions.get(tx_hash.lower())
+            if tx is None:
+                return None
+            mined = "block" in tx
+            return {
+                "blockHash": tx["block_hash"] if mined else None,
+                "blockNumber": hex(tx["block"]) if mined else None,
+                "from": tx["from"],
+                "gas": "0x5208",
+                "hash": tx["hash"],
+                "input": "0x",
+                "nonce": hex(tx["nonce"]),
+                "to": tx["to"],
+                "transactionIndex": hex(tx["index"]) if mined else None,
+                "type": "0x2",
+                "value": "0x0",
+            }
+
+    def get_logs(self, params):
+        latest = self.block_number
+        from_block = self.block_param(params.get("fromBlock", "latest"), latest)
+        to_block = self.block_param(params.get("toBlock", "latest"), latest)
+        address = params.get("address")
+        addresses = {
+            a.lower()
+            for a in ([address] if isinstance(address, str) else address or [])
+        }
+        topic = (params.get("topics") or [None])[0]
+        with self.lock:
+            return [
+                log
+                for log in self.logs
+                if from_block <= int(log["blockNumber"], 16) <= to_block
+                and (not addresses or log["address"].lower() in addresses)
+                and (topic is None or log["topics"][0] == topic)
+            ]
+
+    @staticmethod
+    def block_param(value, latest):
+        if value in ("latest", "pending", "safe", "finalized"):
+            return latest
+        return int(value, 16)
+
+    def call(self, method, params):
+        if method == "eth_chainId":
+            return hex(CHAIN_ID)
+        if method == "eth_blockNumber":
+            return hex(self.block_number)
+        if method == "eth_gasPrice":
+            return hex(GAS_PRICE)
+        if method == "eth_getBalance":
+            return hex(self.balances.get(params[0].lower(), FUNDED_BALANCE))
+        if method == "eth_getTransactionCount":
+            with self.lock:
+                return hex(
+                    self.transaction_count(params[0], params[1] == "pending")
+                )
+        if method == "eth_getTransactionByHash":
+            return self.get_transaction(params[0])
+        if method == "eth_getTransactionReceipt":
+            return self.receipts.get(params[0].lower())
+        if method == "eth_getLogs":
+            return self.get_logs(params[0])
+        if method == "eth_sendRawTransaction":
+            return self.send_raw_transaction(params[0])
+        if method == "standin_sendMint":
+            return self.send_mint(params[0])
+        if method == "standin_mintCount":
+            return self.mint_counts.get(params[0], 0)
+        raise KeyError(method)
+
+
+def make_handler(chain):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            try:
+                result = chain.call(request["method"], request.get("params", []))
+                response = {"result": result}
+            except KeyError as e:
+                response = {
+                    "error": {"code": -32601, "message": f"Method not found: {e}"}
+                }
+            except RPCError as e:
+                response = {"error": {"code": -32000, "message": str(e)}}
+            body = json.dumps(
+                {"jsonrpc": "2.0", "id": request.get("id"), **response}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_server(port=0, block_time=0.0, max_per_sender=None):
+    """Start the chain stand-in in a background thread; returns (server, rpc_url).
+
+    server.chain is the in-memory Chain.
+    """
+    chain = Chain(block_time, max_per_sender)
+    server = StandInServer(("127.0.0.1", port), make_handler(chain))
+    server.chain = chain
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
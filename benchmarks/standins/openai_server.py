@@ -0,0 +1,228 @@
+"""Stand-in for the OpenAI chat completions and image generation endpoints.
+
+Point the workflow at it with OPENAI_BASE_URL=<base_url>/v1. Chat requests
+that offer the IPMetadata tool get a metadata draft as its arguments, other
+requests with tools a generate_image tool call, metadata requests without
+tools a JSON draft and everything else a short text answer. Streaming
+requests get the same message as server-sent chunks spread over the delay.
+Generated image URLs point back at the stand-in, which serves a few random
+bytes for them.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+METADATA_DRAFT = {
+    "name": "Stand-in Artwork",
+    "description": "An image produced by the benchmark stand-in",
+    "attributes": [
+        {"trait_type": "style", "value": "digital"},
+        {"trait_type": "mood", "value": "calm"},
+        {"trait_type": "setting", "value": "studio"},
+    ],
+}
+
+
+def chat_message(request):
+    """The assistant message the stand-in answers a chat request with."""
+    last = request["messages"][-1].get("content") or ""
+    if isinstance(last, list):
+        last = json.dumps(last)
+
+    tool_names = [t.get("function", {}).get("name") for t in request.get("tools", [])]
+    if "IPMetadata" in tool_names:
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{time.time_ns()}",
+                    "type": "function",
+                    "function": {
+                        "name": "IPMetadata",
+                        "arguments": json.dumps(METADATA_DRAFT),
+                    },
+                }
+            ],
+        }
+    if tool_names:
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{time.time_ns()}",
+                    "type": "function",
+                    "function": {
+                        "name": "generate_image",
+                        "arguments": json.dumps({"prompt": last}),
+                    },
+                }
+            ],
+        }
+    if "metadata" in last:
+        return {"role": "assistant", "content": json.dumps(METADATA_DRAFT)}
+    return {"role": "assistant", "content": "These terms look reasonable."}
+
+
+def stream_chunks(message, pieces=8):
+    """Split a message into chat.completion.chunk deltas, OpenAI style."""
+    deltas = [{"role": "assistant", "content": message["content"] and ""}]
+    if message.get("tool_calls"):
+        call = message["tool_calls"][0]
+        arguments = call["function"]["arguments"]
+        size = max(1, -(-len(arguments) // pieces))
+        deltas.append(
+            {
+                "tool_calls": [
+                    {
+                        "index": 0,
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["function"]["name"], "arguments": ""},
+                    }
+                ]
+            }
+        )
+        for i in range(0, len(arguments), size):
+            deltas.append(
+                {
+                    "tool_calls": [
+                        {"index": 0, "function": {"arguments": arguments[i : i + size]}}
+                    ]
+                }
+            )
+    else:
+        words = message["content"].split(" ")
+        deltas.extend({"content": word + " "} for word in words)
+    return deltas
+
+
+def make_handler(chat_delay, image_delay):
+    counter = itertools.count()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_body(self, body, content_type="application/json", status=200):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path.endswith("/chat/completions") and request.get("stream"):
+                self.stream_chat(request)
+                return
+            if self.path.endswith("/chat/completions"):
+                time.sleep(chat_delay)
+                response = {
+                    "id": f"chatcmpl-{next(counter)}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "gpt-4o"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": chat_message(request),
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 100,
+                        "completion_tokens": 20,
+                        "total_tokens": 120,
+                    },
+                }
+            elif self.path.endswith("/images/generations"):
+                time.sleep(image_delay)
+                host, port = self.server.server_address
+                response = {
+                    "created": int(time.time()),
+                    "data": [
+                        {"url": f"http://{host}:{port}/images/{next(counter)}.png"}
+                    ],
+                }
+            else:
+                self.send_body(b'{"error": "not found"}', status=404)
+                return
+            self.send_body(json.dumps(response).encode())
+
+        def stream_chat(self, request):
+            message = chat_message(request)
+            deltas = stream_chunks(message)
+            base = {
+                "id": f"chatcmpl-{next(counter)}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o"),
+            }
+            finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def send(chunk):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+
+            # Half the delay before the first token, the rest between chunks
+            time.sleep(chat_delay / 2)
+            for delta in deltas:
+                send({**base, "choices": [{"index": 0, "delta": delta}]})
+                time.sleep(chat_delay / 2 / len(deltas))
+            send(
+                {
+                    **base,
+                    "choices": [
+                        {"index": 0, "delta": {}, "finish_reason": finish_reason}
+                    ],
+                }
+            )
+            if (request.get("stream_options") or {}).get("include_usage"):
+                send(
+                    {
+                        **base,
+                        "choices": [],
+                        "usage": {
+                            "prompt_tokens": 100,
+                            "completion_tokens": 20,
+                            "total_tokens": 120,
+                        },
+                    }
+                )
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            # Every image is different so blob store CIDs do not collide
+            self.send_body(os.urandom(1024), content_type="image/png")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_server(chat_delay=0.5, image_delay=1.0, port=0):
+    """Start the stand-in in a background thread and return (server, base_url)."""
+    server = StandInServer(("127.0.0.1", port), make_handler(chat_delay, image_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,61 @@
+"""Stand-in for the Story API HTTP server used by agent.py.
+
+Answers the four pipeline endpoints with canned JSON after a fixed delay,
+using HTTP/1.1 so clients can keep connections alive.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+RESPONSES = {
+    "/upload_image_to_ipfs": {"ipfs_uri": "ipfs://QmStandIn"},
+    "/create_ip_metadata": {
+        "registration_metadata": {
+            "ip_metadata_uri": "ipfs://QmIp",
+            "ip_metadata_hash": "0x" + "11" * 32,
+            "nft_metadata_uri": "ipfs://QmNft",
+            "nft_metadata_hash": "0x" + "22" * 32,
+        }
+    },
+    "/mint_and_register_ip_with_terms": {
+        "ip_id": "0x" + "ab" * 20,
+        "license_terms_ids": [1],
+    },
+    "/mint_license_tokens": {"license_token_ids": [7]},
+}
+
+
+def make_handler(delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            time.sleep(delay)
+            body = json.dumps(RESPONSES.get(self.path, {"error": "not found"})).encode()
+            self.send_response(200 if self.path in RESPONSES else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_server(delay=0.05, port=0):
+    """Start the stand-in in a background thread and return (server, base_url)."""
+    server = StandInServer(("127.0.0.1", port), make_handler(delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,223 @@
+"""Stand-in for story-sdk-mcp/server.py with the same tool names and output format.
+
+STANDIN_STARTUP_DELAY simulates the interpreter plus SDK import cost and
+STANDIN_CALL_DELAY the per-call work, both in seconds.
+
+With STANDIN_CHAIN_URL pointing at benchmarks/standins/chain_server.py,
+mints are sent to that chain from the WALLET_PRIVATE_KEY account and the
+receipt is awaited for up to STANDIN_RECEIPT_TIMEOUT seconds. The nonce is
+the one the caller passes or else the chain's next free one; with
+STANDIN_SDK_NONCES set it is, like the SDK, the account's mined
+transaction count, read before signing, so concurrent mints collide.
+STANDIN_MINT_FAULTS injects the failures the real server reports, as
+comma-separated fault=probability pairs:
+  rejected  the RPC node refuses the transaction, nothing is sent
+  reverted  the transaction is mined but reverts
+  timeout   the transaction lands, the receipt wait times out
+  lost      the transaction lands, the response never says so
+  dropped   the transaction is accepted but never mined
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+import urllib.request
+
+from eth_account import Account
+from mcp.server.fastmcp import FastMCP
+
+time.sleep(float(os.getenv("STANDIN_STARTUP_DELAY", "0")))
+CALL_DELAY = float(os.getenv("STANDIN_CALL_DELAY", "0"))
+
+CHAIN_URL = os.getenv("STANDIN_CHAIN_URL")
+SDK_NONCES = bool(os.getenv("STANDIN_SDK_NONCES"))
+RECEIPT_TIMEOUT = float(os.getenv("STANDIN_RECEIPT_TIMEOUT", "300"))
+SIGNER = (
+    Account.from_key(os.environ["WALLET_PRIVATE_KEY"]).address
+    if os.getenv("WALLET_PRIVATE_KEY")
+    else "0x" + "77" * 20
+)
+MINT_FAULTS = {
+    fault: float(probability)
+    for fault, _, probability in (
+        pair.partition("=")
+        for pair in os.getenv("STANDIN_MINT_FAULTS", "").split(",")
+        if pair
+    )
+}
+
+mcp = FastMCP("story_server")
+
+
+def _hex(*parts):
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+
+
+@mcp.tool()
+def upload_image_to_ipfs(image_data: str) -> str:
+    """Upload an image to IPFS."""
+    time.sleep(CALL_DELAY)
+    # Like the real server, which fetches the image from its URL
+    if not image_data.startswith(("http://", "https://")):
+        raise ValueError("image_data must be an image URL")
+    return f"Successfully uploaded image to IPFS: ipfs://Qm{_hex(image_data)[:44]}"
+
+
+@mcp.tool()
+def create_ip_metadata(
+    image_uri: str, name: str, description: str, attributes: list = None
+) -> str:
+    """Create and upload IP and NFT metadata."""
+    time.sleep(CALL_DELAY)
+    registration_metadata = {
+        "ip_metadata_uri": f"ipfs://Qm{_hex('ip', image_uri, name)[:44]}",
+        "ip_metadata_hash": _hex("ip", image_uri, name, description),
+        "nft_metadata_uri": f"ipfs://Qm{_hex('nft', image_uri, name)[:44]}",
+        "nft_metadata_hash": _hex("nft", image_uri, name, description),
+    }
+    return "Registration metadata for minting: " + json.dumps(registration_metadata)
+
+
+def _flag(value):
+    if isinstance(value, str):
+        if value.lower() not in ("true", "false"):
+            raise ValueError(f"Not a boolean: {value!r}")
+        return value.lower() == "true"
+    return bool(value)
+
+
+@mcp.tool()
+def mint_and_register_ip_with_terms(
+    # The workflow sends strings, but FastMCP json-decodes string arguments
+    # before validation, so "15" and "true" arrive as an int and a bool
+    commercial_rev_share: int | str,
+    derivatives_allowed: bool | str,
+    registration_metadata: dict,
+    nonce: int | None = None,
+) -> str:
+    """Mint an NFT, register it as an IP asset and attach license terms."""
+    terms = (int(commercial_rev_share), _flag(derivatives_allowed))
+    if CHAIN_URL:
+        return _mint_on_chain(registration_metadata["nft_metadata_uri"], nonce)
+    time.sleep(CALL_DELAY)
+    seed = _hex(
+        json.dumps(registration_metadata, sort_keys=True), terms, time.time_ns()
+    )
+    return (
+        f"Successfully minted and registered IP asset with terms:\n"
+        f"Transaction Hash: {seed}\n"
+        f"IP ID: 0x{seed[:40]}\n"
+        f"License Terms IDs: [{int(seed[:4], 16)}]"
+    )
+
+
+def _chain_call(method, *params):
+    request = urllib.request.Request(
+        CHAIN_URL,
+        data=json.dumps(
+            {"jsonrpc": "2.0", "id": 1, "method": method, "params": list(params)}
+        ).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        body = json.loads(response.read())
+    if "error" in body:
+        raise ChainError(body["error"])
+    return body["result"]
+
+
+class ChainError(Exception):
+    pass
+
+
+def _wait_for_receipt(tx_hash):
+    deadline = time.monotonic() + RECEIPT_TIMEOUT
+    while time.monotonic() < deadline:
+        receipt = _chain_call("eth_getTransactionReceipt", tx_hash)
+        if receipt is not None:
+            return receipt
+        time.sleep(0.05)
+    return None
+
+
+def _mint_on_chain(nft_metadata_uri, nonce=None):
+    roll = random.random()
+    fault = None
+    for name, probability in MINT_FAULTS.items():
+        if roll < probability:
+            fault = name
+            break
+        roll -= probability
+
+    if fault == "rejected":
+        return (
+            "Error minting and registering IP: {'code': -32000, 'message': "
+            "'insufficient funds for gas * price + value'}"
+        )
+    if nonce is None and SDK_NONCES:
+        # What the SDK does: the signer's mined transaction count
+        nonce = int(_chain_call("eth_getTransactionCount", SIGNER, "latest"), 16)
+    # Gas estimation and signing happen between reading the nonce and sending
+    time.sleep(CALL_DELAY)
+    try:
+        mint = _chain_call(
+            "standin_sendMint",
+            {
+                "nft_metadata_uri": nft_metadata_uri,
+                "sender": SIGNER,
+                "nonce": nonce,
+                "reverted": fault == "reverted",
+                "dropped": fault == "dropped",
+            },
+        )
+    except ChainError as e:
+        return f"Error minting and registering IP: {e}"
+    tx_hash = mint["tx_hash"].removeprefix("0x")
+    if fault == "timeout":
+        return (
+            f"Error minting and registering IP: Transaction "
+            f"HexBytes('{mint['tx_hash']}') is not in the chain after 300 seconds"
+        )
+    if fault == "lost":
+        return (
+            "Error minting and registering IP: "
+            "Server disconnected without sending a response."
+        )
+    receipt = _wait_for_receipt(mint["tx_hash"])
+    if receipt is None:
+        return (
+            f"Error minting and registering IP: Transaction "
+            f"HexBytes('{mint['tx_hash']}') is not in the chain after "
+            f"{RECEIPT_TIMEOUT:.0f} seconds"
+        )
+    if receipt["status"] == "0x0":
+        return (
+            f"Error minting and registering IP: Transaction {mint['tx_hash']} "
+            f"reverted: {{'status': 0}}"
+        )
+    return (
+        f"Successfully minted and registered IP asset with terms:\n"
+        f"Transaction Hash: {tx_hash}\n"
+        f"IP ID: {mint['ip_id']}\n"
+        f"License Terms IDs: [{mint['license_terms_id']}]"
+    )
+
+
+@mcp.tool()
+def mint_license_tokens(
+    licensor_ip_id: str, license_terms_id: int, nonce: int | None = None
+) -> str:
+    """Mint license tokens for an IP asset."""
+    time.sleep(CALL_DELAY)
+    seed = _hex(licensor_ip_id, license_terms_id, time.time_ns())
+    return (
+        f"Successfully minted license tokens:\n"
+        f"Transaction Hash: {seed}\n"
+        f"License Token IDs: [{int(seed[:6], 16)}]"
+    )
+
+
+if __name__ == "__main__":
+    mcp.run()
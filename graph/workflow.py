@@ -1,22 +1,117 @@
 from langgraph.graph import StateGraph, START, END
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, ToolMessage
+import os
 
 from models.state import State
 from tools.image_tools import generate_image
+from tools.pinata import PinataClient
+from utils.blob_store import BlobStore
+from utils.chain import ChainClient
+from utils.context import ContextPolicy
+from utils.llm_cache import DiskLLMCache
+from utils.metrics import instrument, node_metrics
+from utils.mint_ledger import MintLedger
+from utils.nonces import nonce_manager_from_env, require_nonce_argument
+from utils.ip_metadata import MetadataPublisher
+from utils.speculation import Prefetcher
+from utils.term_model import TermModel
 from nodes.call_llm import create_call_llm_node
 from nodes.run_tool import create_run_tool_node, create_run_ipfs_tool_node
 from nodes.human_review import (
     create_human_review_node,
     create_failed_generation_handler,
 )
-from nodes.metadata import create_generate_metadata_node, create_create_metadata_node
-from nodes.negotiation import create_negotiate_terms_node
+from nodes.metadata import (
+    create_generate_metadata_node,
+    create_create_metadata_node,
+    draft_metadata,
+)
+from nodes.negotiation import create_negotiate_terms_node, explain_terms
 from nodes.minting import create_mint_register_ip_node, create_mint_license_tokens_node
 
 
-def create_workflow_graph(ipfs_tools_dict, memory=None):
-    """Create the workflow graph for the agent."""
+TOPOLOGIES = ("parallel", "linear")
+
+# Stages that only need the approved image (or just the prompt)
+APPROVAL_BRANCHES = ["run_ipfs_tool", "generate_metadata", "negotiate_terms"]
+
+
+def create_workflow_graph(
+    ipfs_tools_dict,
+    memory=None,
+    num_candidates=1,
+    blob_store=None,
+    metadata_publisher=None,
+    context_policy=None,
+    topology="parallel",
+    llm_cache=None,
+    negotiation="interactive",
+    term_model=None,
+    chain=None,
+    ledger=None,
+    nonces=None,
+    signers=None,
+    metrics=None,
+    prefetcher=None,
+):
+    """Create the workflow graph for the agent.
+
+    With num_candidates > 1, run_tool generates that many image variants
+    concurrently and the review interrupt offers all of them at once.
+
+    Metadata is built and pinned in-process when a metadata_publisher is
+    given or PINATA_JWT is set; otherwise the create_ip_metadata tool is used.
+
+    call_llm sends the messages chosen by context_policy, by default a
+    ContextPolicy with the CALL_LLM_MAX_TOKENS budget.
+
+    The metadata draft and the terms explanation only depend on the prompt,
+    so they are requested while the image is under review and picked up
+    after approval, through prefetcher (a Prefetcher by default). Pass the
+    same one to the InterruptDispatcher or JobService running the graph so
+    finished threads drop their calls.
+
+    With topology="parallel" (the default) the upload, the metadata draft
+    and the terms negotiation run as parallel branches after approval;
+    create_metadata joins the upload and the draft, and minting waits for
+    the metadata and the terms. topology="linear" keeps the original chain.
+
+    The metadata and negotiation model answers identical requests from
+    llm_cache, a DiskLLMCache by default; pass llm_cache=False to disable it.
+
+    negotiation="rules" sets the terms with TermRules instead of asking the
+    user, with no LLM calls; use it for unattended runs. Interactive term
+    defaults come from term_model, by default the TermModel trained with
+    scripts/train_term_model.py if one has been saved.
+
+    A mint that returns no IP ID is checked on chain with chain, by
+    default ChainClient.from_env() (none offline, pass chain=False for
+    none either way), and only re-sent if it provably did not land.
+
+    Every stage's outcome is appended to ledger, a MintLedger by default
+    (pass ledger=False to disable). Metadata creation, minting and license
+    tokens reuse what it already holds for the same image and metadata, so
+    reruns only do the missing work.
+
+    With nonces, a NonceManager, both mint tools are given locally
+    allocated nonces so concurrent threads can send from one signer. By
+    default one is created for WALLET_PRIVATE_KEY when MANAGE_NONCES is set;
+    the Story tools must accept a nonce argument for it, or building the
+    graph raises ValueError. The same holds for a SignerPool's nonces.
+
+    With signers, a started SignerPool, both mints are sent by its least
+    loaded funded signer, each with its own nonces, instead of through the
+    mint tools in ipfs_tools_dict.
+
+    Every node's calls (wall time, LLM tokens, tool round trips, retries
+    and outcome) are recorded in metrics, the shared node_metrics by
+    default; pass metrics=False to disable it.
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(
+            f"Unknown topology {topology!r}, expected one of {TOPOLOGIES}"
+        )
 
     # Extract specific tools
     upload_to_ipfs_tool = ipfs_tools_dict["upload_to_ipfs_tool"]
@@ -36,34 +131,111 @@ def create_workflow_graph(ipfs_tools_dict, memory=None):
     )
 
     # Simpler model for negotiation and other tasks
-    simple_model = ChatOpenAI(model="gpt-4o-mini")
+    simple_model = ChatOpenAI(
+        model="gpt-4o-mini",
+        cache=DiskLLMCache() if llm_cache is None else llm_cache,
+        # Streamed metadata drafts report their tokens too
+        stream_usage=True,
+    )
 
     # Create the workflow graph
     workflow = StateGraph(State)
 
+    # Local copies of generated images, shared by generation and upload
+    blob_store = blob_store or BlobStore()
+
+    # Pin images and metadata in-process when Pinata credentials are available
+    pinata_client = PinataClient() if os.getenv("PINATA_JWT") else None
+    if metadata_publisher is None and pinata_client is not None:
+        metadata_publisher = MetadataPublisher(pinata_client, blob_store)
+
+    # LLM calls started during human review and used after approval
+    if prefetcher is None:
+        prefetcher = Prefetcher()
+    speculative_calls = {
+        "metadata_draft": lambda prompt: draft_metadata(simple_model, prompt),
+    }
+    if negotiation == "interactive":
+        speculative_calls["terms_explanation"] = lambda prompt: explain_terms(
+            simple_model, prompt
+        )
+
+    # Exactly-once record of uploads, metadata and mints
+    if ledger is None:
+        ledger = MintLedger()
+    ledger = ledger or None
+
+    # Chain reads that tell whether a mint landed; none when offline
+    if chain is None:
+        chain = ChainClient.from_env()
+    chain = chain or None
+
+    # Local nonces for concurrent mints from one signer
+    if nonces is None and signers is None:
+        nonces = nonce_manager_from_env(chain)
+    nonces = nonces or None
+    if nonces is not None:
+        require_nonce_argument([mint_register_ip_tool, mint_license_tokens_tool])
+    if signers is not None:
+        require_nonce_argument(
+            tool
+            for signer in signers.signers
+            if signer.nonces is not None
+            for tool in signer.tools.values()
+        )
+
     # Create nodes
-    call_llm = create_call_llm_node(model)
-    run_tool = create_run_tool_node({"generate_image": generate_image})
-    run_ipfs_tool = create_run_ipfs_tool_node(upload_to_ipfs_tool)
-    human_review_node = create_human_review_node()
+    call_llm = create_call_llm_node(model, context_policy or ContextPolicy())
+    run_tool = create_run_tool_node(
+        {"generate_image": generate_image},
+        num_candidates=num_candidates,
+        blob_store=blob_store,
+        # Without Pinata the MCP upload tool fetches the image by URL itself
+        local_urls=pinata_client is not None,
+    )
+    run_ipfs_tool = create_run_ipfs_tool_node(
+        upload_to_ipfs_tool, blob_store, ledger, pinata_client
+    )
+    human_review_node = create_human_review_node(prefetcher, speculative_calls)
     handle_failed_generation = create_failed_generation_handler()
-    generate_metadata = create_generate_metadata_node(simple_model)
-    create_metadata = create_create_metadata_node(create_metadata_tool)
-    negotiate_terms = create_negotiate_terms_node(simple_model)
-    mint_register_ip = create_mint_register_ip_node(mint_register_ip_tool)
-    mint_license_tokens = create_mint_license_tokens_node(mint_license_tokens_tool)
+    # Interactive negotiation reads the draft's attributes, and discards it
+    generate_metadata = create_generate_metadata_node(
+        simple_model, prefetcher, keep_draft=negotiation == "interactive"
+    )
+    create_metadata = create_create_metadata_node(
+        create_metadata_tool, metadata_publisher, ledger
+    )
+    negotiate_terms = create_negotiate_terms_node(
+        simple_model,
+        prefetcher,
+        mode=negotiation,
+        recommender=term_model or TermModel.load(),
+    )
+    mint_register_ip = create_mint_register_ip_node(
+        mint_register_ip_tool, chain, ledger, nonces, signers
+    )
+    mint_license_tokens = create_mint_license_tokens_node(
+        mint_license_tokens_tool, ledger, nonces, signers
+    )
+
+    # Per-node latency, token and tool metrics
+    if metrics is None:
+        metrics = node_metrics
+
+    def add_node(name, node):
+        workflow.add_node(name, instrument(name, node, metrics) if metrics else node)
 
     # Add nodes to the graph
-    workflow.add_node("call_llm", call_llm)
-    workflow.add_node("run_tool", run_tool)
-    workflow.add_node("run_ipfs_tool", run_ipfs_tool)
-    workflow.add_node("human_review_node", human_review_node)
-    workflow.add_node("handle_failed_generation", handle_failed_generation)
-    workflow.add_node("generate_metadata", generate_metadata)
-    workflow.add_node("create_metadata", create_metadata)
-    workflow.add_node("negotiate_terms", negotiate_terms)
-    workflow.add_node("mint_register_ip", mint_register_ip)
-    workflow.add_node("mint_license_tokens", mint_license_tokens)
+    add_node("call_llm", call_llm)
+    add_node("run_tool", run_tool)
+    add_node("run_ipfs_tool", run_ipfs_tool)
+    add_node("human_review_node", human_review_node)
+    add_node("handle_failed_generation", handle_failed_generation)
+    add_node("generate_metadata", generate_metadata)
+    add_node("create_metadata", create_metadata)
+    add_node("negotiate_terms", negotiate_terms)
+    add_node("mint_register_ip", mint_register_ip)
+    add_node("mint_license_tokens", mint_license_tokens)
 
     # Define edges
     # Start -> call LLM to generate image
@@ -86,22 +258,42 @@ def create_workflow_graph(ipfs_tools_dict, memory=None):
     )
 
     # Human review -> either run IPFS tool or call LLM again based on response
+    def route_review(x):
+        # This will be either "run_ipfs_tool" or "call_llm"
+        if topology == "parallel" and x.get("next") == "run_ipfs_tool":
+            return APPROVAL_BRANCHES
+        return x.get("next")
+
     workflow.add_conditional_edges(
         "human_review_node",
-        lambda x: x.get("next"),  # This will be either "run_ipfs_tool" or "call_llm"
+        route_review,
+        ["call_llm", *APPROVAL_BRANCHES],
     )
 
-    # IPFS tool -> generate metadata
-    workflow.add_edge("run_ipfs_tool", "generate_metadata")
+    # Failed generation -> call LLM again with the new prompt
+    workflow.add_conditional_edges(
+        "handle_failed_generation",
+        lambda x: x.get("next"),
+    )
+
+    if topology == "parallel":
+        # Upload + metadata draft -> create metadata
+        workflow.add_edge(["run_ipfs_tool", "generate_metadata"], "create_metadata")
+
+        # Create metadata + negotiate terms -> mint and register IP
+        workflow.add_edge(["create_metadata", "negotiate_terms"], "mint_register_ip")
+    else:
+        # IPFS tool -> generate metadata
+        workflow.add_edge("run_ipfs_tool", "generate_metadata")
 
-    # Generate metadata -> create metadata
-    workflow.add_edge("generate_metadata", "create_metadata")
+        # Generate metadata -> create metadata
+        workflow.add_edge("generate_metadata", "create_metadata")
 
-    # Create metadata -> negotiate terms
-    workflow.add_edge("create_metadata", "negotiate_terms")
+        # Create metadata -> negotiate terms
+        workflow.add_edge("create_metadata", "negotiate_terms")
 
-    # Negotiate terms -> mint and register IP
-    workflow.add_edge("negotiate_terms", "mint_register_ip")
+        # Negotiate terms -> mint and register IP
+        workflow.add_edge("negotiate_terms", "mint_register_ip")
 
     # Mint and register IP -> mint license tokens
     workflow.add_edge("mint_register_ip", "mint_license_tokens")
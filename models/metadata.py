@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+
+class Attribute(BaseModel):
+    trait_type: str = Field(description="Trait name, e.g. style, mood or setting")
+    value: str = Field(description="One-word value of the trait")
+
+
+class IPMetadata(BaseModel):
+    """Name, description and traits of an IP asset, drafted by the LLM."""
+
+    # Field order is the order the model streams them in
+    name: str = Field(description="A creative name for this IP")
+    description: str = Field(
+        description="A detailed description of what's in the image"
+    )
+    attributes: list[Attribute] = Field(
+        description="Exactly three traits: style, mood and setting"
+    )
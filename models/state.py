@@ -1,5 +1,6 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from typing import TypedDict
+import operator
 from langchain_core.messages import BaseMessage
 from langgraph.graph import MessagesState
 
@@ -12,4 +13,34 @@ class AgentState(TypedDict):
 
 
 class State(MessagesState):
-    """Simple state for the agent workflow."""
+    """State for the agent workflow.
+
+    Besides the conversation, every stage writes its output to a typed
+    channel so later nodes read their inputs directly instead of scanning
+    and parsing the message history.
+    """
+
+    # The user's image request, without the "Generate" prefix
+    prompt: str
+    # Candidates from the latest generation round and their blob store CIDs
+    image_urls: list[str]
+    image_cids: list[Optional[str]]
+    # The approved image
+    image_url: str
+    image_cid: Optional[str]
+    ipfs_uri: str
+    # Name, description and attributes drafted for the IP
+    metadata: dict
+    # ip/nft metadata URIs and hashes expected by the mint tool
+    registration_metadata: dict
+    # Terms asked for up front (e.g. by a batch manifest row), applied by
+    # rule-based negotiation
+    requested_terms: dict
+    # commercial_rev_share and derivatives_allowed
+    terms: dict
+    # ip_id, tx_hash and license_terms_ids
+    minting_data: dict
+    # license_token_ids and tx_hash
+    license_data: dict
+    # One entry per LLM call with the tokens it sent and used
+    llm_usage: Annotated[list[dict], operator.add]
@@ -1,19 +1,44 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableLambda
+from loguru import logger
 
 
 class CallLLM:
     """Node for calling the LLM with the current messages."""
 
-    def __init__(self, model):
+    def __init__(self, model, context_policy=None):
         self.model = model
+        self.context_policy = context_policy
 
     async def ainvoke(self, state, config=None):
         messages = state["messages"]
+        estimated_tokens = None
+        if self.context_policy is not None:
+            # Send only what the policy keeps instead of the full history
+            messages = self.context_policy.select(messages)
+            estimated_tokens = self.context_policy.count_tokens(messages)
+
         response = await self.model.ainvoke(messages)
-        return {"messages": [response]}
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        logger.info(
+            f"call_llm sent {len(messages)}/{len(state['messages'])} messages, "
+            f"~{estimated_tokens} tokens (reported: {usage.get('input_tokens')})"
+        )
+        return {
+            "messages": [response],
+            "llm_usage": [
+                {
+                    "node": "call_llm",
+                    "messages_sent": len(messages),
+                    "estimated_prompt_tokens": estimated_tokens,
+                    "input_tokens": usage.get("input_tokens"),
+                    "output_tokens": usage.get("output_tokens"),
+                }
+            ],
+        }
 
 
-def create_call_llm_node(model):
+def create_call_llm_node(model, context_policy=None):
     """Create a callable node for the LLM."""
-    return RunnableLambda(CallLLM(model).ainvoke)
+    return RunnableLambda(CallLLM(model, context_policy).ainvoke)
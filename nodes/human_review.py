@@ -3,19 +3,55 @@ from langchain_core.runnables import RunnableLambda
 from langgraph.types import interrupt
 import uuid
 
+from utils.speculation import thread_id_from
 
-def human_review_node(state):
-    """Node for getting human feedback on the generated image."""
-    last_message = state["messages"][-1]
 
-    # Get image URL from the tool message
-    image_url = last_message.content.split("Generated image URL: ")[1]
+class HumanReview:
+    """Node for getting human feedback on the generated image.
+
+    While the reviewer looks at the image, the post-approval LLM calls in
+    speculative_calls (name -> async fn(prompt)) are started on the
+    prefetcher, and dropped again if the image is rejected.
+    """
+
+    def __init__(self, prefetcher=None, speculative_calls=None):
+        self.prefetcher = prefetcher
+        self.speculative_calls = speculative_calls or {}
+
+    def speculate(self, state, thread_id):
+        prompt = state.get("prompt")
+        if self.prefetcher is None or not prompt:
+            return
+        for name, call in self.speculative_calls.items():
+            self.prefetcher.start(thread_id, name, prompt, lambda c=call: c(prompt))
+
+    async def ainvoke(self, state, config=None):
+        thread_id = thread_id_from(config)
+        self.speculate(state, thread_id)
+        return human_review_node(state, self.prefetcher, thread_id)
+
+
+def human_review_node(state, prefetcher=None, thread_id=None):
+    """Ask the reviewer about the generated image and route on the answer."""
+    # Several candidates are offered at once when run_tool generated variants
+    image_urls = state["image_urls"]
+    image_cids = state.get("image_cids") or [None] * len(image_urls)
 
     human_review = interrupt(
-        {"question": "Is this image what you wanted?", "image_url": image_url}
+        {
+            "question": "Is this image what you wanted?",
+            "image_url": image_urls[0],
+            "image_urls": image_urls,
+        }
     )
 
     if human_review.get("action") == "continue":
+        # Use the candidate the reviewer picked, defaulting to the first one
+        choice = human_review.get("choice", 0)
+        if not isinstance(choice, int) or not 0 <= choice < len(image_urls):
+            choice = 0
+        image_url = image_urls[choice]
+
         # If yes, create a tool call to upload to IPFS
         return {
             "messages": [
@@ -30,9 +66,14 @@ def human_review_node(state):
                     ],
                 )
             ],
+            "image_url": image_url,
+            "image_cid": image_cids[choice],
             "next": "run_ipfs_tool",
         }
     else:
+        if prefetcher is not None:
+            prefetcher.discard(thread_id)
+
         # If no, send feedback to LLM to regenerate
         return {
             "messages": [
@@ -46,25 +87,27 @@ def human_review_node(state):
 
 def handle_failed_generation(state):
     """Node for handling failed image generation."""
-    # Get the original prompt from the human message
-    original_prompt = ""
-    for message in state["messages"]:
-        if isinstance(message, HumanMessage) and "Generate" in message.content:
-            original_prompt = message.content.replace("Generate ", "")
-            break
+    original_prompt = state.get("prompt", "")
 
-    print(f"\nUnable to generate image of {original_prompt}")
-    new_prompt = input("Please try a different prompt: ")
+    # Ask for a new prompt through an interrupt so headless runners can answer it
+    retry = interrupt(
+        {
+            "question": "Please try a different prompt",
+            "original_prompt": original_prompt,
+        }
+    )
+    new_prompt = retry.get("data") or original_prompt
 
     return {
         "messages": [HumanMessage(content=f"Generate {new_prompt}")],
+        "prompt": new_prompt,
         "next": "call_llm",  # Go back to the LLM with the new prompt
     }
 
 
-def create_human_review_node():
+def create_human_review_node(prefetcher=None, speculative_calls=None):
     """Create a callable node for human review."""
-    return RunnableLambda(human_review_node)
+    return RunnableLambda(HumanReview(prefetcher, speculative_calls).ainvoke)
 
 
 def create_failed_generation_handler():
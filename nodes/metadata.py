@@ -1,212 +1,403 @@
+from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.json import parse_partial_json
 from langchain_openai import ChatOpenAI
+from loguru import logger
+from pydantic import ValidationError
+import asyncio
 import uuid
 import json
 import re
+from textwrap import dedent
+
+from models.metadata import IPMetadata
+from utils.speculation import thread_id_from
+
+
+DEFAULT_NAME = "AI Generated Artwork"
+DEFAULT_DESCRIPTION = "An AI-generated artwork uploaded to IPFS"
+DEFAULT_ATTRIBUTES = [
+    {"trait_type": "style", "value": "digital"},
+    {"trait_type": "creator", "value": "AI"},
+]
+
+
+class ParseStats:
+    """How metadata drafts were parsed in this process.
+
+    complete: the tool call validated against IPMetadata
+    partial: invalid or cut-off arguments, missing fields defaulted
+    fallback: a plain-text reply, parsed with parse_metadata_draft
+    """
+
+    def __init__(self):
+        self.counts = {"complete": 0, "partial": 0, "fallback": 0}
+
+    def record(self, outcome):
+        self.counts[outcome] += 1
+
+    def summary(self):
+        drafts = sum(self.counts.values())
+        failures = drafts - self.counts["complete"]
+        return {
+            "drafts": drafts,
+            **self.counts,
+            "failure_rate": round(failures / drafts, 3) if drafts else 0.0,
+        }
+
+
+metadata_parse_stats = ParseStats()
+
+
+def parse_metadata_draft(content):
+    """Extract name, description and attributes from the LLM's metadata reply."""
+    # Try to parse the JSON directly from the LLM response
+    # Look for JSON content between curly braces
+    metadata_dict = None
+    json_match = re.search(r"\{.*\}", content, re.DOTALL)
+    if json_match:
+        try:
+            metadata_dict = json.loads(json_match.group(0))
+        except json.JSONDecodeError:
+            pass
+
+    if isinstance(metadata_dict, dict):
+        name = metadata_dict.get("name", DEFAULT_NAME)
+        description = metadata_dict.get("description", DEFAULT_DESCRIPTION)
+        attributes = metadata_dict.get("attributes", [])
+
+        # Validate attributes format
+        valid_attributes = []
+        for attr in attributes:
+            if isinstance(attr, dict) and "trait_type" in attr and "value" in attr:
+                valid_attributes.append(attr)
+
+        # If no valid attributes found, create some default ones
+        if not valid_attributes:
+            valid_attributes = list(DEFAULT_ATTRIBUTES)
+    else:
+        # Fallback to manual parsing if JSON extraction fails
+        name = DEFAULT_NAME
+        description = DEFAULT_DESCRIPTION
+
+        # Extract name if present
+        if "name" in content.lower():
+            name_match = re.search(r'"name"\s*:\s*"([^"]+)"', content, re.IGNORECASE)
+            if name_match:
+                name = name_match.group(1)
+
+        # Extract description if present
+        if "description" in content.lower():
+            desc_match = re.search(
+                r'"description"\s*:\s*"([^"]+)"', content, re.IGNORECASE
+            )
+            if desc_match:
+                description = desc_match.group(1)
+
+        # Create default attributes
+        valid_attributes = list(DEFAULT_ATTRIBUTES)
+
+    return {
+        "name": name,
+        "description": description,
+        "attributes": valid_attributes,
+    }
+
+
+def metadata_from_partial(arguments):
+    """Salvage the fields of cut-off or invalid tool arguments that finished."""
+    try:
+        partial, finished = json.loads(arguments), True
+    except json.JSONDecodeError:
+        partial, finished = parse_partial_json(arguments), False
+    if not isinstance(partial, dict):
+        partial = {}
+
+    # Fields stream in order, so only the last one can have been cut off
+    keys = list(partial)
+    if not finished and keys:
+        if keys[-1] == "attributes" and isinstance(partial["attributes"], list):
+            partial["attributes"] = partial["attributes"][:-1]
+        else:
+            del partial[keys[-1]]
+
+    name = partial.get("name")
+    description = partial.get("description")
+    attributes = [
+        {"trait_type": str(a["trait_type"]), "value": str(a["value"])}
+        for a in partial.get("attributes") or []
+        if isinstance(a, dict) and "trait_type" in a and "value" in a
+    ]
+    return {
+        "name": name if isinstance(name, str) and name else DEFAULT_NAME,
+        "description": (
+            description
+            if isinstance(description, str) and description
+            else DEFAULT_DESCRIPTION
+        ),
+        "attributes": attributes or list(DEFAULT_ATTRIBUTES),
+    }
+
+
+class MetadataStream(AsyncCallbackHandler):
+    """Parses the streamed IPMetadata tool call as its tokens arrive.
+
+    `ready` resolves as soon as the arguments hold a complete, valid
+    object, without waiting for the end of the response.
+    """
+
+    def __init__(self):
+        self.arguments = ""
+        self.partial = {}
+        self.ready = asyncio.get_running_loop().create_future()
+
+    async def on_llm_new_token(self, token, *, chunk=None, **kwargs):
+        message = getattr(chunk, "message", None)
+        for tool_chunk in getattr(message, "tool_call_chunks", None) or []:
+            self.arguments += tool_chunk.get("args") or ""
+        if self.ready.done() or not self.arguments:
+            return
+
+        self.partial = parse_partial_json(self.arguments) or {}
+        # attributes is streamed last, so only its closing brace can finish
+        # the object; validate strictly only then
+        if "attributes" not in self.partial:
+            return
+        if not self.arguments.rstrip().endswith("}"):
+            return
+        try:
+            self.ready.set_result(IPMetadata.model_validate_json(self.arguments))
+        except ValidationError:
+            pass
+
+
+def metadata_from_response(response, arguments=""):
+    """Metadata from a finished response, recording how it was parsed."""
+    for tool_call in response.tool_calls:
+        if tool_call["name"] != IPMetadata.__name__:
+            continue
+        try:
+            metadata = IPMetadata.model_validate(tool_call["args"]).model_dump()
+        except ValidationError as e:
+            logger.warning(f"Metadata draft does not match the schema: {e}")
+            break
+        metadata_parse_stats.record("complete")
+        return metadata
+
+    if arguments or response.tool_calls:
+        metadata_parse_stats.record("partial")
+        if not arguments:
+            arguments = json.dumps(response.tool_calls[0]["args"])
+        return metadata_from_partial(arguments)
+
+    # A model without tool support answers in text
+    metadata_parse_stats.record("fallback")
+    return parse_metadata_draft(response.content or "")
+
+
+def _log_background_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Metadata stream failed after completing: {task.exception()}")
+
+
+# Followed by the image's description; the format comes from the IPMetadata
+# schema.
+METADATA_INSTRUCTIONS = dedent(
+    """\
+    I've generated an image that I'm going to register as IP.
+
+    Call IPMetadata with a creative name for this IP, a detailed description
+    of what's in the image and exactly three one-word traits: style, mood
+    and setting.
+    """
+)
+
+
+async def draft_metadata(simple_model, prompt):
+    """Ask the LLM for name, description and attributes of the generated image.
+
+    The reply is a streamed IPMetadata tool call. This returns as soon as its
+    arguments are complete; the rest of the response (and the LLM cache
+    write) finishes in the background.
+    """
+    original_description = f"Generate {prompt}"
+
+    # Only the prompt goes into the request, so the draft can be made before
+    # the image is approved or uploaded
+    metadata_prompt = HumanMessage(
+        content=METADATA_INSTRUCTIONS
+        + f'\nThe image was created based on this description: "{original_description}"'
+    )
+
+    # Strict tool calling makes the API return arguments matching the schema
+    model = simple_model.bind_tools(
+        [IPMetadata], tool_choice=IPMetadata.__name__, strict=True
+    )
+    stream = MetadataStream()
+    # stream=True streams through the cache path, so hits are still served
+    # from the LLM cache and new responses written to it
+    call = asyncio.ensure_future(
+        model.ainvoke([metadata_prompt], config={"callbacks": [stream]}, stream=True)
+    )
+    await asyncio.wait({call, stream.ready}, return_when=asyncio.FIRST_COMPLETED)
+
+    if stream.ready.done():
+        call.add_done_callback(_log_background_failure)
+        metadata_parse_stats.record("complete")
+        return stream.ready.result().model_dump()
+
+    # Cache hits and responses that never validated mid-stream
+    stream.ready.cancel()
+    return metadata_from_response(call.result(), stream.arguments)
 
 
 class GenerateMetadata:
-    """Node for generating metadata for the uploaded image."""
+    """Node for generating metadata for the uploaded image.
 
-    def __init__(self, simple_model):
+    With keep_draft, the prefetched draft stays in the prefetcher for
+    interactive negotiation, which reads its attributes and discards it
+    once the terms are set.
+    """
+
+    def __init__(self, simple_model, prefetcher=None, keep_draft=False):
         self.simple_model = simple_model
+        self.prefetcher = prefetcher
+        self.keep_draft = keep_draft
 
     async def ainvoke(self, state, config=None):
         print("Generating metadata...")
 
-        # Get the IPFS URI from the previous message
-        ipfs_uri = None
-        for message in reversed(state["messages"]):
-            if (
-                isinstance(message, ToolMessage)
-                and message.name == "upload_image_to_ipfs"
-            ):
-                if "Successfully uploaded image to IPFS:" in message.content:
-                    ipfs_uri = message.content.split(
-                        "Successfully uploaded image to IPFS: "
-                    )[1].strip()
-                    break
-
-        if not ipfs_uri:
-            return {
-                "messages": [
-                    AIMessage(content="Failed to extract IPFS URI from upload result.")
-                ]
-            }
+        prompt = state.get("prompt", "")
 
-        # Get the original image description from earlier messages
-        original_description = ""
-        for message in state["messages"]:
-            if isinstance(message, HumanMessage) and "Generate" in message.content:
-                original_description = message.content
-                break
-
-        # Create a prompt for the LLM to generate metadata in the exact format we need
-        metadata_prompt = HumanMessage(
-            content=f"""I've uploaded an image to IPFS with URI: {ipfs_uri}. 
-                The image was created based on this description: "{original_description}"
-
-                Please generate metadata for this IP with the following fields:
-                1. Name: A creative name for this IP
-                2. Description: A detailed description of what's in the image
-                3. Attributes: A list of traits in the exact format shown below:
-
-                [
-                {{"trait_type": "style", "value": "[one-word style descriptor]"}},
-                {{"trait_type": "mood", "value": "[one-word mood descriptor]"}},
-                {{"trait_type": "setting", "value": "[one-word setting descriptor]"}}
-                ]
+        # Use the draft started during human review, if there is one
+        metadata = None
+        if self.prefetcher is not None:
+            metadata = await self.prefetcher.take(
+                thread_id_from(config), "metadata_draft", prompt, keep=self.keep_draft
+            )
+        if metadata is None:
+            metadata = await draft_metadata(self.simple_model, prompt)
 
-                Format your response exactly like this:
-                {{
-                "name": "Your creative name here",
-                "description": "Your detailed description here",
-                "attributes": [
-                    {{"trait_type": "style", "value": "anime"}},
-                    {{"trait_type": "mood", "value": "exciting"}},
-                    {{"trait_type": "setting", "value": "mountains"}}
-                ]
-            }}"""
-        )
+        content = json.dumps(metadata, indent=2)
 
-        # Get LLM to generate metadata suggestions in the correct format
-        metadata_response = await self.simple_model.ainvoke([metadata_prompt])
+        # The upload may still be running when the graph drafts in parallel
+        ipfs_uri = state.get("ipfs_uri")
+        if ipfs_uri:
+            content = f"IPFS_URI: {ipfs_uri}\n\n{content}"
 
-        # Store the IPFS URI in the message for the next node
-        return {
-            "messages": [
-                AIMessage(
-                    content=f"IPFS_URI: {ipfs_uri}\n\n{metadata_response.content}"
-                )
-            ]
-        }
+        return {"messages": [AIMessage(content=content)], "metadata": metadata}
 
 
 class CreateMetadata:
-    """Node for creating metadata for the IP asset."""
+    """Node for creating metadata for the IP asset.
 
-    def __init__(self, create_metadata_tool):
+    With a ledger, an image whose metadata was already created reuses it,
+    so a rerun mints under the same metadata hash and finds its mint.
+    """
+
+    def __init__(self, create_metadata_tool, metadata_publisher=None, ledger=None):
         self.create_metadata_tool = create_metadata_tool
+        self.metadata_publisher = metadata_publisher
+        self.ledger = ledger
 
     async def ainvoke(self, state, config=None):
         print("Creating metadata...")
-        new_messages = []
-
-        # Get the metadata suggestions from the LLM
-        metadata_message = None
-        for message in reversed(state["messages"]):
-            if isinstance(message, AIMessage) and "IPFS_URI:" in message.content:
-                metadata_message = message
-                break
 
-        if not metadata_message:
+        ipfs_uri = state.get("ipfs_uri")
+        metadata = state.get("metadata")
+        if not ipfs_uri or not metadata:
             return {
                 "messages": [AIMessage(content="Failed to find metadata suggestions.")]
             }
 
-        # Extract IPFS URI from the message
-        ipfs_uri = metadata_message.content.split("IPFS_URI:")[1].split("\n")[0].strip()
-
-        # Extract the JSON part of the message
-        metadata_content = metadata_message.content.split("IPFS_URI:")[1].split(
-            "\n\n", 1
-        )[1]
+        image_cid = state.get("image_cid") or ipfs_uri
+        if self.ledger is not None:
+            previous = await self.ledger.alatest(image_cid, "metadata_created")
+            if previous:
+                print("Metadata already created for this image, reusing it.")
+                registration_metadata = previous["registration_metadata"]
+                return {
+                    "messages": [
+                        AIMessage(
+                            content="Registration metadata for minting: "
+                            + json.dumps(registration_metadata)
+                        )
+                    ],
+                    "registration_metadata": registration_metadata,
+                }
 
         try:
-            # Try to parse the JSON directly from the LLM response
-            # Look for JSON content between curly braces
-            json_match = re.search(r"\{.*\}", metadata_content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                metadata_dict = json.loads(json_str)
-
-                name = metadata_dict.get("name", "AI Generated Artwork")
-                description = metadata_dict.get(
-                    "description", "An AI-generated artwork uploaded to IPFS"
+            if self.metadata_publisher is not None:
+                # Build, hash and pin the metadata in-process
+                registration_metadata = await self.metadata_publisher.publish(
+                    metadata["name"],
+                    metadata["description"],
+                    metadata["attributes"],
+                    ipfs_uri,
+                    state.get("image_cid"),
+                )
+                result = "Registration metadata for minting: " + json.dumps(
+                    registration_metadata
                 )
-                attributes = metadata_dict.get("attributes", [])
-
-                # Validate attributes format
-                valid_attributes = []
-                for attr in attributes:
-                    if (
-                        isinstance(attr, dict)
-                        and "trait_type" in attr
-                        and "value" in attr
-                    ):
-                        valid_attributes.append(attr)
-
-                # If no valid attributes found, create some default ones
-                if not valid_attributes:
-                    valid_attributes = [
-                        {"trait_type": "style", "value": "digital"},
-                        {"trait_type": "creator", "value": "AI"},
-                    ]
             else:
-                # Fallback to manual parsing if JSON extraction fails
-                name = "AI Generated Artwork"
-                description = "An AI-generated artwork uploaded to IPFS"
-
-                # Extract name if present
-                if "name" in metadata_content.lower():
-                    name_match = re.search(
-                        r'"name"\s*:\s*"([^"]+)"', metadata_content, re.IGNORECASE
-                    )
-                    if name_match:
-                        name = name_match.group(1)
-
-                # Extract description if present
-                if "description" in metadata_content.lower():
-                    desc_match = re.search(
-                        r'"description"\s*:\s*"([^"]+)"',
-                        metadata_content,
-                        re.IGNORECASE,
+                # Call the create_ip_metadata tool with properly formatted data
+                result = await self.create_metadata_tool.ainvoke(
+                    {
+                        "image_uri": ipfs_uri,
+                        "name": metadata["name"],
+                        "description": metadata["description"],
+                        "attributes": metadata["attributes"],
+                    }
+                )
+                registration_metadata = None
+                if "Registration metadata for minting:" in result:
+                    registration_metadata = json.loads(
+                        result.split("Registration metadata for minting:")[1].strip()
                     )
-                    if desc_match:
-                        description = desc_match.group(1)
 
-                # Create default attributes
-                valid_attributes = [
-                    {"trait_type": "style", "value": "digital"},
-                    {"trait_type": "creator", "value": "AI"},
+        except Exception as e:
+            return {
+                "messages": [
+                    ToolMessage(
+                        content=f"Error creating metadata: {str(e)}",
+                        name="create_ip_metadata",
+                        tool_call_id=str(uuid.uuid4()),
+                    )
                 ]
+            }
 
-            # Call the create_ip_metadata tool with properly formatted data
-            result = await self.create_metadata_tool.ainvoke(
-                {
-                    "image_uri": ipfs_uri,
-                    "name": name,
-                    "description": description,
-                    "attributes": valid_attributes,
-                }
-            )
-
-            new_messages.append(
+        updates = {
+            "messages": [
                 ToolMessage(
                     content=result,
                     name="create_ip_metadata",
                     tool_call_id=str(uuid.uuid4()),
                 )
-            )
-
-        except Exception as e:
-            new_messages.append(
-                ToolMessage(
-                    content=f"Error creating metadata: {str(e)}",
-                    name="create_ip_metadata",
-                    tool_call_id=str(uuid.uuid4()),
+            ]
+        }
+        if registration_metadata:
+            updates["registration_metadata"] = registration_metadata
+            if self.ledger is not None:
+                await self.ledger.arecord(
+                    image_cid,
+                    "metadata_created",
+                    {"registration_metadata": registration_metadata},
                 )
-            )
-
-        return {"messages": new_messages}
+        return updates
 
 
-def create_generate_metadata_node(simple_model):
+def create_generate_metadata_node(simple_model, prefetcher=None, keep_draft=False):
     """Create a callable node for generating metadata."""
-    return RunnableLambda(GenerateMetadata(simple_model).ainvoke)
+    return RunnableLambda(
+        GenerateMetadata(simple_model, prefetcher, keep_draft).ainvoke
+    )
 
 
-def create_create_metadata_node(create_metadata_tool):
+def create_create_metadata_node(
+    create_metadata_tool, metadata_publisher=None, ledger=None
+):
     """Create a callable node for creating metadata."""
-    return RunnableLambda(CreateMetadata(create_metadata_tool).ainvoke)
+    return RunnableLambda(
+        CreateMetadata(create_metadata_tool, metadata_publisher, ledger).ainvoke
+    )
@@ -5,28 +5,274 @@ import re
 import json
 import traceback
 
+from utils.chain import LANDED, NOT_LANDED, UNKNOWN, rejected_before_send, tx_hash_in
+from utils.metrics import count_retry
+
+
+# "Key: value" fields of the MCP server's text results
+RESULT_FIELD_PATTERN = re.compile(
+    r"(IP ID|Transaction Hash|License Terms IDs|License Token IDs?)\s*:\s*"
+    r"(\[[^\]]*\]|(?:0x)?[0-9a-fA-F]+)",
+    re.IGNORECASE,
+)
+
+
+def parse_tool_result(result):
+    """Structured fields of a Story tool result.
+
+    Accepts the JSON bodies of the Story API server as well as the
+    "Key: value" lines of the MCP server. Returns ip_id, tx_hash (without
+    0x), license_terms_ids, license_token_ids and error, which is the raw
+    text of results that do not report success.
+    """
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except json.JSONDecodeError:
+            pass
+
+    if isinstance(result, dict):
+        fields = {
+            key.lower().replace(" ", "_"): value for key, value in result.items()
+        }
+        text = json.dumps(result)
+    else:
+        text = str(result)
+        fields = {
+            key.lower().replace(" ", "_"): value
+            for key, value in RESULT_FIELD_PATTERN.findall(text)
+        }
+
+    def id_list(value):
+        if isinstance(value, str):
+            value = value.strip("[]").split(",")
+        return [int(str(v).strip()) for v in value or [] if str(v).strip().isdigit()]
+
+    ip_id = fields.get("ip_id")
+    if not (isinstance(ip_id, str) and re.fullmatch(r"0x[a-fA-F0-9]+", ip_id)):
+        ip_id = None
+    tx_hash = fields.get("transaction_hash") or fields.get("tx_hash")
+    if not (isinstance(tx_hash, str) and re.fullmatch(r"(0x)?[a-fA-F0-9]+", tx_hash)):
+        tx_hash = None
+    elif tx_hash:
+        tx_hash = tx_hash.removeprefix("0x")
+
+    error = fields.get("error")
+    if error is None and text.lstrip().lower().startswith("error"):
+        error = text
+    return {
+        "ip_id": ip_id,
+        "tx_hash": tx_hash,
+        "license_terms_ids": id_list(fields.get("license_terms_ids")),
+        "license_token_ids": id_list(
+            fields.get("license_token_ids") or fields.get("license_token_id")
+        ),
+        "error": error,
+    }
+
+
+def not_sent(error):
+    """The result of a mint that failed before the mint tool was called."""
+    result = f"Error minting and registering IP: rejected before sending: {error}"
+    return result, parse_tool_result(result)
+
+
+def ledger_key(state):
+    """(image CID, NFT metadata hash) an asset's mints are recorded under."""
+    image_cid = state.get("image_cid") or state.get("ipfs_uri")
+    metadata_hash = (state.get("registration_metadata") or {}).get(
+        "nft_metadata_hash"
+    )
+    if not image_cid or not metadata_hash:
+        return None
+    return image_cid, "0x" + metadata_hash.removeprefix("0x")
 
-class MintRegisterIP:
-    """Node for minting and registering the IP on the blockchain."""
 
-    def __init__(self, mint_register_ip_tool):
+class MintRegisterIP:
+    """Node for minting and registering the IP on the blockchain.
+
+    When a mint returns no IP ID, the chain client checks the receipt or
+    the IPRegistered events for it. The mint is only re-sent when it
+    provably did not land, at most max_retries times; an unknown outcome is
+    reported instead of risking a second mint.
+
+    With a ledger, the mint is claimed there before it is sent, and an
+    image and metadata that already have a landed mint are not minted again.
+
+    With a NonceManager, every attempt is sent with a nonce allocated from
+    it, and an attempt whose nonce a gap filler took counts as not landed.
+    With a SignerPool, every attempt goes to the least loaded funded signer,
+    with that signer's nonces, and minting_data records the signer.
+    """
+
+    def __init__(
+        self,
+        mint_register_ip_tool,
+        chain=None,
+        max_retries=1,
+        ledger=None,
+        nonces=None,
+        signers=None,
+    ):
         self.mint_register_ip_tool = mint_register_ip_tool
+        self.chain = chain
+        self.max_retries = max_retries
+        self.ledger = ledger
+        self.nonces = nonces
+        self.signers = signers
+
+    async def send(self, tool, nonces, tool_args, key=None, signer=None):
+        """Call the mint tool; transport errors become error results, since
+        the transaction may have been sent anyway. Failures before the tool
+        is called are reported as rejected before sending."""
+        nonce = None
+        if nonces is not None:
+            try:
+                nonce = await nonces.allocate()
+            except Exception as e:
+                return not_sent(e)
+            tool_args = {**tool_args, "nonce": nonce}
+        # Settled however the send ends, cancellation included, so the
+        # nonce's in-flight slot is always freed; without an outcome the
+        # nonce stays pending for the watcher
+        parsed = {"tx_hash": None, "error": None}
+        try:
+            try:
+                if key is not None and (nonce is not None or signer is not None):
+                    # Lets a later run settle this attempt should this one
+                    # crash after sending it
+                    await self.ledger.arecord(
+                        key[0], "mint_started", {**tool_args, "signer": signer}, key[1]
+                    )
+            except Exception as e:
+                result = not_sent(e)[0]
+            else:
+                try:
+                    result = await tool.ainvoke(tool_args)
+                except Exception as e:
+                    result = f"Error minting and registering IP: {e}"
+            parsed = parse_tool_result(result)
+            if parsed["tx_hash"] is None and parsed["error"]:
+                parsed["tx_hash"] = tx_hash_in(parsed["error"])
+        finally:
+            if nonce is not None:
+                nonces.settle(nonce, parsed["tx_hash"], parsed["error"])
+        if nonce is not None:
+            parsed["nonce"] = nonce
+        return str(result), parsed
+
+    async def mint(self, tool_args, key=None):
+        """Send the mint, from the least loaded signer if there is a pool.
+
+        With the asset's ledger key, the nonce and signer of the attempt are
+        recorded before it is sent."""
+        if self.signers is None:
+            return await self.send(
+                self.mint_register_ip_tool, self.nonces, tool_args, key
+            )
+        signer = None
+        try:
+            async with self.signers.acquire() as signer:
+                result, parsed = await self.send(
+                    signer.tools["mint_and_register_ip_with_terms"],
+                    signer.nonces,
+                    tool_args,
+                    key,
+                    signer.address,
+                )
+        except Exception as e:
+            if signer is not None:
+                raise
+            # No signer was handed out, so nothing was sent
+            return not_sent(e)
+        parsed["signer"] = signer.address
+        if "insufficient funds" in (parsed["error"] or "").lower():
+            self.signers.expire_balance(signer.address)
+        return result, parsed
+
+    def nonces_for(self, parsed):
+        """The NonceManager the attempt's nonce came from, if this process
+        has it."""
+        signer = parsed.get("signer")
+        if signer is None:
+            return self.nonces
+        if self.signers is not None:
+            pooled = self.signers.get(signer)
+            if pooled is not None:
+                return pooled.nonces
+        if self.nonces is not None and self.nonces.address.lower() == signer.lower():
+            return self.nonces
+        # Sent by another worker's shard or a rotated key, whose nonces are
+        # not tracked here; the chain check still uses the signer's address
+        return None
+
+    async def check(self, parsed, nft_metadata_uri, sent_at=None):
+        if not parsed.get("tx_hash") and rejected_before_send(parsed.get("error")):
+            return {"status": NOT_LANDED, "reason": "rejected before sending"}
+        nonce = parsed.get("nonce")
+        nonces = self.nonces_for(parsed)
+        if nonce is not None and nonces is not None and nonces.replaced(nonce):
+            return {
+                "status": NOT_LANDED,
+                "reason": f"nonce {nonce} was taken by a gap filler",
+            }
+        if self.chain is None:
+            return {"status": UNKNOWN, "reason": "no chain client to check the mint"}
+        sender = parsed.get("signer") or (nonces.address if nonces else None)
+        return await self.chain.check_mint(
+            nft_metadata_uri,
+            parsed.get("tx_hash"),
+            parsed.get("error"),
+            sent_at,
+            nonce,
+            sender,
+        )
+
+    async def claim(self, key, tool_args, nft_metadata_uri):
+        """None if this run may send the mint, else the minting_data of an
+        earlier mint of the same image and metadata that landed or may
+        still land."""
+        image_cid, metadata_hash = key
+        while True:
+            claimed, previous = await self.ledger.aclaim_mint(
+                image_cid, metadata_hash, tool_args
+            )
+            if claimed:
+                return None
+            if previous["status"] == LANDED:
+                print("This image and metadata are already minted, skipping.")
+                return previous
+
+            # An earlier run crashed mid-mint, is still minting, or could
+            # not confirm its mint
+            outcome = await self.check(
+                previous, nft_metadata_uri, previous.get("sent_at")
+            )
+            # Keep what identifies the earlier transaction for later checks
+            outcome = {
+                **{
+                    field: previous[field]
+                    for field in ("tx_hash", "signer", "nonce")
+                    if previous.get(field) is not None
+                },
+                **outcome,
+            }
+            if outcome["status"] == NOT_LANDED:
+                # Close the earlier attempt so this run can claim the mint
+                await self.ledger.arecord(image_cid, "minted", outcome, metadata_hash)
+                continue
+            if outcome["status"] == LANDED:
+                print(f"An earlier mint landed ({outcome['reason']}), skipping.")
+            else:
+                print(f"An earlier mint is unconfirmed ({outcome['reason']}).")
+            await self.ledger.arecord(image_cid, "minted", outcome, metadata_hash)
+            return outcome
 
     async def ainvoke(self, state, config=None):
         print("Minting and registering IP...")
 
-        # Get the terms data from the previous message
-        terms_data = None
-        for message in reversed(state["messages"]):
-            if (
-                isinstance(message, AIMessage)
-                and hasattr(message, "additional_kwargs")
-                and "terms_data" in message.additional_kwargs
-            ):
-                terms_data = message.additional_kwargs["terms_data"]
-                break
-
-        if not terms_data:
+        terms = state.get("terms")
+        if not terms:
             return {
                 "messages": [
                     AIMessage(
@@ -35,42 +281,33 @@ class MintRegisterIP:
                 ]
             }
 
+        # Terms may be negotiated in parallel with metadata creation, so
+        # both are checked here
+        registration_metadata = state.get("registration_metadata")
+        if not registration_metadata:
+            return {
+                "messages": [
+                    AIMessage(
+                        content="Failed to extract registration metadata from previous steps."
+                    )
+                ]
+            }
+
         try:
             # Extract the parameters
-            commercial_rev_share = terms_data["commercial_rev_share"]
-            derivatives_allowed = terms_data["derivatives_allowed"]
-            registration_metadata = terms_data["registration_metadata"]
+            commercial_rev_share = terms["commercial_rev_share"]
+            derivatives_allowed = terms["derivatives_allowed"]
 
             # Fix the metadata format - ensure hashes have 0x prefix
-            fixed_metadata = {}
-            if registration_metadata:
-                fixed_metadata = {
-                    "ip_metadata_uri": registration_metadata.get("ip_metadata_uri", ""),
-                    "ip_metadata_hash": registration_metadata.get(
-                        "ip_metadata_hash", ""
-                    ),
-                    "nft_metadata_uri": registration_metadata.get(
-                        "nft_metadata_uri", ""
-                    ),
-                    "nft_metadata_hash": registration_metadata.get(
-                        "nft_metadata_hash", ""
-                    ),
-                }
-
-                # Add 0x prefix to hashes if missing
-                if "ip_metadata_hash" in fixed_metadata and not fixed_metadata[
-                    "ip_metadata_hash"
-                ].startswith("0x"):
-                    fixed_metadata["ip_metadata_hash"] = (
-                        "0x" + fixed_metadata["ip_metadata_hash"]
-                    )
-
-                if "nft_metadata_hash" in fixed_metadata and not fixed_metadata[
-                    "nft_metadata_hash"
-                ].startswith("0x"):
-                    fixed_metadata["nft_metadata_hash"] = (
-                        "0x" + fixed_metadata["nft_metadata_hash"]
-                    )
+            fixed_metadata = {
+                "ip_metadata_uri": registration_metadata.get("ip_metadata_uri", ""),
+                "ip_metadata_hash": registration_metadata.get("ip_metadata_hash", ""),
+                "nft_metadata_uri": registration_metadata.get("nft_metadata_uri", ""),
+                "nft_metadata_hash": registration_metadata.get("nft_metadata_hash", ""),
+            }
+            for key in ["ip_metadata_hash", "nft_metadata_hash"]:
+                if not fixed_metadata[key].startswith("0x"):
+                    fixed_metadata[key] = "0x" + fixed_metadata[key]
 
             # Convert parameters to strings as expected by the tool
             tool_args = {
@@ -79,87 +316,88 @@ class MintRegisterIP:
                 "registration_metadata": fixed_metadata,
             }
 
+            key = ledger_key(state) if self.ledger is not None else None
+            if key is not None:
+                previous = await self.claim(
+                    key, tool_args, fixed_metadata["nft_metadata_uri"]
+                )
+                if previous is not None:
+                    minting_data = {
+                        "ip_id": previous.get("ip_id"),
+                        "license_terms_ids": previous.get("license_terms_ids", []),
+                        "tx_hash": previous.get("tx_hash"),
+                        "status": previous["status"],
+                        "signer": previous.get("signer"),
+                    }
+                    return {
+                        "messages": [
+                            AIMessage(
+                                content="Mint taken from the ledger: "
+                                + json.dumps(minting_data)
+                            )
+                        ],
+                        "minting_data": minting_data,
+                    }
+
             # Call the mint_and_register_ip_with_terms tool
-            result = await self.mint_register_ip_tool.ainvoke(tool_args)
+            result, parsed = await self.mint(tool_args, key)
 
-            # Check if there was an error related to derivatives
+            # The SDK rejects derivative attribution without derivatives
+            # before sending anything, so this retry cannot double mint
             if (
                 "Cannot add derivative attribution when derivative use is disabled"
                 in result
             ):
-                # Retry with derivatives allowed
                 tool_args["derivatives_allowed"] = "true"
-                result = await self.mint_register_ip_tool.ainvoke(tool_args)
-
-            ip_id = None
-            tx_hash = None
-            license_terms_ids = []
-
-            # Extract IP ID
-            ip_id_match = re.search(r"IP ID: (0x[a-fA-F0-9]+)", result)
-            if ip_id_match:
-                ip_id = ip_id_match.group(1)
+                count_retry()
+                result, parsed = await self.mint(tool_args, key)
+
+            status = LANDED if parsed["ip_id"] else None
+            retries = 0
+            while status is None:
+                outcome = await self.check(parsed, fixed_metadata["nft_metadata_uri"])
+                if outcome["status"] == LANDED:
+                    print(f"Mint landed despite the error ({outcome['reason']})")
+                    parsed.update(
+                        ip_id=outcome["ip_id"],
+                        tx_hash=outcome["tx_hash"],
+                        license_terms_ids=outcome["license_terms_ids"],
+                    )
+                    status = LANDED
+                elif outcome["status"] == NOT_LANDED and retries < self.max_retries:
+                    print(f"Mint did not land ({outcome['reason']}), retrying...")
+                    retries += 1
+                    count_retry()
+                    result, parsed = await self.mint(tool_args, key)
+                    if parsed["ip_id"]:
+                        status = LANDED
+                else:
+                    # Not retried: either proven failed with no retries left,
+                    # or unknown, where a retry could mint the IP twice
+                    print(f"Mint not confirmed ({outcome['reason']}); not retrying.")
+                    status = outcome["status"]
+                    result = f"{result}\nMint status: {status} ({outcome['reason']})"
+
+            if parsed["ip_id"]:
                 # Print the IP link in the requested format
-                print(f"\n@https://aeneid.explorer.story.foundation/ipa/{ip_id}")
-
-            # Extract Transaction Hash
-            tx_hash_match = re.search(r"Transaction Hash: ([a-fA-F0-9]+)", result)
-            if tx_hash_match:
-                tx_hash = tx_hash_match.group(1)
+                print(
+                    f"\n@https://aeneid.explorer.story.foundation/ipa/{parsed['ip_id']}"
+                )
+            if parsed["tx_hash"]:
                 # Print the transaction link in the requested format
-                print(f"@https://aeneid.storyscan.xyz/tx/0x{tx_hash}")
-
-            # Extract License Terms IDs
-            license_terms_match = re.search(r"License Terms IDs: \[(.*?)\]", result)
-            if license_terms_match:
-                terms_str = license_terms_match.group(1)
-                # Parse the comma-separated list
-                if terms_str:
-                    license_terms_ids = [
-                        int(term.strip())
-                        for term in terms_str.split(",")
-                        if term.strip().isdigit()
-                    ]
-
-            # If we still don't have an IP ID, the minting failed
-            if not ip_id:
-                # Try one more time with more reasonable defaults and fixed metadata format
-                tool_args = {
-                    "commercial_rev_share": "15",
-                    "derivatives_allowed": "true",
-                    "registration_metadata": fixed_metadata,
-                }
-
-                print(f"\n--- Final Retry Arguments ---")
-                print(json.dumps(tool_args, indent=2))
-                print("----------------------------\n")
-
-                result = await self.mint_register_ip_tool.ainvoke(tool_args)
-
-                # Extract IP ID again
-                ip_id_match = re.search(r"IP ID: (0x[a-fA-F0-9]+)", result)
-                if ip_id_match:
-                    ip_id = ip_id_match.group(1)
-                    # Print the IP link in the requested format
-                    print(f"\n@https://aeneid.explorer.story.foundation/ipa/{ip_id}")
-
-                # Extract Transaction Hash again
-                tx_hash_match = re.search(r"Transaction Hash: ([a-fA-F0-9]+)", result)
-                if tx_hash_match:
-                    tx_hash = tx_hash_match.group(1)
-                    # Print the transaction link in the requested format
-                    print(f"@https://aeneid.storyscan.xyz/tx/0x{tx_hash}")
-
-                # Extract License Terms IDs again
-                license_terms_match = re.search(r"License Terms IDs: \[(.*?)\]", result)
-                if license_terms_match:
-                    terms_str = license_terms_match.group(1)
-                    if terms_str:
-                        license_terms_ids = [
-                            int(term.strip())
-                            for term in terms_str.split(",")
-                            if term.strip().isdigit()
-                        ]
+                print(f"@https://aeneid.storyscan.xyz/tx/0x{parsed['tx_hash']}")
+
+            minting_data = {
+                "ip_id": parsed["ip_id"],
+                "license_terms_ids": parsed["license_terms_ids"],
+                "tx_hash": parsed["tx_hash"],
+                "status": status,
+                "signer": parsed.get("signer"),
+                # Lets a later run prove an unconfirmed mint can never land
+                "nonce": parsed.get("nonce"),
+            }
+            if key is not None:
+                await self.ledger.arecord(key[0], "minted", minting_data, key[1])
 
             return {
                 "messages": [
@@ -167,15 +405,9 @@ class MintRegisterIP:
                         content=result,
                         name="mint_and_register_ip_with_terms",
                         tool_call_id=str(uuid.uuid4()),
-                        additional_kwargs={
-                            "minting_data": {
-                                "ip_id": ip_id,
-                                "license_terms_ids": license_terms_ids,
-                                "tx_hash": tx_hash,
-                            }
-                        },
                     )
-                ]
+                ],
+                "minting_data": minting_data,
             }
 
         except Exception as e:
@@ -195,24 +427,55 @@ class MintRegisterIP:
 
 
 class MintLicenseTokens:
-    """Node for minting license tokens for the IP."""
-
-    def __init__(self, mint_license_tokens_tool):
+    """Node for minting license tokens for the IP.
+
+    With a ledger, tokens already minted for the same image and metadata
+    are taken from it instead of being minted again. With a NonceManager,
+    the tokens are minted with a nonce allocated from it; with a
+    SignerPool, by the least loaded funded signer, which license_data
+    records.
+    """
+
+    def __init__(
+        self, mint_license_tokens_tool, ledger=None, nonces=None, signers=None
+    ):
         self.mint_license_tokens_tool = mint_license_tokens_tool
+        self.ledger = ledger
+        self.nonces = nonces
+        self.signers = signers
+
+    async def call(self, tool, nonces, tool_args):
+        nonce = None
+        if nonces is not None:
+            nonce = await nonces.allocate()
+            tool_args = {**tool_args, "nonce": nonce}
+        # The transaction may have been sent if the call raises or is
+        # cancelled; the nonce then stays pending
+        parsed = {"tx_hash": None, "error": None}
+        try:
+            result = await tool.ainvoke(tool_args)
+            if nonce is not None:
+                parsed = parse_tool_result(result)
+        finally:
+            if nonce is not None:
+                nonces.settle(nonce, parsed["tx_hash"], parsed["error"])
+        return result
+
+    async def send(self, tool_args):
+        """The tool result and the signer that sent it, if there is a pool."""
+        if self.signers is None:
+            tool = self.mint_license_tokens_tool
+            return await self.call(tool, self.nonces, tool_args), None
+        async with self.signers.acquire() as signer:
+            result = await self.call(
+                signer.tools["mint_license_tokens"], signer.nonces, tool_args
+            )
+        return result, signer.address
 
     async def ainvoke(self, state, config=None):
         print("Minting license tokens...")
 
-        # Get the minting data from the previous message
-        minting_data = None
-        for message in reversed(state["messages"]):
-            if (
-                isinstance(message, ToolMessage)
-                and hasattr(message, "additional_kwargs")
-                and "minting_data" in message.additional_kwargs
-            ):
-                minting_data = message.additional_kwargs["minting_data"]
-                break
+        minting_data = state.get("minting_data")
 
         if (
             not minting_data
@@ -245,8 +508,30 @@ class MintLicenseTokens:
                     ]
                 }
 
+            key = ledger_key(state) if self.ledger is not None else None
+            if key is not None:
+                previous = await self.ledger.alatest(
+                    key[0], "license_tokens_minted", key[1]
+                )
+                if previous and previous.get("license_token_ids"):
+                    print("License tokens already minted for this IP, skipping.")
+                    license_data = {
+                        "license_token_ids": previous["license_token_ids"],
+                        "tx_hash": previous.get("tx_hash"),
+                        "signer": previous.get("signer"),
+                    }
+                    return {
+                        "messages": [
+                            AIMessage(
+                                content="License tokens taken from the ledger: "
+                                + json.dumps(license_data)
+                            )
+                        ],
+                        "license_data": license_data,
+                    }
+
             # Call the mint_license_tokens tool
-            result = await self.mint_license_tokens_tool.ainvoke(
+            result, signer = await self.send(
                 {"licensor_ip_id": ip_id, "license_terms_id": license_terms_id}
             )
 
@@ -255,12 +540,23 @@ class MintLicenseTokens:
                 f"\n--- Mint License Tokens Tool Result ---\n{result}\n----------------------------"
             )
 
-            # Extract Transaction Hash for license token
-            tx_hash_match = re.search(r"Transaction Hash: ([a-fA-F0-9]+)", result)
-            if tx_hash_match:
-                tx_hash = tx_hash_match.group(1)
+            parsed = parse_tool_result(result)
+            if parsed["tx_hash"]:
                 # Print the transaction link in the requested format
-                print(f"@https://aeneid.storyscan.xyz/tx/0x{tx_hash}")
+                print(f"@https://aeneid.storyscan.xyz/tx/0x{parsed['tx_hash']}")
+
+            license_data = {
+                "license_token_ids": parsed["license_token_ids"],
+                "tx_hash": parsed["tx_hash"],
+                "signer": signer,
+            }
+            if key is not None and license_data["license_token_ids"]:
+                await self.ledger.arecord(
+                    key[0],
+                    "license_tokens_minted",
+                    {"ip_id": ip_id, **license_data},
+                    key[1],
+                )
 
             return {
                 "messages": [
@@ -269,7 +565,8 @@ class MintLicenseTokens:
                         name="mint_license_tokens",
                         tool_call_id=str(uuid.uuid4()),
                     )
-                ]
+                ],
+                "license_data": license_data,
             }
 
         except Exception as e:
@@ -284,11 +581,21 @@ class MintLicenseTokens:
             }
 
 
-def create_mint_register_ip_node(mint_register_ip_tool):
+def create_mint_register_ip_node(
+    mint_register_ip_tool, chain=None, ledger=None, nonces=None, signers=None
+):
     """Create a callable node for minting and registering IP."""
-    return RunnableLambda(MintRegisterIP(mint_register_ip_tool).ainvoke)
+    return RunnableLambda(
+        MintRegisterIP(
+            mint_register_ip_tool, chain, ledger=ledger, nonces=nonces, signers=signers
+        ).ainvoke
+    )
 
 
-def create_mint_license_tokens_node(mint_license_tokens_tool):
+def create_mint_license_tokens_node(
+    mint_license_tokens_tool, ledger=None, nonces=None, signers=None
+):
     """Create a callable node for minting license tokens."""
-    return RunnableLambda(MintLicenseTokens(mint_license_tokens_tool).ainvoke)
+    return RunnableLambda(
+        MintLicenseTokens(mint_license_tokens_tool, ledger, nonces, signers).ainvoke
+    )
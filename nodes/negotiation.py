@@ -1,128 +1,281 @@
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableLambda
 from langgraph.types import interrupt
-import json
+from loguru import logger
+from textwrap import dedent
 
+from utils.speculation import thread_id_from
+from utils.term_model import record_accepted_terms
+from utils.term_rules import TermRules
 
-class NegotiateTerms:
-    """Node for negotiating IP licensing terms with the user."""
 
-    def __init__(self, simple_model):
+NEGOTIATION_MODES = ("interactive", "rules")
+
+
+# Shared system prompt; the explanation and evaluation requests append the
+# asset's description and the chosen terms after their own instructions.
+
+# Create a prompt for negotiation
+NEGOTIATION_PROMPT = dedent(
+    """\
+    You are a helpful IP licensing assistant. You need to negotiate fair terms for this digital artwork.
+
+    For commercial revenue share:
+    - Range is 0-100%
+    - 0% means the creator gets no revenue from commercial use
+    - 100% means the creator gets all revenue from commercial use
+    - Typical range is 5-20% for most digital art
+    - Higher quality, unique art can command 15-30%
+    - Consider the uniqueness and quality of the artwork
+
+    For derivatives allowed:
+    - This is a yes/no decision
+    - If yes, others can create derivative works
+    - If no, the artwork cannot be modified
+    - Most digital art allows derivatives with proper attribution
+    - Consider if the artwork has unique elements worth protecting
+
+    Your goal is to help the user understand these terms and reach a fair agreement.
+    Start by explaining these options and suggesting reasonable defaults based on the artwork.
+    DO NOT use markdown formatting in your response.
+    Keep your explanation concise and user-friendly.
+    """
+)
+
+EXPLAIN_TERMS_INSTRUCTIONS = dedent(
+    """\
+    An artwork has been created and uploaded to IPFS.
+
+    We need to set terms for this IP before minting:
+
+    1. Commercial Revenue Share: What percentage of revenue should the creator receive when this IP is used commercially?
+    2. Derivatives Allowed: Should others be allowed to create derivative works based on this IP?
+
+    Please explain these options to the user and suggest reasonable defaults.
+    """
+)
+
+EVALUATION_INSTRUCTIONS = dedent(
+    """\
+    The user has selected terms for their digital artwork, listed at the end.
+
+    Are these terms reasonable? If not, please provide specific feedback on why they might not be optimal
+    and what you would recommend instead. Be honest but tactful.
+
+    For commercial revenue share:
+    - If it's very low (0-5%), suggest they might be undervaluing their work
+    - If it's very high (>50%), explain that this might discourage commercial use
+    - If it's extremely high (>80%), strongly advise that this could prevent any commercial adoption
+
+    For derivatives:
+    - If they've disallowed derivatives, explain the potential benefits of allowing them
+    - If they've allowed derivatives but the artwork is highly unique, mention they might want to consider restrictions
+
+    Only suggest changes if the terms are significantly outside reasonable ranges.
+    DO NOT use markdown formatting in your response.
+    """
+)
+
+
+async def explain_terms(simple_model, prompt):
+    """Ask the LLM to explain the licensing terms and suggest defaults."""
+    # Get the original image description for context
+    original_description = f"Generate {prompt}"
+
+    # First message to explain terms and suggest defaults
+    initial_message = HumanMessage(
+        content=EXPLAIN_TERMS_INSTRUCTIONS + f"\nDescription: {original_description}"
+    )
+
+    # Get initial explanation from the LLM
+    explanation = await simple_model.ainvoke(
+        [SystemMessage(content=NEGOTIATION_PROMPT), initial_message]
+    )
+    return explanation.content
+
+
+async def evaluate_terms(
+    simple_model, prompt, commercial_rev_share, derivatives_allowed
+):
+    """Ask the LLM for feedback on the terms the user chose."""
+    original_description = f"Generate {prompt}"
+
+    # Prepare a message for the LLM to evaluate the user's choices
+    evaluation_message = HumanMessage(
+        content=EVALUATION_INSTRUCTIONS
+        + f"\nCommercial Revenue Share: {commercial_rev_share}%"
+        + f"\nDerivatives Allowed: {'Yes' if derivatives_allowed else 'No'}"
+        + f"\nOriginal artwork description: {original_description}"
+    )
+
+    # Get evaluation from the LLM
+    evaluation = await simple_model.ainvoke(
+        [SystemMessage(content=NEGOTIATION_PROMPT), evaluation_message]
+    )
+    return evaluation.content
+
+
+def terms_set(commercial_rev_share, derivatives_allowed, note=None):
+    """State update recording the final terms for the minting node."""
+    content = f"""
+        Terms have been set for this IP:
+        - Commercial Revenue Share: {commercial_rev_share}%
+        - Derivatives Allowed: {"Yes" if derivatives_allowed else "No"}
+
+        These terms will be attached when the IP is minted.
+    """
+    if note:
+        content += f"\n        Note: {note}\n"
+    return {
+        "messages": [AIMessage(content=content)],
+        "terms": {
+            "commercial_rev_share": commercial_rev_share,
+            "derivatives_allowed": derivatives_allowed,
+        },
+    }
+
+
+class NegotiateTerms:
+    """Node for negotiating IP licensing terms with the user.
+
+    In "interactive" mode the user sets the terms through interrupts, with
+    an LLM explanation and, only for terms outside the reasonable range, an
+    LLM evaluation. In "rules" mode, meant for unattended runs, TermRules
+    decides the terms from the prompt and any requested_terms in the state,
+    without interrupts or LLM calls.
+
+    With a recommender (a TermModel), the interactive defaults come from it
+    instead of the category rules, and the terms the user accepts are
+    appended to the history it is trained on. Terms in requested_terms
+    take precedence over both as the defaults offered to the user.
+    """
+
+    def __init__(
+        self,
+        simple_model,
+        prefetcher=None,
+        mode="interactive",
+        rules=None,
+        recommender=None,
+        record_history=True,
+    ):
+        if mode not in NEGOTIATION_MODES:
+            raise ValueError(
+                f"Unknown negotiation mode {mode!r}, "
+                f"expected one of {NEGOTIATION_MODES}"
+            )
         self.simple_model = simple_model
+        self.prefetcher = prefetcher
+        self.mode = mode
+        self.rules = rules or TermRules()
+        self.recommender = recommender
+        self.record_history = record_history
+
+    def apply_rules(self, state):
+        print("Applying term rules...")
+        prompt = state.get("prompt", "")
+        terms = self.rules.apply(prompt, state.get("requested_terms"))
+        if terms["suggests_changes"]:
+            logger.warning(
+                f"Terms for '{prompt}' are in the {terms['band']} band: {terms['advice']}"
+            )
+        return terms_set(
+            terms["commercial_rev_share"],
+            terms["derivatives_allowed"],
+            terms["advice"],
+        )
+
+    def accept(
+        self, state, thread_id, attributes, commercial_rev_share, derivatives_allowed
+    ):
+        """Finish an interactive negotiation with the terms the user chose."""
+        if self.prefetcher is not None:
+            self.prefetcher.discard(thread_id)
+
+        if self.record_history:
+            try:
+                record_accepted_terms(
+                    state.get("prompt", ""),
+                    attributes,
+                    {
+                        "commercial_rev_share": commercial_rev_share,
+                        "derivatives_allowed": derivatives_allowed,
+                    },
+                )
+            except OSError as e:
+                logger.warning(f"Could not record accepted terms: {e}")
+
+        # Store the negotiated terms for the minting node
+        return terms_set(commercial_rev_share, derivatives_allowed)
 
     async def ainvoke(self, state, config=None):
-        # Check if this is the first negotiation or a subsequent one
-        is_first_negotiation = True
-        for message in state["messages"]:
-            if (
-                isinstance(message, AIMessage)
-                and "Terms have been set for this IP:" in message.content
-            ):
-                is_first_negotiation = False
-                break
+        if self.mode == "rules":
+            return self.apply_rules(state)
 
-        if is_first_negotiation:
+        # Check if this is the first negotiation or a subsequent one
+        if state.get("terms") is None:
             print("Negotiating terms...")
         else:
             print("Deliberating...")
 
-        # Get the registration metadata from the previous message
-        registration_metadata = None
-        for message in reversed(state["messages"]):
-            if (
-                isinstance(message, ToolMessage)
-                and message.name == "create_ip_metadata"
-            ):
-                if "Registration metadata for minting:" in message.content:
-                    metadata_section = message.content.split(
-                        "Registration metadata for minting:"
-                    )[1].strip()
-
-                    try:
-                        registration_metadata = json.loads(metadata_section)
-                        break
-                    except json.JSONDecodeError:
-                        pass
-
-        if not registration_metadata:
-            return {
-                "messages": [
-                    AIMessage(
-                        content="Failed to extract registration metadata from previous steps."
-                    )
-                ]
-            }
-
-        # Get the original image description for context
-        original_description = ""
-        for message in state["messages"]:
-            if isinstance(message, HumanMessage) and "Generate" in message.content:
-                original_description = message.content
-                break
-
-        # Create a prompt for negotiation
-        negotiation_prompt = """
-            You are a helpful IP licensing assistant. You need to negotiate fair terms for this digital artwork.
-
-            For commercial revenue share:
-            - Range is 0-100%
-            - 0% means the creator gets no revenue from commercial use
-            - 100% means the creator gets all revenue from commercial use
-            - Typical range is 5-20% for most digital art
-            - Higher quality, unique art can command 15-30%
-            - Consider the uniqueness and quality of the artwork
-
-            For derivatives allowed:
-            - This is a yes/no decision
-            - If yes, others can create derivative works
-            - If no, the artwork cannot be modified
-            - Most digital art allows derivatives with proper attribution
-            - Consider if the artwork has unique elements worth protecting
-
-            Your goal is to help the user understand these terms and reach a fair agreement.
-            Start by explaining these options and suggesting reasonable defaults based on the artwork.
-            DO NOT use markdown formatting in your response.
-            Keep your explanation concise and user-friendly.
-        """
-
-        # First message to explain terms and suggest defaults
-        initial_message = HumanMessage(
-            content=f"""
-                The following artwork has been created and uploaded to IPFS:
-                Description: {original_description}
-
-                We need to set terms for this IP before minting:
-
-                1. Commercial Revenue Share: What percentage of revenue should the creator receive when this IP is used commercially?
-                2. Derivatives Allowed: Should others be allowed to create derivative works based on this IP?
-
-                Please explain these options to the user and suggest reasonable defaults.
-            """
-        )
-
-        # Get initial explanation from the LLM
-        explanation = await self.simple_model.ainvoke(
-            [SystemMessage(content=negotiation_prompt), initial_message]
-        )
+        # Use the explanation started during human review, if there is one.
+        # It is kept until the terms are set, so resuming the interrupts
+        # below does not ask the LLM again
+        prompt = state.get("prompt", "")
+        thread_id = thread_id_from(config)
+        explanation = None
+        if self.prefetcher is not None:
+            self.prefetcher.start(
+                thread_id,
+                "terms_explanation",
+                prompt,
+                lambda: explain_terms(self.simple_model, prompt),
+            )
+            explanation = await self.prefetcher.take(
+                thread_id, "terms_explanation", prompt, keep=True
+            )
+        if explanation is None:
+            explanation = await explain_terms(self.simple_model, prompt)
+
+        # Defaults for this artwork, learned from past choices when possible.
+        # The parallel graph drafts the metadata alongside this node, so the
+        # attributes come from the draft started during human review
+        attributes = (state.get("metadata") or {}).get("attributes")
+        if attributes is None and self.prefetcher is not None:
+            draft = await self.prefetcher.take(
+                thread_id, "metadata_draft", prompt, keep=True
+            )
+            attributes = (draft or {}).get("attributes")
+        if self.recommender is not None:
+            recommended = self.recommender.predict(prompt, attributes)
+        else:
+            recommended = self.rules.recommend(prompt)
+        # Terms requested up front, e.g. with an HTTP job, are proposed instead
+        requested = state.get("requested_terms") or {}
+        recommended = {
+            **recommended,
+            **{name: value for name, value in requested.items() if value is not None},
+        }
+        default_rev_share = recommended["commercial_rev_share"]
 
         # Ask the user for their preferences
         human_review = interrupt(
             {
                 "question": "Please set the terms for your IP",
-                "explanation": explanation.content,
+                "explanation": explanation,
                 "fields": [
                     {
                         "name": "commercial_rev_share",
                         "type": "slider",
                         "min": 0,
                         "max": 100,
-                        "default": 15,
+                        "default": default_rev_share,
                         "label": "Commercial Revenue Share (%)",
                     },
                     {
                         "name": "derivatives_allowed",
                         "type": "boolean",
-                        "default": True,
+                        "default": recommended["derivatives_allowed"],
                         "label": "Allow Derivative Works",
                     },
                 ],
@@ -130,8 +283,12 @@ class NegotiateTerms:
         )
 
         # Get the user's choices
-        commercial_rev_share = human_review.get("commercial_rev_share", 15)
-        derivatives_allowed = human_review.get("derivatives_allowed", True)
+        commercial_rev_share = human_review.get(
+            "commercial_rev_share", default_rev_share
+        )
+        derivatives_allowed = human_review.get(
+            "derivatives_allowed", recommended["derivatives_allowed"]
+        )
 
         # Validate the commercial_rev_share is within bounds
         if (
@@ -139,75 +296,41 @@ class NegotiateTerms:
             or commercial_rev_share < 0
             or commercial_rev_share > 100
         ):
-            commercial_rev_share = 15  # Default to 15% if invalid
-
-        # Prepare a message for the LLM to evaluate the user's choices
-        evaluation_message = HumanMessage(
-            content=f"""
-                The user has selected the following terms for their digital artwork:
-                - Commercial Revenue Share: {commercial_rev_share}%
-                - Derivatives Allowed: {"Yes" if derivatives_allowed else "No"}
-
-                Original artwork description: {original_description}
-
-                Are these terms reasonable? If not, please provide specific feedback on why they might not be optimal 
-                and what you would recommend instead. Be honest but tactful.
-
-                For commercial revenue share:
-                - If it's very low (0-5%), suggest they might be undervaluing their work
-                - If it's very high (>50%), explain that this might discourage commercial use
-                - If it's extremely high (>80%), strongly advise that this could prevent any commercial adoption
-
-                For derivatives:
-                - If they've disallowed derivatives, explain the potential benefits of allowing them
-                - If they've allowed derivatives but the artwork is highly unique, mention they might want to consider restrictions
-
-                Only suggest changes if the terms are significantly outside reasonable ranges.
-                DO NOT use markdown formatting in your response.
-            """
-        )
-
-        # Get evaluation from the LLM
-        evaluation = await self.simple_model.ainvoke(
-            [SystemMessage(content=negotiation_prompt), evaluation_message]
-        )
-
-        # Check if the LLM suggests changes - only if terms are outside reasonable ranges
-        suggests_changes = False
+            commercial_rev_share = default_rev_share  # Default if invalid
 
-        # For commercial revenue share, only suggest changes if outside 5-30% range
-        if commercial_rev_share < 5 or commercial_rev_share > 50:
-            suggests_changes = True
+        # Only terms outside the reasonable 5-50% range get feedback
+        suggests_changes = self.rules.evaluate(commercial_rev_share)[
+            "suggests_changes"
+        ]
 
         # If the terms are reasonable, skip the feedback step
         if not suggests_changes:
-            # Store the negotiated terms and registration metadata for the next node
-            return {
-                "messages": [
-                    AIMessage(
-                        content=f"""
-                        Terms have been set for this IP:
-                        - Commercial Revenue Share: {commercial_rev_share}%
-                        - Derivatives Allowed: {"Yes" if derivatives_allowed else "No"}
-
-                        Registration metadata is ready for minting.
-                    """,
-                        additional_kwargs={
-                            "terms_data": {
-                                "commercial_rev_share": commercial_rev_share,
-                                "derivatives_allowed": derivatives_allowed,
-                                "registration_metadata": registration_metadata,
-                            }
-                        },
-                    )
-                ]
-            }
+            return self.accept(
+                state, thread_id, attributes, commercial_rev_share, derivatives_allowed
+            )
+
+        # Get evaluation from the LLM; this is only worth a call when the user
+        # is going to read the feedback, and is kept across the resumes below
+        evaluation = None
+        evaluation_key = (prompt, commercial_rev_share, derivatives_allowed)
+        if self.prefetcher is not None:
+            self.prefetcher.start(
+                thread_id,
+                "terms_evaluation",
+                evaluation_key,
+                lambda: evaluate_terms(self.simple_model, *evaluation_key),
+            )
+            evaluation = await self.prefetcher.take(
+                thread_id, "terms_evaluation", evaluation_key, keep=True
+            )
+        if evaluation is None:
+            evaluation = await evaluate_terms(self.simple_model, *evaluation_key)
 
         # Only ask for feedback if the terms are outside reasonable ranges
         feedback_review = interrupt(
             {
                 "question": "The AI has some feedback on your chosen terms",
-                "explanation": evaluation.content,
+                "explanation": evaluation,
                 "fields": [
                     {
                         "name": "adjust_terms",
@@ -259,31 +382,17 @@ class NegotiateTerms:
                 or commercial_rev_share < 0
                 or commercial_rev_share > 100
             ):
-                commercial_rev_share = 15  # Default to 15% if invalid
-
-        # Store the negotiated terms and registration metadata for the next node
-        return {
-            "messages": [
-                AIMessage(
-                    content=f"""
-                        Terms have been set for this IP:
-                        - Commercial Revenue Share: {commercial_rev_share}%
-                        - Derivatives Allowed: {"Yes" if derivatives_allowed else "No"}
-
-                        Registration metadata is ready for minting.
-                """,
-                    additional_kwargs={
-                        "terms_data": {
-                            "commercial_rev_share": commercial_rev_share,
-                            "derivatives_allowed": derivatives_allowed,
-                            "registration_metadata": registration_metadata,
-                        }
-                    },
-                )
-            ]
-        }
+                commercial_rev_share = default_rev_share  # Default if invalid
+
+        return self.accept(
+            state, thread_id, attributes, commercial_rev_share, derivatives_allowed
+        )
 
 
-def create_negotiate_terms_node(simple_model):
+def create_negotiate_terms_node(
+    simple_model, prefetcher=None, mode="interactive", rules=None, recommender=None
+):
     """Create a callable node for negotiating terms."""
-    return RunnableLambda(NegotiateTerms(simple_model).ainvoke)
+    return RunnableLambda(
+        NegotiateTerms(simple_model, prefetcher, mode, rules, recommender).ainvoke
+    )
@@ -1,23 +1,85 @@
 from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableLambda
+from loguru import logger
+import asyncio
 import uuid
 
 
+async def fetch_images(blob_store, image_urls):
+    """Download generated images into the blob store before their URLs expire."""
+    if blob_store is None:
+        return [None] * len(image_urls)
+
+    async def fetch(url):
+        try:
+            return await blob_store.fetch(url)
+        except Exception as e:
+            logger.warning(f"Could not fetch generated image {url}: {e}")
+            return None
+
+    return await asyncio.gather(*(fetch(url) for url in image_urls))
+
+
 class RunTool:
     """Node for running tools based on LLM tool calls."""
 
-    def __init__(self, tools_dict):
+    def __init__(self, tools_dict, num_candidates=1, blob_store=None, local_urls=True):
         self.tools = tools_dict
+        self.num_candidates = num_candidates
+        self.blob_store = blob_store
+        # Whether the upload can read the file:// URLs of cached images
+        self.local_urls = local_urls
+
+    async def generate_candidates(self, tool, args):
+        """Generate several image variants concurrently for a single review round."""
+        # Every variant after the first skips the cache, which would otherwise
+        # hand back the same image for the same prompt
+        variant_args = [args] + [
+            {**args, "use_cache": False} for _ in range(self.num_candidates - 1)
+        ]
+        results = await asyncio.gather(
+            *(tool.ainvoke(a) for a in variant_args), return_exceptions=True
+        )
+
+        image_urls = [
+            result.split("Generated image URL: ")[1].strip()
+            for result in results
+            if isinstance(result, str) and "Generated image URL: " in result
+        ]
+        if not image_urls:
+            # Surface the first failure the same way a single generation would
+            first = results[0]
+            if isinstance(first, Exception):
+                raise first
+            return str(first), []
+
+        return f"Generated image URL: {image_urls[0]}", image_urls
 
     async def ainvoke(self, state, config=None):
         new_messages = []
+        updates = {}
         last_message = state["messages"][-1]
 
+        # An image was already shown and rejected: a cached one would bring
+        # back the very image the feedback was about
+        regenerating = any(
+            isinstance(message, ToolMessage)
+            and message.name == "generate_image"
+            and "Generated image URL: " in str(message.content)
+            for message in state["messages"]
+        )
+
         for tool_call in last_message.tool_calls:
             try:
                 tool_name = tool_call["name"]
                 if tool_name in self.tools:
                     tool = self.tools[tool_name]
+                    image_urls = []
+                    args = tool_call["args"]
+                    if tool_name == "generate_image" and regenerating:
+                        args = {**args, "use_cache": False}
+                    if tool_name == "generate_image" and not self.local_urls:
+                        args = {**args, "local": False}
 
                     # Extract just the string value for image_data if that's the parameter
                     if (
@@ -27,8 +89,27 @@ class RunTool:
                         # Make sure we're passing just the URL string, not a complex object
                         image_url = tool_call["args"]["image_data"]
                         result = await tool.ainvoke({"image_data": image_url})
+                    elif tool_name == "generate_image" and self.num_candidates > 1:
+                        result, image_urls = await self.generate_candidates(
+                            tool, args
+                        )
                     else:
-                        result = await tool.ainvoke(tool_call["args"])
+                        result = await tool.ainvoke(args)
+                        if (
+                            tool_name == "generate_image"
+                            and isinstance(result, str)
+                            and "Generated image URL: " in result
+                        ):
+                            image_urls = [
+                                result.split("Generated image URL: ")[1].strip()
+                            ]
+
+                    if image_urls:
+                        # Fetch eagerly, the review may outlive the DALL-E URLs
+                        updates["image_urls"] = image_urls
+                        updates["image_cids"] = await fetch_images(
+                            self.blob_store, image_urls
+                        )
 
                     # Make sure result is a string
                     if not isinstance(result, str):
@@ -59,35 +140,96 @@ class RunTool:
                     )
                 )
 
-        return {"messages": new_messages}
+        return {"messages": new_messages, **updates}
 
 
 class RunIPFSTool:
     """Node specifically for running the IPFS upload tool."""
 
-    def __init__(self, upload_to_ipfs_tool):
+    def __init__(
+        self, upload_to_ipfs_tool, blob_store=None, ledger=None, pinata_client=None
+    ):
         self.upload_to_ipfs_tool = upload_to_ipfs_tool
+        self.blob_store = blob_store
+        self.ledger = ledger
+        self.pinata_client = pinata_client
+
+    async def upload(self, image_url, image_cid):
+        """Upload an image, skipping it when its CID has already been pinned."""
+        if self.blob_store is None:
+            return await self.upload_to_ipfs_tool.ainvoke({"image_data": image_url})
+
+        if image_cid is None:
+            try:
+                image_cid = await self.blob_store.fetch(image_url)
+            except Exception as e:
+                logger.warning(f"Could not fetch image {image_url}: {e}")
+
+        pinned_uri = self.blob_store.pinned_uri(image_cid)
+        if pinned_uri:
+            print("Image already pinned, skipping upload.")
+            return f"Successfully uploaded image to IPFS: {pinned_uri}"
+
+        if self.pinata_client is not None and self.blob_store.has(image_cid):
+            # Pin the local copy as-is rather than fetching the URL again
+            data = await asyncio.to_thread(self.blob_store.path(image_cid).read_bytes)
+            ipfs_uri = await self.pinata_client.pin_bytes(
+                data, f"{image_cid}.png", "image/png"
+            )
+            result = f"Successfully uploaded image to IPFS: {ipfs_uri}"
+        else:
+            # The MCP tool only takes the image's URL, and fetches it itself
+            if image_url.startswith("file://"):
+                raise ValueError(
+                    f"Cannot upload local image {image_url} without PINATA_JWT"
+                )
+            result = await self.upload_to_ipfs_tool.ainvoke({"image_data": image_url})
+
+        if (
+            image_cid
+            and isinstance(result, str)
+            and "Successfully uploaded image to IPFS:" in result
+        ):
+            ipfs_uri = result.split("Successfully uploaded image to IPFS: ")[1].strip()
+            # Only a pin of the exact stored bytes may stand in for them later
+            if ipfs_uri.removeprefix("ipfs://") == image_cid:
+                self.blob_store.record_pin(image_cid, ipfs_uri)
+            else:
+                logger.warning(
+                    f"Pinned image {ipfs_uri} does not match local CID {image_cid}"
+                )
+        return result
 
     async def ainvoke(self, state, config=None):
         new_messages = []
+        updates = {}
         last_message = state["messages"][-1]
 
         for tool_call in last_message.tool_calls:
             try:
-                # Extract just the string value for image_data if that's the parameter
-                if "image_data" in tool_call["args"]:
-                    # Make sure we're passing just the URL string, not a complex object
-                    image_url = tool_call["args"]["image_data"]
-                    result = await self.upload_to_ipfs_tool.ainvoke(
-                        {"image_data": image_url}
-                    )
-                else:
-                    result = await self.upload_to_ipfs_tool.ainvoke(tool_call["args"])
+                # The approved image comes from the state, the tool call only
+                # records it in the conversation
+                image_url = state.get("image_url") or tool_call["args"].get(
+                    "image_data"
+                )
+                result = await self.upload(image_url, state.get("image_cid"))
 
                 # Make sure result is a string
                 if not isinstance(result, str):
                     result = str(result)
 
+                if "Successfully uploaded image to IPFS:" in result:
+                    updates["ipfs_uri"] = result.split(
+                        "Successfully uploaded image to IPFS: "
+                    )[1].strip()
+                    # Repeat uploads are already skipped through the blob
+                    # store pins; the ledger keeps the asset's full history
+                    image_cid = state.get("image_cid")
+                    if self.ledger is not None and image_cid:
+                        await self.ledger.arecord(
+                            image_cid, "uploaded", {"ipfs_uri": updates["ipfs_uri"]}
+                        )
+
                 new_messages.append(
                     ToolMessage(
                         content=result,
@@ -105,14 +247,27 @@ class RunIPFSTool:
                     )
                 )
 
-        return {"messages": new_messages}
+        return {"messages": new_messages, **updates}
+
 
+def create_run_tool_node(
+    tools_dict, num_candidates=1, blob_store=None, local_urls=True
+):
+    """Create a callable node for running tools.
 
-def create_run_tool_node(tools_dict):
-    """Create a callable node for running tools."""
-    return RunnableLambda(RunTool(tools_dict).ainvoke)
+    Pass local_urls=False when the generated image's URL must be fetchable
+    by the upload tool, so cached images are only reused while their DALL-E
+    URL is still valid.
+    """
+    return RunnableLambda(
+        RunTool(tools_dict, num_candidates, blob_store, local_urls).ainvoke
+    )
 
 
-def create_run_ipfs_tool_node(upload_to_ipfs_tool):
+def create_run_ipfs_tool_node(
+    upload_to_ipfs_tool, blob_store=None, ledger=None, pinata_client=None
+):
     """Create a callable node for running the IPFS upload tool."""
-    return RunnableLambda(RunIPFSTool(upload_to_ipfs_tool).ainvoke)
+    return RunnableLambda(
+        RunIPFSTool(upload_to_ipfs_tool, blob_store, ledger, pinata_client).ainvoke
+    )
@@ -0,0 +1,86 @@
+"""Evaluate the term recommender against held-out accepted-terms history.
+
+The history is shuffled with a fixed seed and split; the model is trained on
+the first part and scored on the rest, next to the category rules and the
+old constant default (15%, derivatives allowed) as baselines.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.term_model import TermModel, load_history  # noqa: E402
+from utils.term_rules import TermRules  # noqa: E402
+
+
+def score(label, predict, records, tolerance):
+    errors = []
+    within = 0
+    derivatives_correct = 0
+    for record in records:
+        predicted = predict(record)
+        error = abs(predicted["commercial_rev_share"] - record["commercial_rev_share"])
+        errors.append(error)
+        within += error <= tolerance
+        derivatives_correct += (
+            predicted["derivatives_allowed"] == record["derivatives_allowed"]
+        )
+    print(
+        f"{label:<12} rev share MAE={statistics.mean(errors):6.2f} "
+        f"within ±{tolerance}={within / len(records):6.1%} "
+        f"derivatives accuracy={derivatives_correct / len(records):6.1%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", help="Accepted-terms JSONL file")
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--tolerance", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--l2", type=float, default=1.0)
+    args = parser.parse_args()
+
+    records = load_history(args.history)
+    random.Random(args.seed).shuffle(records)
+    split = int(len(records) * (1 - args.holdout))
+    train, test = records[:split], records[split:]
+    if not train or not test:
+        sys.exit(f"Not enough history to split ({len(records)} records)")
+
+    started = time.perf_counter()
+    model = TermModel.fit(train, l2=args.l2)
+    print(
+        f"Trained on {len(train)} records in {time.perf_counter() - started:.2f}s, "
+        f"evaluating on {len(test)}"
+    )
+
+    rules = TermRules()
+    score(
+        "constant",
+        lambda r: {"commercial_rev_share": 15, "derivatives_allowed": True},
+        test,
+        args.tolerance,
+    )
+    score("rules", lambda r: rules.recommend(r["prompt"]), test, args.tolerance)
+    score(
+        "model",
+        lambda r: model.predict(r["prompt"], r.get("attributes")),
+        test,
+        args.tolerance,
+    )
+
+    started = time.perf_counter()
+    for record in test:
+        model.predict(record["prompt"], record.get("attributes"))
+    per_call = (time.perf_counter() - started) / len(test)
+    print(f"Prediction latency: {per_call * 1e6:.1f}µs per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Train the term recommender on the accepted-terms history and save it.
+
+The history is appended to by interactive negotiations (TERMS_HISTORY_PATH,
+default .cache/terms_history.jsonl); the model is written to TERM_MODEL_PATH
+(default .cache/term_model.npz) and picked up by create_workflow_graph.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.term_model import TermModel, load_history  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", help="Accepted-terms JSONL file")
+    parser.add_argument("--output", help="Where to save the model")
+    parser.add_argument("--l2", type=float, default=1.0, help="Regularization")
+    parser.add_argument(
+        "--min-records",
+        type=int,
+        default=20,
+        help="Refuse to train on fewer accepted terms than this",
+    )
+    args = parser.parse_args()
+
+    records = load_history(args.history)
+    if len(records) < args.min_records:
+        sys.exit(
+            f"Only {len(records)} accepted terms in the history, "
+            f"need at least {args.min_records}"
+        )
+
+    model = TermModel.fit(records, l2=args.l2)
+    path = model.save(args.output)
+    print(f"Trained on {len(records)} accepted terms, saved {path}")
+    print(f"Model size: {path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
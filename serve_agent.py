@@ -0,0 +1,125 @@
+import argparse
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import uvicorn
+from dotenv import load_dotenv
+
+from graph.workflow import create_workflow_graph
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools
+from tools.mcp_pool import MCPSessionPool
+from tools.signer_pool import SignerPool
+from utils.chain import ChainClient
+from utils.helpers import create_memory_saver
+from utils.job_service import (
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_QUEUED,
+    JobService,
+    create_app,
+)
+from utils.llm_cache import DiskLLMCache
+from utils.nonces import nonce_manager_from_env
+from utils.speculation import Prefetcher
+
+load_dotenv()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve the IP creation workflow over HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help="Threads running the graph at once",
+    )
+    parser.add_argument(
+        "--max-queued",
+        type=int,
+        default=DEFAULT_MAX_QUEUED,
+        help="Jobs waiting for a slot before new ones get 429",
+    )
+    parser.add_argument(
+        "--mcp-sessions",
+        type=int,
+        default=4,
+        help="Number of warm story-sdk MCP server processes",
+    )
+    parser.add_argument(
+        "--sessions-per-signer",
+        type=int,
+        default=2,
+        help="MCP server processes per key when WALLET_PRIVATE_KEYS is set",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Image variants generated per review round",
+    )
+    parser.add_argument(
+        "--negotiation",
+        choices=["interactive", "rules"],
+        default="interactive",
+        help="Ask for the terms through an interrupt, or set them by rules",
+    )
+    return parser.parse_args()
+
+
+def service_lifespan(args):
+    """Start the shared clients and the JobService for the app's lifetime."""
+
+    @asynccontextmanager
+    async def lifespan(app):
+        chain = ChainClient.from_env()
+        nonces = nonce_manager_from_env(chain, max_in_flight=args.mcp_sessions)
+        async with AsyncExitStack() as stack:
+            if nonces is not None:
+                # Stops the gap watcher however the service shuts down
+                stack.push_async_callback(nonces.close)
+            pool = await stack.enter_async_context(
+                MCPSessionPool(size=args.mcp_sessions)
+            )
+            signers = SignerPool.from_env(
+                chain, sessions_per_signer=args.sessions_per_signer
+            )
+            if signers is not None:
+                await stack.enter_async_context(signers)
+            memory = stack.enter_context(create_memory_saver())
+
+            # Shared with the service, which drops finished jobs' prefetches
+            prefetcher = Prefetcher()
+            graph = create_workflow_graph(
+                get_specific_tools(await get_ipfs_tools(pool)),
+                memory=memory,
+                num_candidates=args.candidates,
+                llm_cache=DiskLLMCache(),
+                negotiation=args.negotiation,
+                chain=chain,
+                nonces=nonces,
+                signers=signers,
+                prefetcher=prefetcher,
+            )
+            app.state.service = await stack.enter_async_context(
+                JobService(
+                    graph,
+                    max_in_flight=args.max_in_flight,
+                    max_queued=args.max_queued,
+                    prefetcher=prefetcher,
+                )
+            )
+            print(f"Serving the workflow on http://{args.host}:{args.port}")
+            yield
+
+    return lifespan
+
+
+def main():
+    args = parse_args()
+    uvicorn.run(create_app(service_lifespan(args)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
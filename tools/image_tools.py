@@ -1,17 +1,131 @@
-from langchain_core.tools import tool
+from langchain_core.tools import InjectedToolArg, StructuredTool, tool
 from langchain_community.utilities.dalle_image_generator import DallEAPIWrapper
 from langgraph.types import interrupt
 from loguru import logger
+from openai import AsyncOpenAI
+from typing import Annotated
+import asyncio
+import httpx
 
+from utils.image_cache import ImageCache
 
-@tool
-def generate_image(prompt: str) -> str:
-    """Generate an image using DALL-E 3 based on the prompt."""
-    dalle = DallEAPIWrapper(model="dall-e-3")
+image_cache = ImageCache()
+
+# Shared async clients, created on first use so importing this module does not
+# require an API key or a running event loop.
+_openai_client = None
+_download_client = None
+
+
+def get_openai_client():
+    """Return the process-wide AsyncOpenAI client."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(timeout=120.0, max_retries=2)
+    return _openai_client
+
+
+def get_download_client():
+    """Return the process-wide HTTP client used to fetch generated images."""
+    global _download_client
+    if _download_client is None:
+        _download_client = httpx.AsyncClient(
+            timeout=60.0, limits=httpx.Limits(max_connections=64)
+        )
+    return _download_client
+
+
+def generate_image_url(
+    prompt, model="dall-e-3", size="1024x1024", use_cache=True, local=True
+):
+    """Generate an image with DALL-E, reusing a cached generation when possible.
+
+    A cache hit is a file:// URL; callers that cannot read local files pass
+    local=False to only get DALL-E URLs.
+    """
+    if use_cache:
+        entry = image_cache.get(prompt, model, size, local)
+        if entry:
+            logger.info(f"Image cache hit for prompt: {prompt}")
+            return entry["url"]
+
+    dalle = DallEAPIWrapper(model=model, size=size)
     image_url = dalle.run(prompt)
+
+    if use_cache and image_url.startswith("http"):
+        try:
+            response = httpx.get(image_url, timeout=60)
+            response.raise_for_status()
+            image_cache.put(prompt, model, size, response.content, image_url)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not cache generated image: {e}")
+
+    return image_url
+
+
+async def agenerate_image_url(
+    prompt, model="dall-e-3", size="1024x1024", use_cache=True, local=True
+):
+    """Async version of generate_image_url that never blocks the event loop.
+
+    Cancelling the calling task aborts the in-flight OpenAI request, and
+    nothing is written to the cache for an abandoned generation.
+    """
+    if use_cache:
+        entry = await asyncio.to_thread(
+            image_cache.get, prompt, model, size, local
+        )
+        if entry:
+            logger.info(f"Image cache hit for prompt: {prompt}")
+            return entry["url"]
+
+    response = await get_openai_client().images.generate(
+        model=model, prompt=prompt, size=size, n=1
+    )
+    image_url = response.data[0].url
+
+    if use_cache and image_url:
+        try:
+            download = await get_download_client().get(image_url)
+            download.raise_for_status()
+            await asyncio.to_thread(
+                image_cache.put, prompt, model, size, download.content, image_url
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not cache generated image: {e}")
+
+    return image_url
+
+
+def _generate_image(
+    prompt: str,
+    use_cache: bool = True,
+    local: Annotated[bool, InjectedToolArg] = True,
+) -> str:
+    """Generate an image using DALL-E 3 based on the prompt.
+
+    Set use_cache to false to force a new image for a prompt that was already
+    rendered, for example after the user rejected the previous one.
+    """
+    image_url = generate_image_url(prompt, use_cache=use_cache, local=local)
+    return f"Generated image URL: {image_url}"
+
+
+async def _agenerate_image(
+    prompt: str,
+    use_cache: bool = True,
+    local: Annotated[bool, InjectedToolArg] = True,
+) -> str:
+    image_url = await agenerate_image_url(prompt, use_cache=use_cache, local=local)
     return f"Generated image URL: {image_url}"
 
 
+# Sync callers get the blocking implementation, ainvoke gets the native async one
+generate_image = StructuredTool.from_function(
+    func=_generate_image, coroutine=_agenerate_image, name="generate_image"
+)
+
+
 @tool
 def get_human_feedback(image_url: str) -> str:
     """Get human feedback on whether to upload the image to IPFS."""
@@ -1,26 +1,14 @@
-from langchain_mcp_adapters.client import MultiServerMCPClient
+IPFS_TOOL_NAMES = [
+    "upload_image_to_ipfs",
+    "create_ip_metadata",
+    "mint_and_register_ip_with_terms",
+    "mint_license_tokens",
+]
 
 
-async def get_ipfs_tools():
-    """Get IPFS tools from the MCP server."""
-    async with MultiServerMCPClient() as client:
-        await client.connect_to_server(
-            "story_server",
-            command="python",
-            args=["../story-mcp-hub/story-sdk-mcp/server.py"],
-        )
-        ipfs_tools = [
-            tool
-            for tool in client.get_tools()
-            if tool.name
-            in [
-                "upload_image_to_ipfs",
-                "create_ip_metadata",
-                "mint_and_register_ip_with_terms",
-                "mint_license_tokens",
-            ]
-        ]
-        return ipfs_tools
+async def get_ipfs_tools(pool):
+    """Get IPFS tools backed by the warm sessions of an MCPSessionPool."""
+    return pool.get_tools(IPFS_TOOL_NAMES)
 
 
 def get_specific_tools(ipfs_tools):
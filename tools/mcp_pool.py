@@ -0,0 +1,280 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import partial
+
+from langchain_core.tools import StructuredTool
+from langchain_mcp_adapters.tools import load_mcp_tools
+from loguru import logger
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from utils.metrics import count_retry
+
+
+STORY_SERVER_COMMAND = "python"
+STORY_SERVER_ARGS = ["../story-mcp-hub/story-sdk-mcp/server.py"]
+
+# Tools that are safe to send again on a fresh session if the transport dies
+# mid-call. Minting tools are deliberately excluded to avoid double mints.
+RETRYABLE_TOOLS = {"upload_image_to_ipfs", "create_ip_metadata"}
+
+
+def as_text(result):
+    """Flatten an MCP tool result to the plain text the nodes parse."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (list, tuple)):
+        return "\n".join(
+            block.get("text", "") if isinstance(block, dict) else as_text(block)
+            for block in result
+        )
+    return str(result)
+
+
+class MCPSession:
+    """One warm MCP server process and the client session talking to it."""
+
+    def __init__(self, index, command, args, env=None, max_concurrency=1):
+        self.index = index
+        self.command = command
+        self.args = args
+        self.env = env
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.session = None
+        self.tools = {}
+        self._task = None
+        self._ready = None
+        self._stop = None
+        self._error = None
+
+    @property
+    def alive(self):
+        return (
+            self._task is not None
+            and not self._task.done()
+            and self.session is not None
+        )
+
+    async def start(self):
+        """Spawn the server and wait for the session to be initialized."""
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self):
+        # The stdio transport must be entered and exited in the same task,
+        # so every session lives in its own long-running task.
+        try:
+            async with AsyncExitStack() as stack:
+                server = StdioServerParameters(
+                    command=self.command, args=self.args, env=self.env
+                )
+                read, write = await stack.enter_async_context(stdio_client(server))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                self.tools = {tool.name: tool for tool in await load_mcp_tools(session)}
+                self.session = session
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+            logger.warning(f"MCP session {self.index} stopped: {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def ping(self, timeout):
+        """Return True if the server answers a ping within `timeout` seconds."""
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        """Stop the session task, which also terminates the server process."""
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await self._task
+        except Exception:
+            pass
+        self._task = None
+
+    @property
+    def busy(self):
+        """True while a live session is serving at least one call."""
+        return self.alive and self.in_flight > 0
+
+    @property
+    def saturated(self):
+        return self.in_flight >= self.max_concurrency
+
+    async def call_tool(self, name, arguments):
+        return as_text(await self.tools[name].ainvoke(arguments))
+
+
+class MCPSessionPool:
+    """Pool of long-lived MCP server sessions shared by all workflow threads.
+
+    Calls are routed to the least loaded healthy session. A background task
+    pings every idle session and restarts the ones that stop answering.
+    """
+
+    def __init__(
+        self,
+        size=2,
+        command=STORY_SERVER_COMMAND,
+        args=None,
+        env=None,
+        max_concurrency_per_session=1,
+        health_check_interval=30.0,
+        health_check_timeout=5.0,
+    ):
+        self.sessions = [
+            MCPSession(
+                index,
+                command,
+                list(args or STORY_SERVER_ARGS),
+                env=env,
+                max_concurrency=max_concurrency_per_session,
+            )
+            for index in range(size)
+        ]
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self._available = asyncio.Condition()
+        self._health_task = None
+        self._restart_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Start every server process and the health check loop.
+
+        If any session fails to start, the ones that did are shut down again
+        before the error is raised, so no server process is left behind.
+        """
+        results = await asyncio.gather(
+            *(session.start() for session in self.sessions), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await asyncio.gather(*(session.close() for session in self.sessions))
+            raise errors[0]
+        if self.health_check_interval:
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"MCP session pool started with {len(self.sessions)} sessions")
+
+    async def close(self):
+        """Stop health checks and shut every server down."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await asyncio.gather(*(session.close() for session in self.sessions))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_health()
+
+    async def check_health(self):
+        """Ping every idle session and restart the ones that do not answer.
+
+        A session with calls in flight counts as healthy: the server runs its
+        sync tools on its own event loop, so it cannot answer a ping while a
+        mint is waiting for its receipt, and restarting it would lose the
+        result of that transaction.
+        """
+        idle = [session for session in self.sessions if not session.busy]
+        results = await asyncio.gather(
+            *(session.ping(self.health_check_timeout) for session in idle)
+        )
+        for session, healthy in zip(idle, results):
+            if not healthy:
+                await self.restart(session)
+
+    async def restart(self, session):
+        """Replace a dead session with a fresh server process."""
+        async with self._restart_lock:
+            if session.busy or await session.ping(self.health_check_timeout):
+                return
+            logger.warning(f"Restarting MCP session {session.index}")
+            await session.close()
+            try:
+                await session.start()
+            except Exception as e:
+                logger.error(f"Could not restart MCP session {session.index}: {e}")
+        async with self._available:
+            self._available.notify_all()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Reserve the least loaded healthy session for one call."""
+        async with self._available:
+            while True:
+                candidates = [
+                    session
+                    for session in self.sessions
+                    if session.alive and not session.saturated
+                ]
+                if candidates:
+                    session = min(candidates, key=lambda s: s.in_flight)
+                    break
+                if not any(session.alive for session in self.sessions):
+                    raise RuntimeError("No MCP session is available")
+                await self._available.wait()
+            session.in_flight += 1
+        try:
+            yield session
+        finally:
+            session.in_flight -= 1
+            async with self._available:
+                self._available.notify()
+
+    async def call_tool(self, name, /, **arguments):
+        """Call an MCP tool on the least loaded session."""
+        async with self.acquire() as session:
+            try:
+                return await session.call_tool(name, arguments)
+            except Exception:
+                if session.alive or name not in RETRYABLE_TOOLS:
+                    raise
+                failed = session
+
+        # The transport died under an idempotent call: restart and try once more
+        await self.restart(failed)
+        count_retry()
+        async with self.acquire() as session:
+            return await session.call_tool(name, arguments)
+
+    def get_tools(self, names=None):
+        """Return LangChain tools that dispatch their calls across the pool."""
+        template = next(session for session in self.sessions if session.tools)
+        return [
+            StructuredTool(
+                name=tool.name,
+                description=tool.description,
+                args_schema=tool.args_schema,
+                coroutine=partial(self.call_tool, tool.name),
+            )
+            for tool in template.tools.values()
+            if names is None or tool.name in names
+        ]
@@ -0,0 +1,33 @@
+import os
+
+import httpx
+
+
+PINATA_API_URL = "https://api.pinata.cloud"
+
+
+class PinataClient:
+    """Minimal async client for pinning exact bytes to IPFS through Pinata."""
+
+    def __init__(self, jwt=None, base_url=PINATA_API_URL):
+        self.jwt = jwt or os.getenv("PINATA_JWT")
+        if not self.jwt:
+            raise ValueError("PINATA_JWT is not set")
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {self.jwt}"},
+            timeout=60.0,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def pin_bytes(self, data, filename, content_type="application/json"):
+        """Pin a file as-is (CIDv0) and return its ipfs:// URI."""
+        response = await self.client.post(
+            "/pinning/pinFileToIPFS",
+            files={"file": (filename, data, content_type)},
+            data={"pinataOptions": '{"cidVersion": 0}'},
+        )
+        response.raise_for_status()
+        return f"ipfs://{response.json()['IpfsHash']}"
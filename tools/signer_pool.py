@@ -0,0 +1,186 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from eth_account import Account
+from loguru import logger
+
+from tools.mcp_pool import STORY_SERVER_ARGS, STORY_SERVER_COMMAND, MCPSessionPool
+from utils.nonces import NonceManager, manage_nonces_from_env
+
+
+# Tools that send transactions, and so sign with the session's key
+SIGNING_TOOL_NAMES = ["mint_and_register_ip_with_terms", "mint_license_tokens"]
+
+# Signers holding less than this (0.01 IP) are not given mints
+MIN_BALANCE_WEI = 10**16
+# How long a balance read is trusted
+BALANCE_TTL_SECONDS = 60.0
+
+
+class NoFundedSignerError(RuntimeError):
+    pass
+
+
+class Signer:
+    """One key: the MCP sessions that sign with it, its nonces and balance."""
+
+    def __init__(self, index, private_key, pool, nonces=None):
+        self.index = index
+        self.address = Account.from_key(private_key).address
+        self.pool = pool
+        self.nonces = nonces
+        self.tools = {}
+        self.in_flight = 0
+        self.sent = 0
+        self.balance = None
+        self.balance_checked = 0.0
+
+
+class SignerPool:
+    """Spreads transactions over several funded signers.
+
+    Every key gets its own MCPSessionPool, started with the key as
+    WALLET_PRIVATE_KEY, and, if manage_nonces (by default MANAGE_NONCES) is
+    set, its own NonceManager; the mint tools must then accept a nonce.
+    acquire() hands out the funded signer with the fewest transactions in
+    flight; balances are read from the chain at most every balance_ttl
+    seconds, and signers below min_balance are skipped. Other keyword
+    arguments are passed to every MCPSessionPool.
+    """
+
+    def __init__(
+        self,
+        private_keys,
+        chain,
+        sessions_per_signer=1,
+        command=STORY_SERVER_COMMAND,
+        args=None,
+        env=None,
+        manage_nonces=None,
+        min_balance=MIN_BALANCE_WEI,
+        balance_ttl=BALANCE_TTL_SECONDS,
+        **pool_options,
+    ):
+        if not private_keys:
+            raise ValueError("SignerPool needs at least one private key")
+        if manage_nonces is None:
+            manage_nonces = manage_nonces_from_env()
+        self.chain = chain
+        self.min_balance = min_balance
+        self.balance_ttl = balance_ttl
+        self.signers = [
+            Signer(
+                index,
+                key,
+                MCPSessionPool(
+                    size=sessions_per_signer,
+                    command=command,
+                    args=list(args or STORY_SERVER_ARGS),
+                    env={**(env or os.environ), "WALLET_PRIVATE_KEY": key},
+                    **pool_options,
+                ),
+                (
+                    NonceManager(chain, key, max_in_flight=sessions_per_signer)
+                    if manage_nonces
+                    else None
+                ),
+            )
+            for index, key in enumerate(private_keys)
+        ]
+        self._by_address = {signer.address: signer for signer in self.signers}
+        self._refresh_lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, chain, **kwargs):
+        """A pool for the comma-separated WALLET_PRIVATE_KEYS, or None."""
+        keys = [
+            key.strip()
+            for key in os.getenv("WALLET_PRIVATE_KEYS", "").split(",")
+            if key.strip()
+        ]
+        return cls(keys, chain, **kwargs) if keys else None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Start every signer's MCP sessions.
+
+        If any signer's pool fails to start, the pools that did are shut
+        down again before the error is raised.
+        """
+        results = await asyncio.gather(
+            *(signer.pool.start() for signer in self.signers), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await asyncio.gather(*(signer.pool.close() for signer in self.signers))
+            raise errors[0]
+        for signer in self.signers:
+            signer.tools = {
+                tool.name: tool for tool in signer.pool.get_tools(SIGNING_TOOL_NAMES)
+            }
+        logger.info(f"Signer pool started with {len(self.signers)} signers")
+
+    async def close(self):
+        """Stop the nonce watchers and shut every signer's sessions down."""
+        for signer in self.signers:
+            if signer.nonces is not None:
+                await signer.nonces.close()
+        await asyncio.gather(*(signer.pool.close() for signer in self.signers))
+
+    def get(self, address):
+        """The signer with this address, or None."""
+        return self._by_address.get(address)
+
+    def expire_balance(self, address):
+        """Read a signer's balance again before its next transaction, e.g.
+        after it was refused for insufficient funds."""
+        signer = self.get(address)
+        if signer is not None:
+            signer.balance_checked = 0.0
+
+    async def refresh_balance(self, signer):
+        try:
+            signer.balance = await self.chain.w3.eth.get_balance(signer.address)
+        except Exception as e:
+            # Keep the last known balance rather than benching the signer
+            logger.warning(f"Could not read the balance of {signer.address}: {e}")
+        signer.balance_checked = time.monotonic()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Reserve the least loaded funded signer for one transaction."""
+        # One caller refreshes stale balances while the others wait for it
+        async with self._refresh_lock:
+            now = time.monotonic()
+            stale = [
+                signer
+                for signer in self.signers
+                if now - signer.balance_checked > self.balance_ttl
+            ]
+            if stale:
+                await asyncio.gather(*(self.refresh_balance(s) for s in stale))
+
+        funded = [
+            signer
+            for signer in self.signers
+            if signer.balance is None or signer.balance >= self.min_balance
+        ]
+        if not funded:
+            raise NoFundedSignerError(
+                f"insufficient funds: no signer holds {self.min_balance} wei"
+            )
+        signer = min(funded, key=lambda s: (s.in_flight, s.sent))
+        signer.in_flight += 1
+        signer.sent += 1
+        try:
+            yield signer
+        finally:
+            signer.in_flight -= 1
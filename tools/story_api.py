@@ -0,0 +1,103 @@
+import os
+
+import httpx
+
+
+DEFAULT_BASE_URL = "http://127.0.0.1:8000"
+
+# Per-endpoint timeouts in seconds. Minting waits for on-chain confirmation,
+# so it gets far more room than the IPFS and metadata calls.
+ENDPOINT_TIMEOUTS = {
+    "upload_image_to_ipfs": 60.0,
+    "create_ip_metadata": 30.0,
+    "mint_and_register_ip_with_terms": 180.0,
+    "mint_license_tokens": 180.0,
+}
+
+
+class StoryAPIError(Exception):
+    """Raised when the Story API server answers with a non-200 status."""
+
+    def __init__(self, endpoint, status_code, body):
+        super().__init__(f"{endpoint} failed with status {status_code}: {body}")
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.body = body
+
+
+class StoryAPIClient:
+    """Shared async client for the Story API server with keep-alive pooling."""
+
+    def __init__(
+        self,
+        base_url=None,
+        max_connections=100,
+        max_keepalive_connections=20,
+        timeouts=None,
+    ):
+        self.base_url = base_url or os.getenv("STORY_API_URL", DEFAULT_BASE_URL)
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=httpx.Timeout(30.0),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def post(self, endpoint, payload=None):
+        """POST a JSON payload to an endpoint and return the decoded body."""
+        response = await self.client.post(
+            f"/{endpoint}",
+            json=payload,
+            timeout=self.timeouts.get(endpoint, httpx.USE_CLIENT_DEFAULT),
+        )
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        if response.status_code != 200:
+            raise StoryAPIError(endpoint, response.status_code, body)
+        return body
+
+    async def upload_image_to_ipfs(self, image_data):
+        return await self.post("upload_image_to_ipfs", {"image_data": image_data})
+
+    async def create_ip_metadata(self, image_uri, name, description, attributes):
+        return await self.post(
+            "create_ip_metadata",
+            {
+                "image_uri": image_uri,
+                "name": name,
+                "description": description,
+                "attributes": attributes,
+            },
+        )
+
+    async def mint_and_register_ip_with_terms(
+        self, commercial_rev_share, derivatives_allowed, registration_metadata
+    ):
+        return await self.post(
+            "mint_and_register_ip_with_terms",
+            {
+                "commercial_rev_share": commercial_rev_share,
+                "derivatives_allowed": derivatives_allowed,
+                "registration_metadata": registration_metadata,
+            },
+        )
+
+    async def mint_license_tokens(self, licensor_ip_id, license_terms_id):
+        return await self.post(
+            "mint_license_tokens",
+            {"licensor_ip_id": licensor_ip_id, "license_terms_id": license_terms_id},
+        )
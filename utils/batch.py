@@ -0,0 +1,338 @@
+import asyncio
+import csv
+import json
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from utils.helpers import create_config, process_user_input
+from utils.interrupts import (
+    COMPLETED,
+    ERROR,
+    InterruptDispatcher,
+    PolicyResponder,
+    ThreadRun,
+)
+
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+
+
+def parse_bool(value, default):
+    """Parse a boolean manifest value, accepting CSV-style strings."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def row_problem(row):
+    """Why a manifest row cannot be run, or None if it can."""
+    prompt = row.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        return "no prompt"
+    rev_share = row.get("commercial_rev_share")
+    if rev_share not in (None, ""):
+        try:
+            valid = not isinstance(rev_share, bool) and 0 <= int(rev_share) <= 100
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            return f"commercial_rev_share {rev_share!r} is not an integer from 0 to 100"
+    for name in ("auto_approve", "derivatives_allowed"):
+        value = row.get(name)
+        if value not in (None, "") and not isinstance(value, bool):
+            if str(value).strip().lower() not in TRUE_VALUES | FALSE_VALUES:
+                return f"{name} {value!r} is not a boolean"
+    return None
+
+
+class ReviewPolicy:
+    """Answers the workflow interrupts for one manifest row without a human.
+
+    Terms left as None are not requested; the graph's term rules (or the
+    defaults offered by an interrupt) decide them.
+    """
+
+    def __init__(
+        self,
+        auto_approve=True,
+        commercial_rev_share=None,
+        derivatives_allowed=None,
+        max_prompt_retries=1,
+    ):
+        self.auto_approve = auto_approve
+        self.commercial_rev_share = commercial_rev_share
+        self.derivatives_allowed = derivatives_allowed
+        self.max_prompt_retries = max_prompt_retries
+        self.prompt_retries = 0
+
+    @classmethod
+    def from_row(cls, row, defaults=None):
+        """Build a policy from a manifest row, falling back to batch defaults."""
+        defaults = defaults or {}
+        rev_share = row.get("commercial_rev_share")
+        if rev_share in (None, ""):
+            rev_share = defaults.get("commercial_rev_share")
+        return cls(
+            auto_approve=parse_bool(
+                row.get("auto_approve"), defaults.get("auto_approve", True)
+            ),
+            commercial_rev_share=None if rev_share is None else int(rev_share),
+            derivatives_allowed=parse_bool(
+                row.get("derivatives_allowed"), defaults.get("derivatives_allowed")
+            ),
+            max_prompt_retries=int(defaults.get("max_prompt_retries", 1)),
+        )
+
+    def requested_terms(self):
+        """The terms this row asks for, for rule-based negotiation."""
+        terms = {
+            "commercial_rev_share": self.commercial_rev_share,
+            "derivatives_allowed": self.derivatives_allowed,
+        }
+        return {name: value for name, value in terms.items() if value is not None}
+
+    def answer(self, interrupt_data):
+        """Return the resume payload for an interrupt, or None to park the thread."""
+        if "image_url" in interrupt_data:
+            # Image review: approve, or leave the thread parked for a human
+            if self.auto_approve:
+                return {"action": "continue", "choice": 0}
+            return None
+
+        if "original_prompt" in interrupt_data:
+            # Failed generation: retry the same prompt a bounded number of times
+            if self.prompt_retries >= self.max_prompt_retries:
+                return None
+            self.prompt_retries += 1
+            return {"data": interrupt_data["original_prompt"]}
+
+        field_names = [field["name"] for field in interrupt_data.get("fields", [])]
+
+        if "commercial_rev_share" in field_names:
+            # Initial terms or term adjustment: the row's terms, or the defaults
+            # the node offers for anything the row leaves open
+            defaults = {
+                field["name"]: field.get("default")
+                for field in interrupt_data["fields"]
+            }
+            return {**defaults, **self.requested_terms()}
+
+        if "adjust_terms" in field_names:
+            # The row's terms are deliberate, keep them
+            return {"adjust_terms": False}
+
+        if field_names:
+            # Generic fields: accept the defaults offered by the node
+            return {
+                field["name"]: field.get("default")
+                for field in interrupt_data["fields"]
+            }
+
+        return None
+
+
+def load_manifest(path):
+    """Load manifest rows from a JSONL or CSV file.
+
+    A row that cannot be run (unparsable, no prompt, terms out of range)
+    is kept with the reason in row["invalid"]; run_row reports it as
+    failed instead of aborting the batch.
+    """
+    path = Path(path)
+    rows = []
+
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            rows = [dict(row) for row in csv.DictReader(f)]
+    else:
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = {"invalid": f"not valid JSON: {e}"}
+                if not isinstance(row, dict):
+                    row = {"invalid": "not a JSON object"}
+                rows.append(row)
+
+    for index, row in enumerate(rows):
+        row.setdefault("id", str(index))
+        problem = row.get("invalid") or row_problem(row)
+        if problem is not None:
+            logger.warning(f"Manifest row {row['id']} will fail: {problem}")
+            row["invalid"] = problem
+
+    return rows
+
+
+def extract_result(values):
+    """Collect the minting outputs recorded in the workflow state."""
+    minting_data = values.get("minting_data") or {}
+    license_data = values.get("license_data") or {}
+    return {
+        "terms": values.get("terms"),
+        "ip_id": minting_data.get("ip_id"),
+        "tx_hash": minting_data.get("tx_hash"),
+        "signer": minting_data.get("signer"),
+        "license_terms_ids": minting_data.get("license_terms_ids", []),
+        "license_token_ids": license_data.get("license_token_ids", []),
+    }
+
+
+async def run_row(
+    graph, row, defaults=None, prune_finished=True, dispatcher=None, thread_id=None
+):
+    """Drive one workflow thread to completion, answering interrupts by policy.
+
+    The thread runs on dispatcher, an InterruptDispatcher with a
+    PolicyResponder (one is created when not given), which resumes it with
+    the row's ReviewPolicy answers until it completes or a question is left
+    open and it parks.
+
+    With prune_finished, the checkpoints of a thread that completed or
+    failed are deleted once its result is read; parked threads and threads
+    that raised keep theirs so they can be resumed.
+
+    With thread_id the row runs on that thread. If the thread already has
+    checkpoints, e.g. left by a worker process that died, it carries on
+    from the last one instead of starting over.
+
+    A row load_manifest marked invalid is not run and comes back failed.
+    """
+    if row.get("invalid"):
+        return {
+            "id": row["id"],
+            "prompt": row.get("prompt"),
+            "thread_id": thread_id,
+            "status": "failed",
+            "error": f"invalid manifest row: {row['invalid']}",
+            **extract_result({}),
+            "timings": {},
+            "total_seconds": 0.0,
+        }
+
+    if dispatcher is None:
+        async with InterruptDispatcher(graph, PolicyResponder()) as dispatcher:
+            return await run_row(
+                graph, row, defaults, prune_finished, dispatcher, thread_id
+            )
+
+    policy = ReviewPolicy.from_row(row, defaults)
+    snapshot = None
+    if thread_id is None:
+        config = create_config()
+        thread_id = config["configurable"]["thread_id"]
+    else:
+        config = {"configurable": {"thread_id": thread_id}}
+        if graph.checkpointer:
+            snapshot = await graph.aget_state(config)
+
+    started = time.perf_counter()
+    if snapshot is not None and snapshot.values and not snapshot.next:
+        # Finished before its last owner reported it
+        run = ThreadRun(config)
+        run.status = COMPLETED
+    else:
+        dispatcher.responder.policies[thread_id] = policy
+        if snapshot is not None and snapshot.values:
+            # Older langgraph releases only list interrupts per task
+            interrupts = [i for task in snapshot.tasks for i in task.interrupts]
+            if interrupts:
+                dispatcher.adopt(
+                    config, interrupts[0].value, getattr(interrupts[0], "id", None)
+                )
+            else:
+                dispatcher.submit(None, config)
+        else:
+            command = {
+                **process_user_input(row["prompt"]),
+                "requested_terms": policy.requested_terms(),
+            }
+            dispatcher.submit(command, config)
+        run = await dispatcher.wait(thread_id)
+        dispatcher.forget(thread_id)
+        del dispatcher.responder.policies[thread_id]
+
+    status, error = run.status, run.error
+    result = extract_result({})
+    if status != ERROR:
+        try:
+            snapshot = await graph.aget_state(config)
+            result = extract_result(snapshot.values)
+            if status == COMPLETED and not result["ip_id"]:
+                status = "failed"
+        except Exception as e:
+            status, error = ERROR, str(e)
+
+    if prune_finished and status in (COMPLETED, "failed") and graph.checkpointer:
+        try:
+            await graph.checkpointer.adelete_thread(thread_id)
+        except Exception as e:
+            logger.warning(f"Could not delete the checkpoints of {thread_id}: {e}")
+
+    return {
+        "id": row["id"],
+        "prompt": row["prompt"],
+        "thread_id": thread_id,
+        "status": status,
+        "error": error,
+        **result,
+        "timings": run.timings,
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def run_batch(
+    graph, rows, output_path, concurrency=8, defaults=None, prune_finished=True
+):
+    """Run one workflow thread per row with at most `concurrency` in flight.
+
+    Every thread's interrupts go through one shared InterruptDispatcher.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    output_path = Path(output_path)
+    results = []
+
+    dispatcher = InterruptDispatcher(graph, PolicyResponder())
+
+    with output_path.open("a", encoding="utf-8") as output:
+
+        async def run_one(row):
+            async with semaphore:
+                try:
+                    record = await run_row(
+                        graph, row, defaults, prune_finished, dispatcher
+                    )
+                except Exception as e:
+                    # One row's failure must not abort the others
+                    record = {
+                        "id": row["id"],
+                        "prompt": row.get("prompt"),
+                        "status": ERROR,
+                        "error": str(e),
+                        "total_seconds": 0.0,
+                    }
+            async with write_lock:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                results.append(record)
+            print(f"[{record['id']}] {record['status']} in {record['total_seconds']}s")
+
+        async with dispatcher:
+            outcomes = await asyncio.gather(
+                *(run_one(row) for row in rows), return_exceptions=True
+            )
+    for row, outcome in zip(rows, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Could not record the result of row {row['id']}: {outcome}")
+
+    return results
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import httpx
+
+
+DEFAULT_BLOB_DIR = ".cache/blobs"
+
+# Defaults of `ipfs add` (and Pinata): CIDv0, 256 KiB fixed-size chunks,
+# dag-pb leaves and a balanced DAG with at most 174 links per node.
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number, payload):
+    """Encode a length-delimited protobuf field."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _base58(data):
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    leading_zeros = len(data) - len(data.lstrip(b"\0"))
+    return "1" * leading_zeros + encoded
+
+
+def _cid_v0(block):
+    return _base58(b"\x12\x20" + hashlib.sha256(block).digest())
+
+
+def _unixfs_file(data=None, filesize=0, blocksizes=()):
+    encoded = _uint_field(1, 2)  # Type: File
+    if data is not None:
+        encoded += _field(2, data)
+    encoded += _uint_field(3, filesize)
+    for size in blocksizes:
+        encoded += _uint_field(4, size)
+    return encoded
+
+
+def compute_cid(data):
+    """Compute the CIDv0 that `ipfs add` with default settings gives `data`."""
+    # Each node is (cid, serialized block, file bytes below it, cumulative size)
+    nodes = []
+    for offset in range(0, max(len(data), 1), CHUNK_SIZE):
+        chunk = data[offset : offset + CHUNK_SIZE]
+        block = _field(1, _unixfs_file(chunk, len(chunk)))
+        nodes.append((_cid_v0(block), block, len(chunk), len(block)))
+
+    while len(nodes) > 1:
+        parents = []
+        for start in range(0, len(nodes), MAX_LINKS):
+            children = nodes[start : start + MAX_LINKS]
+            # dag-pb puts links before data in its canonical encoding
+            links = b"".join(
+                _field(
+                    2,
+                    _field(1, b"\x12\x20" + hashlib.sha256(block).digest())
+                    + _field(2, b"")
+                    + _uint_field(3, tsize),
+                )
+                for _, block, _, tsize in children
+            )
+            filesize = sum(child[2] for child in children)
+            block = links + _field(
+                1, _unixfs_file(None, filesize, [child[2] for child in children])
+            )
+            tsize = len(block) + sum(child[3] for child in children)
+            parents.append((_cid_v0(block), block, filesize, tsize))
+        nodes = parents
+
+    return nodes[0][0]
+
+
+class BlobStore:
+    """Local content-addressed store for image bytes, keyed by IPFS CID.
+
+    Also keeps an append-only index of CIDs that have already been pinned,
+    so an identical image is never uploaded twice.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or os.getenv("BLOB_STORE_DIR", DEFAULT_BLOB_DIR))
+        self._pins = None
+        self._client = None
+
+    def path(self, cid):
+        return self.directory / cid
+
+    def has(self, cid):
+        return cid is not None and self.path(cid).exists()
+
+    def put(self, data):
+        """Store bytes under their CID and return the CID."""
+        cid = compute_cid(data)
+        path = self.path(cid)
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # A temp file of its own, as threads and worker processes may
+            # store the same image at once
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory, prefix=f".{cid}.", delete=False
+            ) as tmp:
+                tmp.write(data)
+            try:
+                os.replace(tmp.name, path)
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+        return cid
+
+    async def fetch(self, image_url):
+        """Download an image (or read a file:// URI) into the store."""
+        if image_url.startswith("file://"):
+            data = await asyncio.to_thread(Path(image_url[len("file://") :]).read_bytes)
+        else:
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=60.0)
+            response = await self._client.get(image_url)
+            response.raise_for_status()
+            data = response.content
+        return await asyncio.to_thread(self.put, data)
+
+    def _load_pins(self):
+        if self._pins is None:
+            self._pins = {}
+            try:
+                with (self.directory / "pins.jsonl").open(encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            pin = json.loads(line)
+                            self._pins[pin["cid"]] = pin["ipfs_uri"]
+            except FileNotFoundError:
+                pass
+        return self._pins
+
+    def pinned_uri(self, cid):
+        """The IPFS URI a blob was uploaded to, or None if it never was."""
+        if cid is None:
+            return None
+        return self._load_pins().get(cid)
+
+    def record_pin(self, cid, ipfs_uri):
+        """Remember that a blob has been uploaded."""
+        pins = self._load_pins()
+        if pins.get(cid) == ipfs_uri:
+            return
+        pins[cid] = ipfs_uri
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / "pins.jsonl").open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"cid": cid, "ipfs_uri": ipfs_uri}) + "\n")
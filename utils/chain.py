@@ -0,0 +1,265 @@
+import math
+import os
+import re
+import time
+
+from loguru import logger
+from web3 import AsyncWeb3
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+
+DEFAULT_RPC_URL = "https://aeneid.storyrpc.io"
+
+# Story core contract that emits IPRegistered (same address on Aeneid and
+# mainnet); STORY_IP_ASSET_REGISTRY overrides it
+IP_ASSET_REGISTRY = "0x77319B4031e6eF1250907aa00018B8B1c67a244b"
+
+# IPRegistered(address ipId, uint256 indexed chainId, address indexed
+# tokenContract, uint256 indexed tokenId, string name, string uri, uint256
+# registrationDate); uri is the NFT metadata URI the mint was given
+IP_REGISTERED_TOPIC = AsyncWeb3.keccak(
+    text="IPRegistered(address,uint256,address,uint256,string,string,uint256)"
+)
+# LicenseTermsAttached(address indexed caller, address indexed ipId,
+# address licenseTemplate, uint256 licenseTermsId)
+LICENSE_TERMS_ATTACHED_TOPIC = AsyncWeb3.keccak(
+    text="LicenseTermsAttached(address,address,address,uint256)"
+)
+
+# How far back to look for a registration whose response was lost. Story
+# makes a block about every 2.5 s, so 1000 blocks cover ~40 minutes.
+BLOCK_SECONDS = 2.5
+DEFAULT_LOOKBACK_BLOCKS = 1000
+# Public RPCs cap the block range of eth_getLogs
+MAX_LOOKBACK_BLOCKS = 10_000
+
+# A mint sent this long ago that has registered nothing is checked for proof
+# that it can no longer land; the SDK gives up on the receipt after 300 s
+PENDING_TIMEOUT_SECONDS = 600
+
+# Outcomes of check_mint
+LANDED = "landed"
+NOT_LANDED = "not_landed"
+UNKNOWN = "unknown"
+
+# Errors the SDK or the RPC node raise before a transaction is accepted, so
+# nothing can have been mined. "already known" is deliberately absent: it
+# means the transaction is in the mempool.
+REJECTED_BEFORE_SEND = [
+    "cannot add derivative attribution",
+    "insufficient funds",
+    "nonce too low",
+    "replacement transaction underpriced",
+    "intrinsic gas too low",
+    "gas required exceeds allowance",
+    # Failures of this process before it called the mint tool
+    "rejected before sending",
+]
+
+TX_HASH_PATTERN = re.compile(r"(?:0x)?([0-9a-fA-F]{64})")
+
+
+def tx_hash_in(text):
+    """The first transaction hash mentioned in a tool result or error, 0x-less."""
+    match = TX_HASH_PATTERN.search(text or "")
+    return match.group(1).lower() if match else None
+
+
+def rejected_before_send(error):
+    error = (error or "").lower()
+    return any(message in error for message in REJECTED_BEFORE_SEND)
+
+
+class ChainClient:
+    """Reads Story chain state to tell whether a mint actually landed.
+
+    STORY_RPC_URL overrides the public Aeneid RPC. Only reads are made; the
+    mint itself is still sent by the Story tools.
+    """
+
+    def __init__(
+        self,
+        rpc_url=None,
+        registry_address=None,
+        lookback_blocks=DEFAULT_LOOKBACK_BLOCKS,
+        receipt_timeout=60.0,
+    ):
+        self.rpc_url = rpc_url or os.getenv("STORY_RPC_URL", DEFAULT_RPC_URL)
+        self.registry_address = AsyncWeb3.to_checksum_address(
+            registry_address or os.getenv("STORY_IP_ASSET_REGISTRY", IP_ASSET_REGISTRY)
+        )
+        self.lookback_blocks = lookback_blocks
+        self.receipt_timeout = receipt_timeout
+        self.w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(self.rpc_url))
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """A client when the run is meant to reach the chain, else None.
+
+        That is when STORY_RPC_URL is set, or when MANAGE_NONCES or
+        WALLET_PRIVATE_KEYS are, as nonces and signer balances are read
+        from the chain anyway (the public RPC by default). Offline, mints
+        are left unchecked instead of timing out on the public RPC.
+        """
+        online = (
+            os.getenv("STORY_RPC_URL")
+            or os.getenv("WALLET_PRIVATE_KEYS", "").strip()
+            or os.getenv("MANAGE_NONCES", "").lower() in ("1", "true", "yes")
+        )
+        return cls(**kwargs) if online else None
+
+    async def receipt(self, tx_hash, timeout=None):
+        """The receipt of a transaction, waiting for it to be mined; None if it
+        is not mined within the timeout."""
+        try:
+            return await self.w3.eth.wait_for_transaction_receipt(
+                "0x" + tx_hash.removeprefix("0x"),
+                timeout=self.receipt_timeout if timeout is None else timeout,
+                poll_latency=1.0,
+            )
+        except TimeExhausted:
+            return None
+
+    def registration_from_receipt(self, receipt):
+        """IP ID and license terms IDs from the logs of a mint transaction."""
+        ip_id = None
+        license_terms_ids = []
+        for log in receipt["logs"]:
+            topics = log["topics"]
+            if not topics:
+                continue
+            if topics[0] == IP_REGISTERED_TOPIC and ip_id is None:
+                ip_id = self.w3.codec.decode(
+                    ["address", "string", "string", "uint256"], log["data"]
+                )[0]
+            elif topics[0] == LICENSE_TERMS_ATTACHED_TOPIC:
+                license_terms_ids.append(
+                    self.w3.codec.decode(["address", "uint256"], log["data"])[1]
+                )
+        return ip_id, license_terms_ids
+
+    async def find_registration(self, nft_metadata_uri, lookback_blocks=None):
+        """Hash of a recent transaction that registered an IP for this NFT
+        metadata URI, or None."""
+        latest = await self.w3.eth.block_number
+        lookback_blocks = lookback_blocks or self.lookback_blocks
+        logs = await self.w3.eth.get_logs(
+            {
+                "address": self.registry_address,
+                "topics": [IP_REGISTERED_TOPIC],
+                "fromBlock": max(0, latest - lookback_blocks),
+                "toBlock": latest,
+            }
+        )
+        for log in logs:
+            _, _, uri, _ = self.w3.codec.decode(
+                ["address", "string", "string", "uint256"], log["data"]
+            )
+            if uri == nft_metadata_uri:
+                return log["transactionHash"].hex().removeprefix("0x")
+        return None
+
+    async def superseded(self, tx_hash=None, nonce=None, sender=None):
+        """Why an unmined transaction can never be mined, or None if it still
+        might be (or that cannot be told).
+
+        The proof is the sender's mined transaction count passing the
+        transaction's nonce, which some other transaction then used. The
+        nonce and sender are read from the transaction itself when the node
+        still knows it; one still in the mempool may yet be mined.
+        """
+        if tx_hash:
+            try:
+                tx = await self.w3.eth.get_transaction(
+                    "0x" + tx_hash.removeprefix("0x")
+                )
+            except TransactionNotFound:
+                tx = None
+            if tx is not None:
+                if tx["blockNumber"] is not None:
+                    return None
+                nonce, sender = tx["nonce"], tx["from"]
+        if nonce is None or sender is None:
+            return None
+        mined = await self.w3.eth.get_transaction_count(
+            AsyncWeb3.to_checksum_address(sender), "latest"
+        )
+        if mined > nonce:
+            return f"nonce {nonce} of {sender} was used by another transaction"
+        return None
+
+    async def check_mint(
+        self,
+        nft_metadata_uri,
+        tx_hash=None,
+        error=None,
+        sent_at=None,
+        nonce=None,
+        sender=None,
+    ):
+        """Whether a mint without a usable result landed on chain.
+
+        Returns status (LANDED, NOT_LANDED or UNKNOWN), the reason, and for
+        landed mints the ip_id, tx_hash and license_terms_ids read from the
+        receipt. NOT_LANDED is only returned with proof: a reverted receipt,
+        an error raised before the transaction was sent, or, once no
+        registration has appeared PENDING_TIMEOUT_SECONDS after the mint was
+        sent (sent_at), its nonce (or that of sender) used by another
+        transaction. Time alone is no proof, since an underpriced
+        transaction can wait in the mempool for much longer.
+        """
+        # Every earlier attempt was proven not to land before it was retried,
+        # so an attempt rejected before sending means nothing was minted
+        if not tx_hash and rejected_before_send(error):
+            return {"status": NOT_LANDED, "reason": "rejected before sending"}
+
+        # Search back to when the mint was sent, not just the default window
+        lookback_blocks = self.lookback_blocks
+        age = time.time() - sent_at if sent_at else 0
+        if sent_at:
+            lookback_blocks += math.ceil(age / BLOCK_SECONDS)
+        if lookback_blocks > MAX_LOOKBACK_BLOCKS:
+            return {"status": UNKNOWN, "reason": "mint too old to check on chain"}
+
+        outcome = {"status": UNKNOWN, "reason": "no receipt or registration found"}
+        try:
+            if tx_hash:
+                receipt = await self.receipt(tx_hash)
+                if receipt is not None and receipt["status"] == 0:
+                    return {"status": NOT_LANDED, "reason": f"0x{tx_hash} reverted"}
+                if receipt is not None:
+                    ip_id, license_terms_ids = self.registration_from_receipt(receipt)
+                    if ip_id:
+                        return {
+                            "status": LANDED,
+                            "reason": f"receipt of 0x{tx_hash}",
+                            "ip_id": ip_id,
+                            "tx_hash": tx_hash,
+                            "license_terms_ids": license_terms_ids,
+                        }
+
+            # The response may have been lost after the transaction was sent
+            found = await self.find_registration(nft_metadata_uri, lookback_blocks)
+            if found:
+                receipt = await self.w3.eth.get_transaction_receipt("0x" + found)
+                ip_id, license_terms_ids = self.registration_from_receipt(receipt)
+                return {
+                    "status": LANDED,
+                    "reason": f"IPRegistered event in 0x{found}",
+                    "ip_id": ip_id,
+                    "tx_hash": found,
+                    "license_terms_ids": license_terms_ids,
+                }
+            if age > PENDING_TIMEOUT_SECONDS:
+                reason = await self.superseded(tx_hash, nonce, sender)
+                if reason:
+                    return {"status": NOT_LANDED, "reason": reason}
+                outcome["reason"] = (
+                    f"nothing registered {age / 60:.0f} min after sending, "
+                    "but the transaction may still be pending"
+                )
+        except Exception as e:
+            logger.warning(f"Could not check the mint on chain: {e}")
+            return {**outcome, "reason": f"chain check failed: {e}"}
+
+        return outcome
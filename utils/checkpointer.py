@@ -0,0 +1,422 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+
+DEFAULT_CHECKPOINT_PATH = ".cache/checkpoints.sqlite"
+# Checkpoints kept per thread and namespace; older ones are deleted
+DEFAULT_KEEP_LAST = 3
+# Writes are buffered this long and committed in one transaction
+DEFAULT_FLUSH_SECONDS = 0.05
+
+# Serialized values at least this large are stored zlib-compressed
+COMPRESS_MIN_BYTES = 512
+COMPRESSED_SUFFIX = "+zlib"
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """LangGraph checkpointer persisted in SQLite (WAL mode).
+
+    Checkpoints, channel values included, and pending writes are stored as
+    the serializer's msgpack, zlib-compressed above COMPRESS_MIN_BYTES.
+    put() and put_writes() only buffer; the buffer is committed in one
+    transaction flush_seconds later, before any read, and at once for an
+    interrupt, so a parked thread survives a restart. Only the last
+    keep_last checkpoints of each thread are kept (0 keeps them all);
+    delete_thread() drops a finished thread. CHECKPOINT_PATH and
+    CHECKPOINT_KEEP_LAST override the defaults.
+
+    The graph state has no DeltaChannel, so every checkpoint holds the full
+    channel values and no parent is needed to rebuild it.
+    """
+
+    def __init__(
+        self, path=None, keep_last=None, flush_seconds=DEFAULT_FLUSH_SECONDS, serde=None
+    ):
+        super().__init__(serde=serde)
+        self.path = Path(path or os.getenv("CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH))
+        if keep_last is None:
+            keep_last = int(os.getenv("CHECKPOINT_KEEP_LAST", DEFAULT_KEEP_LAST))
+        self.keep_last = keep_last or None
+        self.flush_seconds = flush_seconds
+
+        # Operations not yet committed, in call order
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._timer = None
+        # Held for the whole of a flush, so flushes commit in order
+        self._db_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; transactions are opened explicitly where needed
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Commits survive a crash of the process; only a power loss can
+        # undo the last ones
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, "
+            "checkpoint_id TEXT NOT NULL, parent_id TEXT, "
+            "type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, "
+            "checkpoint_id TEXT NOT NULL, task_id TEXT NOT NULL, "
+            "idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+            "type TEXT NOT NULL, value BLOB NOT NULL, task_path TEXT NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.to_thread(self.close)
+
+    # Serialization
+
+    def _dumps(self, value):
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return type_ + COMPRESSED_SUFFIX, zlib.compress(data)
+        return type_, data
+
+    def _loads(self, type_, data):
+        if type_.endswith(COMPRESSED_SUFFIX):
+            type_, data = type_[: -len(COMPRESSED_SUFFIX)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # Write buffer
+
+    def _buffer(self, op, flush_now=False):
+        with self._pending_lock:
+            self._pending.append(op)
+            if flush_now:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """Commit everything buffered in one transaction."""
+        with self._db_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return
+
+            touched = set()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for kind, rows in pending:
+                    if kind == "checkpoint":
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO checkpoints VALUES "
+                            "(?, ?, ?, ?, ?, ?, ?, ?)",
+                            rows,
+                        )
+                        touched.add(rows[:2])
+                    else:
+                        # Regular writes keep the first value stored for a
+                        # task; interrupts, errors and resumes replace it
+                        for row in rows:
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO writes VALUES "
+                                "(?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                                if row[4] < 0
+                                else "INSERT OR IGNORE INTO writes VALUES "
+                                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                row,
+                            )
+                if self.keep_last:
+                    for thread_id, checkpoint_ns in touched:
+                        self._trim(thread_id, checkpoint_ns, self.keep_last)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _trim(self, thread_id, checkpoint_ns, keep):
+        """Delete all but the newest `keep` checkpoints of a namespace."""
+        row = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, keep - 1),
+        ).fetchone()
+        if row is None:
+            return
+        # Checkpoint ids are time-ordered, so older means smaller
+        for table in ("checkpoints", "writes"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, row[0]),
+            )
+
+    # Reads
+
+    def _tuple(self, thread_id, checkpoint_ns, row):
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value, task_path, idx FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        # The order a super-step applies its tasks' writes in
+        writes.sort(key=lambda w: (w[4], w[0], w[5]))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self._loads(type_, checkpoint),
+            metadata=self._loads(metadata_type, metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self._loads(value_type, value))
+                for task_id, channel, value_type, value, _, _ in writes
+            ],
+        )
+
+    def get_tuple(self, config):
+        self.flush()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, "
+            "metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._db_lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            return self._tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        self.flush()
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+        if limit is not None and not filter:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._db_lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[4], row[5])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._db_lock:
+                item = self._tuple(thread_id, checkpoint_ns, row)
+            yield item
+
+    # Writes
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        self._buffer(
+            (
+                "checkpoint",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),  # parent
+                    *self._dumps(checkpoint),
+                    *self._dumps(get_checkpoint_metadata(config, metadata)),
+                ),
+            )
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self._dumps(value),
+                task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # Interrupts, errors and resumes are committed right away
+        self._buffer(("writes", rows), flush_now=any(row[4] < 0 for row in rows))
+
+    def delete_thread(self, thread_id):
+        """Delete every checkpoint and write of a thread."""
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("checkpoints", "writes"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def prune(self, thread_ids, *, strategy="keep_latest"):
+        """Keep only the latest checkpoint of each thread, or delete them."""
+        if strategy == "delete":
+            for thread_id in thread_ids:
+                self.delete_thread(thread_id)
+            return
+        if strategy != "keep_latest":
+            raise ValueError(f"Unknown prune strategy {strategy!r}")
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for thread_id in thread_ids:
+                    namespaces = self._conn.execute(
+                        "SELECT DISTINCT checkpoint_ns FROM checkpoints "
+                        "WHERE thread_id = ?",
+                        (thread_id,),
+                    ).fetchall()
+                    for (checkpoint_ns,) in namespaces:
+                        self._trim(thread_id, checkpoint_ns, 1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        """Commit what is buffered and close the database."""
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def thread_count(self):
+        """How many threads have checkpoints stored."""
+        self.flush()
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT thread_id) FROM checkpoints"
+            ).fetchone()[0]
+
+    # Async versions run the SQLite work off the event loop
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        if any(WRITES_IDX_MAP.get(channel, 0) < 0 for channel, _ in writes):
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+        else:
+            self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids, *, strategy="keep_latest"):
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    def get_next_version(self, current, channel):
+        # Same string versions as LangGraph's own savers
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
@@ -0,0 +1,132 @@
+import json
+import os
+
+import tiktoken
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from loguru import logger
+
+
+DEFAULT_MAX_TOKENS = 4000
+
+# Fixed per-message overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Rough characters per token, used when the encoding cannot be loaded
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """Counts chat message tokens with the model's tiktoken encoding."""
+
+    def __init__(self, model="gpt-4o"):
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken downloads encodings on first use, which fails offline
+            logger.warning(f"Could not load tiktoken encoding, estimating: {e}")
+            self.encoding = None
+
+    def count_text(self, text):
+        if self.encoding is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(self.encoding.encode(text))
+
+    def count_message(self, message):
+        tokens = MESSAGE_OVERHEAD_TOKENS
+        if isinstance(message.content, str):
+            tokens += self.count_text(message.content)
+        else:
+            tokens += self.count_text(json.dumps(message.content))
+        if getattr(message, "tool_calls", None):
+            tokens += self.count_text(json.dumps(message.tool_calls))
+        return tokens
+
+    def __call__(self, messages):
+        return sum(self.count_message(message) for message in messages)
+
+
+class ContextPolicy:
+    """Chooses the messages CallLLM sends, within a token budget.
+
+    The system prompt, the original request and the most recent round
+    (the last generation plus the feedback on it) are always kept. Older
+    regeneration rounds are reduced to one summary line each, and those
+    lines are dropped oldest first if the budget is still exceeded.
+    """
+
+    def __init__(self, max_tokens=None, keep_last_rounds=1, token_counter=None):
+        self.max_tokens = int(
+            max_tokens or os.getenv("CALL_LLM_MAX_TOKENS", DEFAULT_MAX_TOKENS)
+        )
+        self.keep_last_rounds = keep_last_rounds
+        self.count_tokens = token_counter or TokenCounter()
+
+    @staticmethod
+    def split_rounds(messages):
+        """Group messages into rounds that each start with an AI message."""
+        rounds = []
+        for message in messages:
+            if isinstance(message, AIMessage) or not rounds:
+                rounds.append([message])
+            else:
+                rounds[-1].append(message)
+        return rounds
+
+    @staticmethod
+    def summarize_round(round_messages):
+        """One line describing the prompt that was tried and the reaction to it."""
+        tried = []
+        feedback = []
+        for message in round_messages:
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                if "prompt" in tool_call["args"]:
+                    tried.append(tool_call["args"]["prompt"])
+            if isinstance(message, HumanMessage):
+                feedback.append(message.content)
+        if not tried and not feedback:
+            return None
+        line = f"- tried: {' | '.join(tried) or 'no image'}"
+        if feedback:
+            line += f" -> user said: {' | '.join(feedback)}"
+        return line
+
+    def select(self, messages):
+        """Return the messages to send for this call."""
+        system = []
+        index = 0
+        while index < len(messages) and isinstance(messages[index], SystemMessage):
+            system.append(messages[index])
+            index += 1
+
+        rest = messages[index:]
+        if len(rest) <= 1:
+            return list(messages)
+
+        original, history = rest[0], rest[1:]
+        rounds = self.split_rounds(history)
+        kept_rounds = rounds[-self.keep_last_rounds :] if self.keep_last_rounds else []
+        older_rounds = rounds[: len(rounds) - len(kept_rounds)]
+
+        kept = [message for round_messages in kept_rounds for message in round_messages]
+        summary_lines = [
+            line
+            for line in (self.summarize_round(r) for r in older_rounds)
+            if line
+        ]
+
+        while True:
+            selected = system + [original]
+            if summary_lines:
+                selected.append(
+                    HumanMessage(
+                        content="Earlier attempts (summarized):\n"
+                        + "\n".join(summary_lines)
+                    )
+                )
+            selected += kept
+            if self.count_tokens(selected) <= self.max_tokens or not summary_lines:
+                return selected
+            summary_lines.pop(0)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from utils.blob_store import BlobStore
+
+
+DEFAULT_CACHE_DIR = ".cache/images"
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# DALL-E image URLs expire an hour after generation
+DEFAULT_SOURCE_URL_TTL = 50 * 60
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace and case so trivially different prompts share a key."""
+    return " ".join(prompt.split()).casefold()
+
+
+def cache_key(prompt, model, size):
+    """Content address for a generation request."""
+    payload = json.dumps([normalize_prompt(prompt), model or "default", size])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """On-disk cache of generated images with size-bounded LRU eviction.
+
+    Each entry is a JSON metadata file named after the cache key that points
+    at the image's CID; the bytes themselves live in a blob store of the
+    cache's own (its blobs subdirectory by default), so eviction never
+    removes bytes the workflow's blob store still holds for a thread. Reads
+    bump the metadata mtime, which is the LRU clock. Hits are served from the
+    stored bytes, so entries outlive the DALL-E URL they were fetched from.
+    """
+
+    def __init__(
+        self, directory=None, max_bytes=None, blob_store=None, source_url_ttl=None
+    ):
+        self.directory = Path(
+            directory or os.getenv("IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        )
+        self.max_bytes = int(
+            max_bytes or os.getenv("IMAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        )
+        self.blob_store = blob_store or BlobStore(self.directory / "blobs")
+        self.source_url_ttl = float(
+            source_url_ttl
+            or os.getenv("IMAGE_SOURCE_URL_TTL", DEFAULT_SOURCE_URL_TTL)
+        )
+
+    def _meta_path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, prompt, model, size, local=True):
+        """Return the metadata of a cached generation, or None.
+
+        An entry's "url" is a file:// URL of the stored bytes. With
+        local=False, for callers that cannot read local files, it is the
+        DALL-E source_url instead, and entries whose source_url may have
+        expired are misses.
+        """
+        meta_path = self._meta_path(cache_key(prompt, model, size))
+        try:
+            with meta_path.open(encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not self.blob_store.has(entry.get("cid")):
+            meta_path.unlink(missing_ok=True)
+            return None
+        if not local and (
+            not entry.get("source_url")
+            or time.time() - entry.get("created_at", 0) > self.source_url_ttl
+        ):
+            return None
+
+        os.utime(meta_path)
+        return self._located(entry, local)
+
+    def put(self, prompt, model, size, image_bytes, url):
+        """Store generated image bytes and evict old entries if over budget."""
+        key = cache_key(prompt, model, size)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        entry = {
+            "key": key,
+            "prompt": prompt,
+            "model": model,
+            "size": size,
+            "source_url": url,
+            "cid": self.blob_store.put(image_bytes),
+            "bytes": len(image_bytes),
+            "created_at": time.time(),
+        }
+        self._write(self._meta_path(key), json.dumps(entry).encode("utf-8"))
+
+        self.evict()
+        return self._located(entry)
+
+    def _located(self, entry, local=True):
+        path = self.blob_store.path(entry["cid"]).resolve()
+        entry["path"] = str(path)
+        entry["url"] = path.as_uri() if local else entry["source_url"]
+        return entry
+
+    def _write(self, path, data):
+        # Write to a temp file of its own first, so readers never see a
+        # partial entry and concurrent generations may share a key
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=f".{path.name}.", delete=False
+        ) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its budget."""
+        entries = []
+        total = 0
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                with meta_path.open(encoding="utf-8") as f:
+                    cid = json.load(f).get("cid")
+                size = self.blob_store.path(cid).stat().st_size
+                last_used = meta_path.stat().st_mtime
+            except (FileNotFoundError, json.JSONDecodeError, TypeError):
+                continue
+            entries.append((last_used, size, cid, meta_path))
+            total += size
+
+        for _, size, cid, meta_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            meta_path.unlink(missing_ok=True)
+            self.blob_store.path(cid).unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,404 @@
+import asyncio
+import time
+
+from langgraph.types import Command
+from loguru import logger
+
+from utils.helpers import ainput
+from utils.speculation import thread_id_from
+
+
+# Thread statuses; nothing runs for a parked, completed or failed thread
+RUNNING = "running"
+WAITING = "waiting"  # interrupted, queued for the responder
+PARKED = "parked"  # interrupted, waiting for resume()
+COMPLETED = "completed"
+ERROR = "error"
+
+
+class PendingInterrupt:
+    """An interrupt raised by a workflow thread and not answered yet."""
+
+    def __init__(self, thread_id, value, interrupt_id=None):
+        self.thread_id = thread_id
+        self.value = value
+        self.interrupt_id = interrupt_id
+        self.created = time.time()
+
+    def to_dict(self):
+        return {
+            "thread_id": self.thread_id,
+            "interrupt_id": self.interrupt_id,
+            "value": self.value,
+            "created": self.created,
+        }
+
+
+class ThreadRun:
+    """What the dispatcher knows about one workflow thread."""
+
+    def __init__(self, config):
+        self.config = config
+        self.thread_id = thread_id_from(config)
+        self.status = RUNNING
+        self.error = None
+        self.interrupt = None
+        self.resumes = 0
+        # Node name -> seconds spent in it, summed over every resume
+        self.timings = {}
+        self.settled = asyncio.Event()
+
+
+class InterruptDispatcher:
+    """Runs workflow threads and routes their interrupts to a responder.
+
+    A thread runs until it finishes or interrupts. Its interrupt is put on a
+    queue and the thread's task ends, so a parked thread holds no task and
+    no stack, only its checkpoint. Responder workers take interrupts off the
+    queue and call responder.respond(pending), which returns the resume
+    payload or None to leave the thread parked until resume() is called,
+    e.g. from an HTTP handler. Without a responder every interrupt parks.
+    A resume starts a fresh run of the thread instead of nesting inside the
+    one that interrupted.
+
+    At most max_running threads run the graph at once; parked threads do
+    not count. on_event(thread_id, event) is called with every "updates"
+    event. With the graph's prefetcher, a thread's speculative calls are
+    dropped once it completes, fails or is forgotten.
+
+    Only one interrupt per super-step is supported: no two nodes of the
+    workflow that run in the same step interrupt, and a resume payload
+    answers a single question. Should several arrive at once, the first is
+    dispatched and the others are logged.
+    """
+
+    def __init__(
+        self,
+        graph,
+        responder=None,
+        max_running=None,
+        workers=16,
+        on_event=None,
+        prefetcher=None,
+    ):
+        self.graph = graph
+        self.responder = responder
+        self.workers = workers if responder is not None else 0
+        self.on_event = on_event
+        self.prefetcher = prefetcher
+        self.threads = {}
+        self.queue = asyncio.Queue()
+        self._running = asyncio.Semaphore(max_running) if max_running else None
+        self._tasks = set()
+        self._workers = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def start(self):
+        """Start the responder workers."""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._answer()) for _ in range(self.workers)
+            ]
+
+    async def close(self):
+        """Stop the workers and cancel the threads still running."""
+        for task in [*self._workers, *self._tasks]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._tasks, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, graph_input, config):
+        """Start a thread on graph_input and return its ThreadRun."""
+        run = ThreadRun(config)
+        self.threads[run.thread_id] = run
+        self._schedule(run, graph_input)
+        return run
+
+    def resume(self, thread_id, payload):
+        """Answer a thread's interrupt and run it again."""
+        run = self.threads.get(thread_id)
+        if run is None or run.interrupt is None:
+            raise KeyError(f"Thread {thread_id} has no pending interrupt")
+        run.interrupt = None
+        run.resumes += 1
+        self._schedule(run, Command(resume=payload))
+
+    def adopt(self, config, value, interrupt_id=None):
+        """Track a thread that is already parked in the checkpointer, e.g.
+        after a restart, so it can be resumed."""
+        run = ThreadRun(config)
+        self.threads[run.thread_id] = run
+        self._interrupted(run, PendingInterrupt(run.thread_id, value, interrupt_id))
+        return run
+
+    def pending(self):
+        """The interrupts of parked threads."""
+        return [
+            run.interrupt
+            for run in self.threads.values()
+            if run.status == PARKED and run.interrupt is not None
+        ]
+
+    async def wait(self, thread_id):
+        """Wait until the thread has completed, failed or parked."""
+        run = self.threads[thread_id]
+        await run.settled.wait()
+        return run
+
+    def forget(self, thread_id):
+        """Stop tracking a settled thread."""
+        self.threads.pop(thread_id, None)
+        if self.prefetcher is not None:
+            self.prefetcher.discard(thread_id)
+
+    def _schedule(self, run, graph_input):
+        run.status = RUNNING
+        run.settled.clear()
+        task = asyncio.create_task(self._run(run, graph_input))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, run, graph_input):
+        interrupt = None
+        try:
+            if self._running is not None:
+                await self._running.acquire()
+            try:
+                last_event = time.perf_counter()
+                async for event in self.graph.astream(
+                    graph_input, run.config, stream_mode="updates"
+                ):
+                    now = time.perf_counter()
+                    if "__interrupt__" in event:
+                        interrupt, *others = event["__interrupt__"]
+                        if others:
+                            logger.warning(
+                                f"Thread {run.thread_id} raised {len(others) + 1} "
+                                "interrupts in one step; only the first is answered"
+                            )
+                    else:
+                        for node_name in event:
+                            if not node_name.startswith("__"):
+                                run.timings[node_name] = round(
+                                    run.timings.get(node_name, 0.0) + now - last_event,
+                                    3,
+                                )
+                    last_event = now
+                    if self.on_event is not None:
+                        self.on_event(run.thread_id, event)
+            finally:
+                if self._running is not None:
+                    self._running.release()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            run.status, run.error = ERROR, str(e)
+            self._finished(run)
+            return
+
+        if interrupt is None:
+            run.status = COMPLETED
+            self._finished(run)
+        else:
+            # Older langgraph releases give interrupts no id
+            interrupt_id = getattr(interrupt, "id", None)
+            self._interrupted(
+                run, PendingInterrupt(run.thread_id, interrupt.value, interrupt_id)
+            )
+
+    def _finished(self, run):
+        if self.prefetcher is not None:
+            self.prefetcher.discard(run.thread_id)
+        run.settled.set()
+
+    def _interrupted(self, run, pending):
+        run.interrupt = pending
+        if self.workers:
+            run.status = WAITING
+            self.queue.put_nowait(pending)
+        else:
+            run.status = PARKED
+            run.settled.set()
+
+    async def _answer(self):
+        while True:
+            pending = await self.queue.get()
+            run = self.threads.get(pending.thread_id)
+            try:
+                if run is None or run.interrupt is not pending:
+                    continue  # resumed or forgotten meanwhile
+                try:
+                    payload = await self.responder.respond(pending)
+                except Exception as e:
+                    logger.warning(
+                        f"Responder failed on thread {pending.thread_id}: {e}"
+                    )
+                    payload = None
+                if run.interrupt is not pending:
+                    continue
+                if payload is None:
+                    run.status = PARKED
+                    run.settled.set()
+                else:
+                    self.resume(pending.thread_id, payload)
+            finally:
+                self.queue.task_done()
+
+
+class PolicyResponder:
+    """Answers interrupts with a per-thread policy, such as the batch
+    runner's ReviewPolicy: anything with answer(interrupt_value)."""
+
+    def __init__(self, policies=None):
+        # thread_id -> policy
+        self.policies = policies if policies is not None else {}
+
+    async def respond(self, pending):
+        policy = self.policies.get(pending.thread_id)
+        return None if policy is None else policy.answer(pending.value)
+
+
+class ConsoleResponder:
+    """Asks the user on the terminal, one interrupt at a time.
+
+    input() runs in a worker thread, so other workflow threads keep running
+    while the user types.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def respond(self, pending):
+        async with self._lock:
+            return await ask_console(pending.value)
+
+
+async def ask_int(prompt, default, low=0, high=100):
+    while True:
+        try:
+            value = int(await ainput(prompt) or str(default))
+            if low <= value <= high:
+                return value
+            print(f"Please enter a value between {low} and {high}.")
+        except ValueError:
+            print("Please enter a valid number.")
+
+
+async def ask_bool(prompt, default):
+    while True:
+        answer = (await ainput(prompt)).lower() or ("yes" if default else "no")
+        if answer in ["yes", "no", "y", "n"]:
+            return answer.startswith("y")
+        print("Please enter yes or no.")
+
+
+async def ask_terms(default_rev_share, default_derivatives):
+    rev_share = await ask_int(
+        f"Enter Commercial Revenue Share (0-100%, default: {default_rev_share}%): ",
+        default_rev_share,
+    )
+    derivatives_allowed = await ask_bool(
+        f"Allow Derivative Works? (yes/no, default: "
+        f"{'yes' if default_derivatives else 'no'}): ",
+        default_derivatives,
+    )
+    return {
+        "commercial_rev_share": rev_share,
+        "derivatives_allowed": derivatives_allowed,
+    }
+
+
+async def ask_console(interrupt_data):
+    """Ask the user to answer one interrupt and return the resume payload."""
+    if "image_url" in interrupt_data:
+        # This is the image review interrupt
+        image_urls = interrupt_data.get("image_urls") or [interrupt_data["image_url"]]
+
+        # Display the image URLs once so the user can see what was generated
+        if len(image_urls) == 1:
+            print(f"\nGenerated image: {image_urls[0]}\n")
+            user_input = await ainput("Do you like this image? (yes/no + feedback): ")
+        else:
+            print("\nGenerated images:")
+            for index, url in enumerate(image_urls, start=1):
+                print(f"{index}. {url}")
+            user_input = await ainput(
+                f"\nWhich image do you want? (1-{len(image_urls)}, or no + feedback): "
+            )
+
+        if user_input.strip().isdigit() and 1 <= int(user_input) <= len(image_urls):
+            # Continue to IPFS upload with the chosen candidate
+            print("Uploading image to IPFS...")
+            return {"action": "continue", "choice": int(user_input) - 1}
+        if user_input.lower().startswith("yes"):
+            # Continue to IPFS upload
+            print("Uploading image to IPFS...")
+            return {"action": "continue"}
+        # Get feedback after "no"
+        feedback = (
+            user_input[4:] if len(user_input) > 4 else "Please generate a different image"
+        )
+        print("Generating a new image...")
+        return {"action": "feedback", "data": feedback}
+
+    if "original_prompt" in interrupt_data:
+        # This is the failed generation interrupt
+        print(f"\nUnable to generate image of {interrupt_data['original_prompt']}")
+        return {"data": await ainput("Please try a different prompt: ")}
+
+    fields = interrupt_data.get("fields", [])
+    field_names = [field["name"] for field in fields]
+    if "adjust_terms" in field_names or "commercial_rev_share" in field_names:
+        print("\n" + interrupt_data.get("explanation", ""))
+
+    if "adjust_terms" in field_names:
+        # This is the feedback on terms interrupt
+        return {
+            "adjust_terms": await ask_bool(
+                "Would you like to adjust your terms based on this feedback? "
+                "(yes/no, default: yes): ",
+                True,
+            )
+        }
+
+    if "commercial_rev_share" in field_names:
+        # Initial terms or term adjustment; defaults suggested by the node
+        # (rules, the learned model, or the terms chosen before)
+        defaults = {field["name"]: field.get("default") for field in fields}
+        return await ask_terms(
+            defaults.get("commercial_rev_share", 15),
+            defaults.get("derivatives_allowed", True),
+        )
+
+    if fields:
+        # Generic fields handler
+        print("Please provide the requested information:")
+        responses = {}
+        for field in fields:
+            name = field.get("name", "")
+            default = field.get("default", "")
+            label = field.get("label", name)
+            if field.get("type") == "boolean":
+                responses[name] = await ask_bool(
+                    f"{label}? (yes/no, default: {'yes' if default else 'no'}): ",
+                    default,
+                )
+            elif field.get("type") == "slider":
+                low, high = field.get("min", 0), field.get("max", 100)
+                responses[name] = await ask_int(
+                    f"{label} ({low}-{high}, default: {default}): ", default, low, high
+                )
+            else:  # text or other types
+                responses[name] = await ainput(
+                    f"{label} (default: {default}): "
+                ) or str(default)
+        return responses
+
+    # Generic interrupt handler for any other interrupts
+    return {"data": await ainput("Enter your response: ")}
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from loguru import logger
+
+from utils.blob_store import compute_cid
+
+
+def canonical_json(document):
+    """Serialize a metadata document to canonical bytes (sorted keys, no spaces)."""
+    return json.dumps(
+        document, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def metadata_hash(data):
+    """0x-prefixed sha256 of canonical metadata bytes, as the mint tool expects."""
+    return "0x" + hashlib.sha256(data).hexdigest()
+
+
+def verify_metadata_hash(document, expected_hash):
+    """Check that a metadata document, as anyone fetching it would parse it,
+    matches a hash before minting."""
+    return metadata_hash(canonical_json(document)) == expected_hash
+
+
+def build_ip_metadata(name, description, image_uri, image_hash=None, creators=None):
+    """IP metadata following the Story IPA metadata standard."""
+    document = {
+        "title": name,
+        "description": description,
+        "image": image_uri,
+        "mediaUrl": image_uri,
+        "mediaType": "image/png",
+        "creators": creators or [],
+    }
+    if image_hash:
+        document["imageHash"] = image_hash
+        document["mediaHash"] = image_hash
+    return document
+
+
+def build_nft_metadata(name, description, image_uri, attributes):
+    """ERC-721 style metadata for the NFT that represents the IP."""
+    return {
+        "name": name,
+        "description": description,
+        "image": image_uri,
+        "attributes": attributes,
+    }
+
+
+def default_creators():
+    """Creator entry taken from CREATOR_NAME and CREATOR_ADDRESS, if set."""
+    address = os.getenv("CREATOR_ADDRESS")
+    if not address:
+        return []
+    return [
+        {
+            "name": os.getenv("CREATOR_NAME", "Story IP Creator"),
+            "address": address,
+            "contributionPercent": 100,
+        }
+    ]
+
+
+class MetadataPublisher:
+    """Builds, hashes and pins IP and NFT metadata without the MCP round trip.
+
+    Both documents are pinned concurrently from their canonical bytes, so
+    the hashes handed to the mint tool can be recomputed by anyone who
+    fetches the documents from IPFS; publish() checks that they are before
+    returning them.
+    """
+
+    def __init__(self, pinata_client, blob_store=None):
+        self.pinata_client = pinata_client
+        self.blob_store = blob_store
+
+    async def pin(self, data, filename):
+        # Identical documents (e.g. a rerun) are already pinned
+        cid = compute_cid(data)
+        if self.blob_store is not None:
+            pinned_uri = self.blob_store.pinned_uri(cid)
+            if pinned_uri:
+                return pinned_uri
+
+        ipfs_uri = await self.pinata_client.pin_bytes(data, filename)
+        # Only a pin of the exact canonical bytes may stand in for them later
+        if ipfs_uri.removeprefix("ipfs://") != cid:
+            logger.warning(f"Pinned metadata {ipfs_uri} does not match local CID {cid}")
+        elif self.blob_store is not None:
+            self.blob_store.record_pin(cid, ipfs_uri)
+        return ipfs_uri
+
+    async def publish(self, name, description, attributes, image_uri, image_cid=None):
+        """Return registration metadata in the shape the mint tool expects."""
+        image_hash = None
+        if self.blob_store is not None and self.blob_store.has(image_cid):
+            data = await asyncio.to_thread(self.blob_store.path(image_cid).read_bytes)
+            image_hash = "0x" + hashlib.sha256(data).hexdigest()
+
+        ip_bytes = canonical_json(
+            build_ip_metadata(
+                name, description, image_uri, image_hash, default_creators()
+            )
+        )
+        nft_bytes = canonical_json(
+            build_nft_metadata(name, description, image_uri, attributes)
+        )
+
+        ip_metadata_uri, nft_metadata_uri = await asyncio.gather(
+            self.pin(ip_bytes, "ip-metadata.json"),
+            self.pin(nft_bytes, "nft-metadata.json"),
+        )
+
+        registration_metadata = {
+            "ip_metadata_uri": ip_metadata_uri,
+            "ip_metadata_hash": metadata_hash(ip_bytes),
+            "nft_metadata_uri": nft_metadata_uri,
+            "nft_metadata_hash": metadata_hash(nft_bytes),
+        }
+        # The hashes must survive the documents being fetched and parsed
+        for kind, data in (("ip", ip_bytes), ("nft", nft_bytes)):
+            if not verify_metadata_hash(
+                json.loads(data), registration_metadata[f"{kind}_metadata_hash"]
+            ):
+                raise ValueError(f"{kind.upper()} metadata does not match its hash")
+        return registration_metadata
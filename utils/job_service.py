@@ -0,0 +1,469 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+from loguru import logger
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from utils.batch import extract_result
+from utils.helpers import create_config, process_user_input
+from utils.interrupts import COMPLETED, ERROR, PARKED, RUNNING, InterruptDispatcher
+from utils.metrics import node_metrics
+
+# Job statuses besides the dispatcher's thread statuses
+QUEUED = "queued"
+FAILED = "failed"
+FINISHED = (COMPLETED, FAILED, ERROR)
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_QUEUED = 64
+# Finished jobs kept for their results, oldest dropped first
+DEFAULT_MAX_FINISHED = 1000
+# SSE comment sent on idle event streams so proxies keep them open
+KEEPALIVE_SECONDS = 15.0
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class UnknownJob(KeyError):
+    pass
+
+
+class Job:
+    """One prompt submitted to the service and its workflow thread."""
+
+    def __init__(self, thread_id, prompt):
+        self.thread_id = thread_id
+        self.prompt = prompt
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.submitted = time.time()
+        self.finished = None
+        # Node timings of the thread, kept once it is finished
+        self.timings = {}
+        # Every event so far, replayed to new subscribers
+        self.events = []
+        self.subscribers = set()
+
+    def publish(self, kind, **data):
+        event = {"type": kind, "time": time.time(), **data}
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def to_dict(self, run=None):
+        return {
+            "thread_id": self.thread_id,
+            "prompt": self.prompt,
+            "status": self.status,
+            "error": self.error,
+            "interrupt": (
+                run.interrupt.to_dict() if run and run.interrupt is not None else None
+            ),
+            "timings": run.timings if run else self.timings,
+            "result": self.result,
+            "submitted": self.submitted,
+            "finished": self.finished,
+        }
+
+
+class JobService:
+    """Runs submitted prompts on one workflow graph with admission control.
+
+    At most max_in_flight threads run the graph at once; new jobs wait in a
+    queue of at most max_queued, past which submit() raises ServiceBusy.
+    Threads parked at an interrupt hold no slot and wait for resume().
+    Results are read from the thread's state when it finishes, after which
+    its checkpoints are deleted (prune_finished). A parked thread the
+    service does not know, e.g. after a restart, is picked up from the
+    checkpointer on first access. Pass the graph's prefetcher so finished
+    jobs drop their speculative calls.
+    """
+
+    def __init__(
+        self,
+        graph,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_queued=DEFAULT_MAX_QUEUED,
+        max_finished=DEFAULT_MAX_FINISHED,
+        prune_finished=True,
+        prefetcher=None,
+    ):
+        self.graph = graph
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.prune_finished = prune_finished
+        self.dispatcher = InterruptDispatcher(
+            graph, on_event=self._on_event, prefetcher=prefetcher
+        )
+        self.jobs = OrderedDict()
+        self.queue = asyncio.Queue()
+        self.running = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self._admitter = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def start(self):
+        self.dispatcher.start()
+        if self._admitter is None:
+            self._admitter = asyncio.create_task(self._admit())
+
+    async def close(self):
+        tasks = [t for t in [self._admitter, *self._tasks] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._admitter = None
+        await self.dispatcher.close()
+
+    def stats(self):
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "running": self.running,
+            "queued": self.queue.qsize(),
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "jobs": statuses,
+        }
+
+    # Jobs
+
+    def submit(self, prompt, requested_terms=None):
+        """Queue a prompt and return its Job, or raise ServiceBusy.
+
+        requested_terms are applied by rules negotiation and proposed as the
+        defaults of the terms interrupt otherwise.
+        """
+        if self.queue.qsize() >= self.max_queued:
+            raise ServiceBusy(
+                f"{self.running} jobs running and {self.queue.qsize()} queued"
+            )
+        config = create_config()
+        job = Job(config["configurable"]["thread_id"], prompt)
+        self.jobs[job.thread_id] = job
+        graph_input = {
+            **process_user_input(prompt),
+            "requested_terms": requested_terms or {},
+        }
+        self.queue.put_nowait((job, graph_input, config))
+        job.publish("status", status=QUEUED)
+        return job
+
+    async def get(self, thread_id):
+        """The job of a thread, recovering a parked one from the checkpointer."""
+        job = self.jobs.get(thread_id)
+        if job is None:
+            job = await self._recover(thread_id)
+        if job is None:
+            raise UnknownJob(thread_id)
+        return job
+
+    def run_of(self, job):
+        return self.dispatcher.threads.get(job.thread_id)
+
+    def pending(self):
+        """Every parked job's interrupt."""
+        return [
+            pending.to_dict()
+            for pending in self.dispatcher.pending()
+            if getattr(self.jobs.get(pending.thread_id), "status", None) == PARKED
+        ]
+
+    async def resume(self, thread_id, payload):
+        """Answer a parked job's interrupt; KeyError if it has none."""
+        job = await self.get(thread_id)
+        run = self.run_of(job)
+        if job.status != PARKED or run is None or run.status != PARKED:
+            raise KeyError(f"Job {thread_id} is not waiting for an answer")
+        # The resumed run waits for a slot like a new job
+        self._set_status(job, QUEUED)
+        self._spawn(self._resume(job, payload))
+        return job
+
+    async def events(self, thread_id):
+        """Yield the job's events, past ones first, until it finishes."""
+        job = await self.get(thread_id)
+        queue = asyncio.Queue()
+        backlog = list(job.events)
+        job.subscribers.add(queue)
+        try:
+            for event in backlog:
+                yield event
+            if job.status in FINISHED:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["type"] == "status" and event["status"] in FINISHED:
+                    return
+        finally:
+            job.subscribers.discard(queue)
+
+    # Internals
+
+    def _set_status(self, job, status, **data):
+        job.status = status
+        job.publish("status", status=status, **data)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _admit(self):
+        while True:
+            job, graph_input, config = await self.queue.get()
+            await self._take_slot(job)
+            self.dispatcher.submit(graph_input, config)
+            self._spawn(self._settle(job))
+
+    async def _resume(self, job, payload):
+        await self._take_slot(job)
+        self.dispatcher.resume(job.thread_id, payload)
+        await self._settle(job)
+
+    async def _take_slot(self, job):
+        await self._slots.acquire()
+        self.running += 1
+        self._set_status(job, RUNNING)
+
+    async def _settle(self, job):
+        try:
+            run = await self.dispatcher.wait(job.thread_id)
+        finally:
+            self._slots.release()
+            self.running -= 1
+
+        if run.status == PARKED:
+            self._set_status(job, PARKED, interrupt=run.interrupt.to_dict())
+            return
+        if run.status == COMPLETED:
+            try:
+                snapshot = await self.graph.aget_state(run.config)
+                job.result = extract_result(snapshot.values)
+            except Exception as e:
+                run.status, run.error = ERROR, str(e)
+        status = run.status
+        if status == COMPLETED and not (job.result or {}).get("ip_id"):
+            status = FAILED
+        job.error = run.error
+        job.timings = run.timings
+        job.finished = time.time()
+        self._set_status(job, status, result=job.result, error=job.error)
+
+        if self.prune_finished and status != ERROR and self.graph.checkpointer:
+            try:
+                await self.graph.checkpointer.adelete_thread(job.thread_id)
+            except Exception as e:
+                logger.warning(
+                    f"Could not delete the checkpoints of {job.thread_id}: {e}"
+                )
+        self.dispatcher.forget(job.thread_id)
+        self._evict()
+
+    def _evict(self):
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.thread_id]
+
+    def _on_event(self, thread_id, event):
+        job = self.jobs.get(thread_id)
+        if job is None:
+            return
+        for name, update in event.items():
+            if name == "__interrupt__":
+                continue  # published as the parked status
+            job.publish(
+                "node",
+                node=name,
+                keys=sorted(update) if isinstance(update, dict) else [],
+            )
+
+    async def _recover(self, thread_id):
+        if self.graph.checkpointer is None:
+            return None
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = await self.graph.aget_state(config)
+        interrupts = [i for task in snapshot.tasks for i in task.interrupts]
+        if not interrupts:
+            return None
+        job = Job(thread_id, snapshot.values.get("prompt"))
+        self.jobs[thread_id] = job
+        run = self.dispatcher.adopt(
+            config, interrupts[0].value, getattr(interrupts[0], "id", None)
+        )
+        self._set_status(job, PARKED, interrupt=run.interrupt.to_dict())
+        return job
+
+
+# HTTP
+
+
+def sse(event):
+    if event is None:
+        return ": keepalive\n\n"
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def terms_problem(terms):
+    """Why the terms of a job request are invalid, or None if they are not."""
+    if terms is None:
+        return None
+    if not isinstance(terms, dict):
+        return "terms must be an object"
+    unknown = sorted(set(terms) - {"commercial_rev_share", "derivatives_allowed"})
+    if unknown:
+        return f"unknown terms: {', '.join(unknown)}"
+    rev_share = terms.get("commercial_rev_share")
+    if rev_share is not None and (
+        isinstance(rev_share, bool)
+        or not isinstance(rev_share, int)
+        or not 0 <= rev_share <= 100
+    ):
+        return "commercial_rev_share must be an integer from 0 to 100"
+    derivatives_allowed = terms.get("derivatives_allowed")
+    if derivatives_allowed is not None and not isinstance(derivatives_allowed, bool):
+        return "derivatives_allowed must be a boolean"
+    return None
+
+
+async def submit_job(request):
+    body = await read_json(request)
+    if not body or not isinstance(body.get("prompt"), str) or not body["prompt"]:
+        return JSONResponse({"error": "a prompt is required"}, status_code=400)
+    problem = terms_problem(body.get("terms"))
+    if problem is not None:
+        return JSONResponse({"error": problem}, status_code=400)
+    try:
+        job = request.app.state.service.submit(body["prompt"], body.get("terms"))
+    except ServiceBusy as e:
+        return JSONResponse(
+            {"error": f"service saturated: {e}"},
+            status_code=429,
+            headers={"Retry-After": "5"},
+        )
+    return JSONResponse(
+        {"thread_id": job.thread_id, "status": job.status}, status_code=202
+    )
+
+
+async def get_job(request):
+    service = request.app.state.service
+    try:
+        job = await service.get(request.path_params["thread_id"])
+    except UnknownJob:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    return JSONResponse(job.to_dict(service.run_of(job)))
+
+
+async def job_events(request):
+    service = request.app.state.service
+    thread_id = request.path_params["thread_id"]
+    try:
+        await service.get(thread_id)
+    except UnknownJob:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+
+    async def stream():
+        async for event in service.events(thread_id):
+            yield sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def resume_job(request):
+    service = request.app.state.service
+    body = await read_json(request)
+    if body is None:
+        return JSONResponse({"error": "a JSON object is required"}, status_code=400)
+    try:
+        job = await service.resume(request.path_params["thread_id"], body)
+    except UnknownJob:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    except KeyError as e:
+        return JSONResponse({"error": str(e.args[0])}, status_code=409)
+    return JSONResponse(
+        {"thread_id": job.thread_id, "status": job.status}, status_code=202
+    )
+
+
+async def job_result(request):
+    service = request.app.state.service
+    try:
+        job = await service.get(request.path_params["thread_id"])
+    except UnknownJob:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    if job.status not in FINISHED:
+        return JSONResponse(
+            {"error": f"job is {job.status}", "status": job.status}, status_code=409
+        )
+    return JSONResponse(
+        {"status": job.status, "error": job.error, **(job.result or {})}
+    )
+
+
+async def list_interrupts(request):
+    return JSONResponse(request.app.state.service.pending())
+
+
+async def health(request):
+    return JSONResponse(request.app.state.service.stats())
+
+
+async def metrics(request):
+    return PlainTextResponse(
+        node_metrics.prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+def create_app(lifespan=None, service=None):
+    """The Starlette app. Pass a started JobService, or a lifespan that sets
+    app.state.service."""
+    app = Starlette(
+        routes=[
+            Route("/jobs", submit_job, methods=["POST"]),
+            Route("/jobs/{thread_id}", get_job),
+            Route("/jobs/{thread_id}/events", job_events),
+            Route("/jobs/{thread_id}/resume", resume_job, methods=["POST"]),
+            Route("/jobs/{thread_id}/result", job_result),
+            Route("/interrupts", list_interrupts),
+            Route("/health", health),
+            Route("/metrics", metrics),
+        ],
+        lifespan=lifespan,
+    )
+    if service is not None:
+        app.state.service = service
+    return app
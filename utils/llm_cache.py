@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from pathlib import Path
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from loguru import logger
+
+from utils.metrics import count_llm_cache_hit
+
+
+DEFAULT_CACHE_PATH = ".cache/llm_cache.sqlite"
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+class DiskLLMCache(BaseCache):
+    """Exact-match LLM response cache in SQLite, with a TTL and LRU eviction.
+
+    Pass it as ChatOpenAI(cache=...). Keys are the sha256 of the model
+    configuration and the serialized prompt, so any change to either misses.
+    LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS and LLM_CACHE_MAX_ENTRIES override
+    the defaults.
+    """
+
+    def __init__(self, path=None, ttl_seconds=None, max_entries=None):
+        self.path = Path(path or os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH))
+        self.ttl_seconds = float(
+            ttl_seconds or os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+        )
+        self.max_entries = int(
+            max_entries or os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self.key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        try:
+            # Entries are written by this class, so the beta and
+            # allowed-objects warnings of loads() do not apply
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                value = loads(row[0])
+        except Exception as e:
+            # An entry written by an incompatible langchain version
+            logger.warning(f"Dropping unreadable LLM cache entry: {e}")
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+            return None
+        # Reported to the node call's metrics as a hit, not as an LLM call
+        count_llm_cache_hit()
+        return value
+
+    def update(self, prompt, llm_string, return_val):
+        key = self.key(prompt, llm_string)
+        value = dumps(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self.evict()
+            self._conn.commit()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over max_entries."""
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,)
+        )
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        """Hit and miss counts of this process, plus the current entry count."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,440 @@
+import json
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tracers.context import register_configure_hook
+from langgraph.errors import GraphInterrupt
+
+from utils.speculation import thread_id_from
+
+
+# Node call outcomes
+OK = "ok"
+INTERRUPTED = "interrupted"
+ERROR = "error"
+
+# Upper bounds (seconds) of the Prometheus histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Finished node calls kept for summary(); older ones only remain in the totals
+DEFAULT_MAX_CALLS = 100_000
+
+# Per-call counts, summed per node
+COUNTS = (
+    "llm_calls",
+    "llm_cache_hits",
+    "prompt_tokens",
+    "completion_tokens",
+    "retries",
+)
+# Count -> Prometheus counter family, extra labels and help text
+COUNTER_FAMILIES = {
+    "llm_calls": ("story_node_llm_calls_total", "", "LLM calls made by nodes."),
+    "llm_cache_hits": (
+        "story_node_llm_cache_hits_total",
+        "",
+        "LLM calls of nodes answered from the LLM cache.",
+    ),
+    "prompt_tokens": (
+        "story_node_llm_tokens_total",
+        ',kind="prompt"',
+        "LLM tokens used by nodes, by kind (prompt or completion).",
+    ),
+    "completion_tokens": ("story_node_llm_tokens_total", ',kind="completion"', None),
+    "retries": ("story_node_retries_total", "", "Retries made by nodes."),
+}
+
+# The handler of the node call running in this context. Registered as a
+# configure hook, so every LLM and tool run started inside a node reports to
+# it without the node passing callbacks along.
+_handler = ContextVar("node_call_handler", default=None)
+register_configure_hook(_handler, inheritable=True)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values, None if there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _seconds(values):
+    return {
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values, default=None),
+        "total": round(sum(values), 3),
+    }
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        lines = [
+            f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+            for bound, count in zip(DURATION_BUCKETS, self.counts)
+        ]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class NodeCallHandler(BaseCallbackHandler):
+    """Adds the LLM tokens and tool round trips of one node call to it.
+
+    An LLM call answered by the LLM cache is counted as a cache hit, with
+    no tokens: the cache flags it through count_llm_cache_hit() before the
+    call ends.
+    """
+
+    run_inline = True
+
+    def __init__(self, metrics, call):
+        self.metrics = metrics
+        self.call = call
+        # run_id -> (tool name, start time) of the tool calls in flight
+        self.tools = {}
+        self.nested = set()
+        # Cache hits looked up and not ended yet; lookups run in a thread
+        self._cache_hits = 0
+        self._lock = threading.Lock()
+
+    def cache_hit(self):
+        with self._lock:
+            self._cache_hits += 1
+
+    def _take_cache_hit(self):
+        with self._lock:
+            if self._cache_hits:
+                self._cache_hits -= 1
+                return True
+            return False
+
+    def on_llm_end(self, response, **kwargs):
+        if self._take_cache_hit():
+            # The cached response carries the tokens of the original call
+            self.metrics.add_llm_cache_hit(self.call)
+            return
+        prompt_tokens = completion_tokens = 0
+        reported = False
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens") or 0
+                    completion_tokens += usage.get("output_tokens") or 0
+                    reported = True
+        if not reported:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens") or 0
+            completion_tokens = usage.get("completion_tokens") or 0
+        self.metrics.add_llm_call(self.call, prompt_tokens, completion_tokens)
+
+    def on_tool_start(
+        self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs
+    ):
+        # A pooled MCP tool runs the session's own tool inside it; only the
+        # outer call is a round trip
+        if parent_run_id in self.tools or parent_run_id in self.nested:
+            self.nested.add(run_id)
+            return
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self.tools[run_id] = (name, time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._tool_done(run_id, True)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_done(run_id, False)
+
+    def _tool_done(self, run_id, ok):
+        self.nested.discard(run_id)
+        started = self.tools.pop(run_id, None)
+        if started is not None:
+            name, started_at = started
+            seconds = time.perf_counter() - started_at
+            self.metrics.add_tool_call(self.call, name, seconds, ok)
+
+
+class InstrumentedNode:
+    """Runs a graph node and records the call in a NodeMetrics."""
+
+    def __init__(self, name, node, metrics):
+        self.name = name
+        self.node = node
+        self.metrics = metrics
+
+    async def ainvoke(self, state, config=None):
+        call = {
+            "thread_id": thread_id_from(config),
+            "node": self.name,
+            "started": time.time(),
+            "seconds": None,
+            "outcome": None,
+            "llm_calls": 0,
+            "llm_cache_hits": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "retries": 0,
+            # [tool name, seconds, ok] per tool call
+            "tools": [],
+        }
+        token = _handler.set(NodeCallHandler(self.metrics, call))
+        started = time.perf_counter()
+        try:
+            result = await self.node.ainvoke(state, config)
+            call["outcome"] = OK
+            return result
+        except GraphInterrupt:
+            call["outcome"] = INTERRUPTED
+            raise
+        except Exception:
+            call["outcome"] = ERROR
+            raise
+        finally:
+            call["seconds"] = round(time.perf_counter() - started, 4)
+            _handler.reset(token)
+            self.metrics.record(call)
+
+
+def instrument(name, node, metrics):
+    """Wrap a node (a Runnable) so its calls are recorded in metrics."""
+    return RunnableLambda(InstrumentedNode(name, node, metrics).ainvoke, name=name)
+
+
+def count_retry():
+    """Count a retry against the node call running in this context, if any."""
+    handler = _handler.get()
+    if handler is not None:
+        handler.metrics.add_retry(handler.call)
+
+
+def count_llm_cache_hit():
+    """Flag the LLM call being looked up in this context as a cache hit."""
+    handler = _handler.get()
+    if handler is not None:
+        handler.cache_hit()
+
+
+class NodeMetrics:
+    """Wall time, LLM tokens, tool round trips, retries and outcome of every
+    workflow node call, tagged by thread_id and node.
+
+    prometheus() renders the running totals in the Prometheus text format,
+    labelled by node (and tool) only: one series per thread would never
+    stop growing. summary() gives per-node and per-tool p50/p95 and
+    per-thread totals over the last max_calls calls.
+
+    Tokens and tool calls are added as they finish, so an LLM call still
+    running when its node returns, such as the speculative metadata draft
+    started at image review, counts toward the node that started it.
+    """
+
+    def __init__(self, max_calls=DEFAULT_MAX_CALLS):
+        self.calls = deque(maxlen=max_calls)
+        self._lock = threading.Lock()
+        # node -> _Histogram
+        self._durations = {}
+        # (node, outcome) -> calls
+        self._outcomes = {}
+        # (node, name) -> total, name being a key of the call dicts
+        self._totals = {}
+        # (node, tool) -> _Histogram, and tool calls that raised
+        self._tool_durations = {}
+        self._tool_errors = {}
+
+    def add_llm_call(self, call, prompt_tokens, completion_tokens):
+        with self._lock:
+            for name, amount in (
+                ("llm_calls", 1),
+                ("prompt_tokens", prompt_tokens),
+                ("completion_tokens", completion_tokens),
+            ):
+                self._add(call, name, amount)
+
+    def add_llm_cache_hit(self, call):
+        with self._lock:
+            self._add(call, "llm_cache_hits", 1)
+
+    def add_tool_call(self, call, tool, seconds, ok):
+        with self._lock:
+            call["tools"].append([tool, round(seconds, 4), ok])
+            self._observe_tool(call["node"], tool, seconds, ok)
+
+    def add_retry(self, call):
+        with self._lock:
+            self._add(call, "retries", 1)
+
+    def record(self, call):
+        """Add a finished node call."""
+        with self._lock:
+            self.calls.append(call)
+            node = call["node"]
+            self._durations.setdefault(node, _Histogram()).observe(call["seconds"])
+            key = (node, call["outcome"])
+            self._outcomes[key] = self._outcomes.get(key, 0) + 1
+
+    def merge(self, calls):
+        """Add node calls recorded by another process, e.g. a worker."""
+        for call in calls:
+            with self._lock:
+                node = call["node"]
+                for name in COUNTS:
+                    key = (node, name)
+                    self._totals[key] = self._totals.get(key, 0) + call[name]
+                for tool, seconds, ok in call["tools"]:
+                    self._observe_tool(node, tool, seconds, ok)
+            self.record(call)
+
+    def pop_thread(self, thread_id):
+        """Remove and return the recorded calls of one thread."""
+        with self._lock:
+            calls = [call for call in self.calls if call["thread_id"] == thread_id]
+            if calls:
+                kept = [call for call in self.calls if call["thread_id"] != thread_id]
+                self.calls.clear()
+                self.calls.extend(kept)
+            return calls
+
+    def _add(self, call, name, amount):
+        call[name] += amount
+        key = (call["node"], name)
+        self._totals[key] = self._totals.get(key, 0) + amount
+
+    def _observe_tool(self, node, tool, seconds, ok):
+        self._tool_durations.setdefault((node, tool), _Histogram()).observe(seconds)
+        if not ok:
+            key = (node, tool)
+            self._tool_errors[key] = self._tool_errors.get(key, 0) + 1
+
+    def summary(self):
+        """Per-node, per-tool and per-thread figures of the kept calls."""
+        with self._lock:
+            calls = list(self.calls)
+
+        nodes, tools, threads = {}, {}, {}
+        for call in calls:
+            node = nodes.setdefault(
+                call["node"],
+                {
+                    "calls": 0,
+                    "outcomes": {},
+                    "seconds": [],
+                    "llm_calls": 0,
+                    "llm_cache_hits": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "retries": 0,
+                },
+            )
+            node["calls"] += 1
+            outcomes = node["outcomes"]
+            outcomes[call["outcome"]] = outcomes.get(call["outcome"], 0) + 1
+            node["seconds"].append(call["seconds"])
+            for name in COUNTS:
+                node[name] += call[name]
+
+            for name, seconds, ok in call["tools"]:
+                tool = tools.setdefault(name, {"calls": 0, "errors": 0, "seconds": []})
+                tool["calls"] += 1
+                tool["errors"] += not ok
+                tool["seconds"].append(seconds)
+
+            thread = threads.setdefault(
+                call["thread_id"],
+                {
+                    "seconds": 0.0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "nodes": {},
+                },
+            )
+            thread["seconds"] = round(thread["seconds"] + call["seconds"], 4)
+            thread["prompt_tokens"] += call["prompt_tokens"]
+            thread["completion_tokens"] += call["completion_tokens"]
+            thread["nodes"][call["node"]] = round(
+                thread["nodes"].get(call["node"], 0.0) + call["seconds"], 4
+            )
+
+        for figures in [*nodes.values(), *tools.values()]:
+            figures["seconds"] = _seconds(figures["seconds"])
+        return {
+            "calls": len(calls),
+            "nodes": nodes,
+            "tools": tools,
+            "threads": threads,
+        }
+
+    def write_summary(self, path):
+        path = Path(path)
+        path.write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+
+    def prometheus(self):
+        """The running totals in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family(
+                "story_node_duration_seconds",
+                "histogram",
+                "Wall time of workflow node calls.",
+            )
+            for node, histogram in sorted(self._durations.items()):
+                lines += histogram.lines(
+                    "story_node_duration_seconds", f'node="{node}"'
+                )
+
+            family("story_node_calls_total", "counter", "Node calls by outcome.")
+            for (node, outcome), count in sorted(self._outcomes.items()):
+                labels = f'node="{node}",outcome="{outcome}"'
+                lines.append(f"story_node_calls_total{{{labels}}} {count}")
+
+            for count, (name, labels, help_text) in COUNTER_FAMILIES.items():
+                if help_text is not None:
+                    family(name, "counter", help_text)
+                for (node, total_name), total in sorted(self._totals.items()):
+                    if total_name == count:
+                        lines.append(f'{name}{{node="{node}"{labels}}} {total}')
+
+            family(
+                "story_tool_duration_seconds",
+                "histogram",
+                "Round trip of tool calls (image generation, MCP) made by nodes.",
+            )
+            for (node, tool), histogram in sorted(self._tool_durations.items()):
+                lines += histogram.lines(
+                    "story_tool_duration_seconds", f'node="{node}",tool="{tool}"'
+                )
+
+            family("story_tool_errors_total", "counter", "Tool calls that raised.")
+            for (node, tool), count in sorted(self._tool_errors.items()):
+                labels = f'node="{node}",tool="{tool}"'
+                lines.append(f"story_tool_errors_total{{{labels}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every graph built without its own NodeMetrics
+node_metrics = NodeMetrics()
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+DEFAULT_LEDGER_PATH = ".cache/mint_ledger.sqlite"
+
+# Stages recorded per asset, in workflow order. mint_started is written
+# before the mint is sent, so a crash mid-mint is visible to the next run.
+STAGES = (
+    "uploaded",
+    "metadata_created",
+    "mint_started",
+    "minted",
+    "license_tokens_minted",
+)
+
+
+class MintLedger:
+    """Append-only SQLite record of what happened to each image.
+
+    Entries are keyed by the image CID and, from minting on, the NFT
+    metadata hash, so a rerun of the same image and metadata finds the
+    earlier results. Commits are fsync'd (WAL with synchronous=FULL), so
+    the async methods run them in a worker thread. MINT_LEDGER_PATH
+    overrides the default path.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv("MINT_LEDGER_PATH", DEFAULT_LEDGER_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit; transactions are opened explicitly where needed
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS mint_ledger ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, image_cid TEXT NOT NULL, "
+            "metadata_hash TEXT NOT NULL, stage TEXT NOT NULL, "
+            "data TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS mint_ledger_key "
+            "ON mint_ledger (image_cid, metadata_hash, stage)"
+        )
+
+    def _append(self, image_cid, metadata_hash, stage, data):
+        if stage not in STAGES:
+            raise ValueError(
+                f"Unknown ledger stage {stage!r}, expected one of {STAGES}"
+            )
+        self._conn.execute(
+            "INSERT INTO mint_ledger "
+            "(image_cid, metadata_hash, stage, data, created) VALUES (?, ?, ?, ?, ?)",
+            (image_cid, metadata_hash or "", stage, json.dumps(data), time.time()),
+        )
+
+    def _latest(self, image_cid, metadata_hash, stage):
+        row = self._conn.execute(
+            "SELECT data, created, id FROM mint_ledger "
+            "WHERE image_cid = ? AND metadata_hash = ? AND stage = ? "
+            "ORDER BY id DESC LIMIT 1",
+            (image_cid, metadata_hash or "", stage),
+        ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "created": row[1], "entry": row[2]}
+
+    def record(self, image_cid, stage, data, metadata_hash=""):
+        """Append the outcome of a stage."""
+        with self._lock:
+            self._append(image_cid, metadata_hash, stage, data)
+
+    def latest(self, image_cid, stage, metadata_hash=""):
+        """The most recent entry of a stage, with its created time, or None."""
+        with self._lock:
+            return self._latest(image_cid, metadata_hash, stage)
+
+    def claim_mint(self, image_cid, metadata_hash, data):
+        """Record mint_started unless an earlier mint may have landed.
+
+        Returns (True, None) when the caller may send the mint. Otherwise
+        returns (False, previous): the landed "minted" entry, the unconfirmed
+        one, or status "started" when a mint has no outcome yet (another run
+        is minting, or one crashed while it was), with the nonce and signer
+        of its last attempt if they were recorded; sent_at is when the
+        unconfirmed mint was started. Runs in one IMMEDIATE
+        transaction, so concurrent runs and processes cannot both claim.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                started = self._latest(image_cid, metadata_hash, "mint_started")
+                minted = self._latest(image_cid, metadata_hash, "minted")
+                sent_at = started["created"] if started else None
+                if minted and minted.get("status") == "landed":
+                    previous = minted
+                elif started and (not minted or minted["entry"] < started["entry"]):
+                    previous = {
+                        "status": "started",
+                        "sent_at": sent_at,
+                        **{
+                            field: started[field]
+                            for field in ("nonce", "signer")
+                            if started.get(field) is not None
+                        },
+                    }
+                elif minted and minted.get("status") != "not_landed":
+                    previous = {**minted, "sent_at": sent_at}
+                else:
+                    self._append(image_cid, metadata_hash, "mint_started", data)
+                    previous = None
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return previous is None, previous
+
+    def history(self, image_cid):
+        """Every entry for an image, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT metadata_hash, stage, data, created FROM mint_ledger "
+                "WHERE image_cid = ? ORDER BY id",
+                (image_cid,),
+            ).fetchall()
+        return [
+            {
+                "metadata_hash": metadata_hash,
+                "stage": stage,
+                "created": created,
+                **json.loads(data),
+            }
+            for metadata_hash, stage, data, created in rows
+        ]
+
+    async def arecord(self, image_cid, stage, data, metadata_hash=""):
+        await asyncio.to_thread(self.record, image_cid, stage, data, metadata_hash)
+
+    async def alatest(self, image_cid, stage, metadata_hash=""):
+        return await asyncio.to_thread(self.latest, image_cid, stage, metadata_hash)
+
+    async def aclaim_mint(self, image_cid, metadata_hash, data):
+        return await asyncio.to_thread(
+            self.claim_mint, image_cid, metadata_hash, data
+        )
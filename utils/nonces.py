@@ -0,0 +1,276 @@
+import asyncio
+import heapq
+import os
+import time
+
+from eth_account import Account
+from loguru import logger
+from web3 import AsyncWeb3
+
+from utils.chain import rejected_before_send
+
+# A nonce the chain has been stuck on this long, while later nonces wait
+# behind it, is a gap: its transaction was dropped, underpriced or never sent
+STUCK_SECONDS = 60.0
+CHECK_INTERVAL_SECONDS = 5.0
+
+# Gap fillers pay this multiple of the gas price, enough to replace a
+# transaction stuck at the same nonce
+FILL_FEE_MULTIPLIER = 2
+FILL_GAS = 21_000
+
+# Errors meaning another transaction already has the nonce
+NONCE_TAKEN = [
+    "nonce too low",
+    "replacement transaction underpriced",
+    "already known",
+]
+
+
+def nonce_taken(error):
+    error = (error or "").lower()
+    return any(message in error for message in NONCE_TAKEN)
+
+
+class NonceManager:
+    """Hands out the nonces of one signer locally, so its transactions can be
+    sent concurrently instead of each reading the nonce from the chain.
+
+    The next nonce is read from the chain's pending count on first use and
+    again whenever a nonce turns out to be taken. Nonces returned unsent
+    with release() are handed out again first. A watcher task drops the
+    mined nonces and, when the chain's next nonce has been stuck for
+    stuck_seconds while later ones wait (or is a released nonce nobody
+    reused), fills it with a zero-value transfer to the signer, signed with
+    WALLET_PRIVATE_KEY.
+
+    Set max_in_flight to the number of sessions that send for the signer:
+    a transaction waiting for a free session would otherwise hold back the
+    later nonces occupying every session, each waiting for its receipt.
+    allocate() then waits until fewer than max_in_flight nonces are
+    being sent.
+    """
+
+    def __init__(
+        self,
+        chain,
+        private_key=None,
+        address=None,
+        stuck_seconds=STUCK_SECONDS,
+        check_interval=CHECK_INTERVAL_SECONDS,
+        max_in_flight=None,
+    ):
+        self.chain = chain
+        self.w3 = chain.w3
+        self.private_key = private_key or os.getenv("WALLET_PRIVATE_KEY")
+        if address is None:
+            address = Account.from_key(self.private_key).address
+        self.address = AsyncWeb3.to_checksum_address(address)
+        self.stuck_seconds = stuck_seconds
+        self.check_interval = check_interval
+
+        self.next_nonce = None
+        # Nonces handed out and not yet mined -> when they were handed out
+        self.pending = {}
+        # Nonces handed back unsent, smallest first
+        self.released = []
+        # Nonces taken by a mined gap filler -> its transaction hash
+        self.filled = {}
+        self._resync = False
+        self._latest = None
+        self._latest_since = 0.0
+        self._lock = asyncio.Lock()
+        self._watcher = None
+        # Nonces allocated and not yet settled
+        self._sending = set()
+        self._slots = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+
+    async def _sync(self):
+        count = await self.w3.eth.get_transaction_count(self.address, "pending")
+        # Never go back below nonces already handed out
+        self.next_nonce = max(count, self.next_nonce or 0)
+        self._resync = False
+
+    async def sync(self):
+        """Read the next nonce from the chain's pending transaction count."""
+        async with self._lock:
+            await self._sync()
+
+    async def allocate(self):
+        """The next nonce to sign with; settle() it once the send returns."""
+        if self._slots is not None:
+            await self._slots.acquire()
+        try:
+            async with self._lock:
+                if self.next_nonce is None or self._resync:
+                    await self._sync()
+                if self.released:
+                    nonce = heapq.heappop(self.released)
+                else:
+                    nonce = self.next_nonce
+                    self.next_nonce += 1
+                self.pending[nonce] = time.monotonic()
+                self._sending.add(nonce)
+        except BaseException:
+            # No nonce was handed out, e.g. the chain could not be read
+            if self._slots is not None:
+                self._slots.release()
+            raise
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch())
+        return nonce
+
+    def release(self, nonce):
+        """Hand back a nonce whose transaction was never sent."""
+        if self.pending.pop(nonce, None) is not None:
+            heapq.heappush(self.released, nonce)
+
+    def settle(self, nonce, tx_hash=None, error=None):
+        """Update the nonce's state from the outcome of sending with it.
+
+        A sent transaction stays pending until mined. A nonce another
+        transaction already has is dropped and the next allocation resyncs.
+        A nonce rejected before sending is released. Anything else, such as
+        a lost response, stays pending for the watcher to reconcile.
+        """
+        if nonce in self._sending:
+            self._sending.discard(nonce)
+            if self._slots is not None:
+                self._slots.release()
+        if tx_hash:
+            return
+        if nonce_taken(error):
+            self.pending.pop(nonce, None)
+            self._resync = True
+        elif rejected_before_send(error):
+            self.release(nonce)
+
+    def replaced(self, nonce):
+        """Whether a mined gap filler took this nonce, so nothing else sent
+        with it can ever land."""
+        return nonce in self.filled
+
+    async def _watch(self):
+        while self.pending:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.warning(f"Nonce check for {self.address} failed: {e}")
+
+    async def refill(self):
+        """Drop mined nonces and fill the gap holding back later ones."""
+        latest = await self.w3.eth.get_transaction_count(self.address, "latest")
+        now = time.monotonic()
+        async with self._lock:
+            if latest != self._latest:
+                self._latest, self._latest_since = latest, now
+            for nonce in [n for n in self.pending if n < latest]:
+                del self.pending[nonce]
+            self.released = [n for n in self.released if n >= latest]
+            heapq.heapify(self.released)
+            # Transactions sent from elsewhere, or before a restart
+            if self.next_nonce is not None and latest > self.next_nonce:
+                self.next_nonce = latest
+            if self.next_nonce is None or self.next_nonce <= latest + 1:
+                return  # nothing waits behind the chain's next nonce
+
+            waiting = max(self._latest_since, self.pending.get(latest, 0.0))
+            if latest not in self.released and now - waiting < self.stuck_seconds:
+                return
+            # The stuck nonce and the released ones right after it
+            gaps = [latest]
+            while gaps[-1] + 1 in self.released:
+                gaps.append(gaps[-1] + 1)
+            self.released = [n for n in self.released if n not in gaps]
+            heapq.heapify(self.released)
+            for nonce in gaps:
+                self.pending[nonce] = now
+
+        await asyncio.gather(*(self.fill(nonce) for nonce in gaps))
+
+    async def fill(self, nonce):
+        """Send a zero-value transfer to the signer with this nonce,
+        replacing whatever is stuck there. Returns the transaction hash if
+        the filler was mined."""
+        if self.private_key is None:
+            logger.warning(f"Nonce {nonce} is stuck but no key is set to fill it")
+            return None
+        fee = await self.w3.eth.gas_price * FILL_FEE_MULTIPLIER
+        signed = Account.sign_transaction(
+            {
+                "to": self.address,
+                "value": 0,
+                "gas": FILL_GAS,
+                "nonce": nonce,
+                "chainId": await self.w3.eth.chain_id,
+                "maxFeePerGas": fee,
+                "maxPriorityFeePerGas": fee,
+            },
+            self.private_key,
+        )
+        try:
+            tx_hash = await self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            tx_hash = tx_hash.hex().removeprefix("0x")
+        except Exception as e:
+            # Most likely the stuck transaction was mined after all
+            logger.warning(f"Could not fill nonce {nonce}: {e}")
+            return None
+        receipt = await self.chain.receipt(tx_hash)
+        if receipt is None:
+            logger.warning(f"Filler for nonce {nonce} (0x{tx_hash}) was not mined")
+            return None
+        self.filled[nonce] = tx_hash
+        print(f"Filled nonce gap {nonce} of {self.address} with 0x{tx_hash}")
+        return tx_hash
+
+    async def close(self):
+        """Stop the watcher task."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+def accepts_nonce(tool):
+    """Whether a tool's argument schema has a nonce argument."""
+    schema = tool.args_schema
+    if schema is None:
+        return False
+    if not isinstance(schema, dict):
+        schema = schema.model_json_schema()
+    return "nonce" in schema.get("properties", {})
+
+
+def require_nonce_argument(tools):
+    """Raise ValueError unless every tool takes a nonce argument.
+
+    A tool that drops the nonce signs with one of its own, so the local
+    bookkeeping, and the proof that a filled gap's mint never landed, would
+    no longer match what was sent.
+    """
+    missing = sorted({tool.name for tool in tools if not accepts_nonce(tool)})
+    if missing:
+        raise ValueError(
+            f"MANAGE_NONCES needs tools that take a nonce argument, "
+            f"but {', '.join(missing)} do not"
+        )
+
+
+def manage_nonces_from_env():
+    """Whether MANAGE_NONCES asks for locally allocated nonces."""
+    return os.getenv("MANAGE_NONCES", "").lower() in ("1", "true", "yes")
+
+
+def nonce_manager_from_env(chain, max_in_flight=None):
+    """A NonceManager for the WALLET_PRIVATE_KEY signer when MANAGE_NONCES is
+    set, else None."""
+    if not manage_nonces_from_env():
+        return None
+    if not os.getenv("WALLET_PRIVATE_KEY"):
+        logger.warning("MANAGE_NONCES is set but WALLET_PRIVATE_KEY is not")
+        return None
+    return NonceManager(chain, max_in_flight=max_in_flight)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from loguru import logger
+
+# Speculative calls nobody took within this long are dropped, e.g. those of
+# a thread that parked at review and was never resumed
+DEFAULT_TTL_SECONDS = 30 * 60
+
+
+def thread_id_from(config):
+    """The checkpointer thread a node is running in, if any."""
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+class Prefetcher:
+    """Runs LLM calls ahead of the nodes that need them, per workflow thread.
+
+    A speculative call is started under a name and a key (the inputs it was
+    made from). The node that needs it takes it back with the same key, and
+    gets None, meaning "call it yourself", if nothing matching was started
+    or the call failed.
+
+    Calls older than ttl seconds are cancelled and dropped; discard() drops
+    a thread's calls as soon as it is finished or forgotten.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+        # (thread_id, name) -> (key, task, started)
+        self.tasks = {}
+
+    def start(self, thread_id, name, key, factory):
+        """Start factory() in the background unless a matching call is running."""
+        if thread_id is None:
+            return
+        self.expire()
+        current = self.tasks.get((thread_id, name))
+        if current is not None:
+            if current[0] == key:
+                return
+            current[1].cancel()
+        self.tasks[(thread_id, name)] = (
+            key,
+            asyncio.create_task(factory()),
+            time.monotonic(),
+        )
+
+    async def take(self, thread_id, name, key, keep=False):
+        """Result of a speculative call, or None if the caller must run it.
+
+        With keep=True the result stays available, for nodes that are re-run
+        when one of their interrupts is resumed.
+        """
+        self.expire()
+        entry = self.tasks.get((thread_id, name))
+        if entry is None:
+            return None
+        entry_key, task, _ = entry
+        if entry_key != key or not keep:
+            del self.tasks[(thread_id, name)]
+        if entry_key != key:
+            task.cancel()
+            return None
+        try:
+            # Shielded, as expire() or discard() may cancel a kept call
+            # while it is awaited here
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # The caller itself was cancelled
+                if not keep:
+                    task.cancel()
+                raise
+            return None
+        except Exception as e:
+            self.tasks.pop((thread_id, name), None)
+            logger.warning(f"Speculative {name} call failed, running it again: {e}")
+            return None
+
+    def discard(self, thread_id):
+        """Cancel every speculative call of a thread, e.g. on image rejection."""
+        for task_key in [k for k in self.tasks if k[0] == thread_id]:
+            self.tasks.pop(task_key)[1].cancel()
+
+    def expire(self):
+        """Cancel and drop the calls started more than ttl seconds ago."""
+        cutoff = time.monotonic() - self.ttl
+        for task_key in [k for k, entry in self.tasks.items() if entry[2] < cutoff]:
+            self.tasks.pop(task_key)[1].cancel()
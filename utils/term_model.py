@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+
+DEFAULT_MODEL_PATH = ".cache/term_model.npz"
+DEFAULT_HISTORY_PATH = ".cache/terms_history.jsonl"
+
+# Hashed feature space; 1024 float32 weights per target keeps the model ~8 KiB
+FEATURE_DIM = 1024
+
+
+def tokenize(prompt, attributes=None):
+    """Prompt words and bigrams plus trait=value tokens from the metadata."""
+    words = re.findall(r"[a-z]{2,}", (prompt or "").lower())
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for attribute in attributes or []:
+        if isinstance(attribute, dict) and "trait_type" in attribute:
+            tokens.append(
+                f"attr:{attribute['trait_type']}={attribute.get('value')}".lower()
+            )
+    return tokens
+
+
+def hashed_features(tokens, dim=FEATURE_DIM):
+    """Sparse L2-normalized bag of tokens as {index: value}."""
+    # crc32 rather than hash(), which is salted per process
+    counts = {}
+    for token in tokens:
+        index = zlib.crc32(token.encode("utf-8")) % dim
+        counts[index] = counts.get(index, 0.0) + 1.0
+    norm = sum(value * value for value in counts.values()) ** 0.5
+    return {index: value / norm for index, value in counts.items()} if norm else {}
+
+
+def feature_matrix(records, dim=FEATURE_DIM):
+    matrix = np.zeros((len(records), dim), dtype=np.float64)
+    for row, record in enumerate(records):
+        tokens = tokenize(record.get("prompt"), record.get("attributes"))
+        for index, value in hashed_features(tokens, dim).items():
+            matrix[row, index] = value
+    return matrix
+
+
+class TermModel:
+    """Ridge regression for the revenue share and logistic regression for
+    derivatives, both over hashed prompt and attribute features."""
+
+    def __init__(self, rev_weights, rev_intercept, deriv_weights, deriv_intercept):
+        self.rev_weights = np.asarray(rev_weights, dtype=np.float32)
+        self.rev_intercept = float(rev_intercept)
+        self.deriv_weights = np.asarray(deriv_weights, dtype=np.float32)
+        self.deriv_intercept = float(deriv_intercept)
+        self.dim = len(self.rev_weights)
+
+    @classmethod
+    def fit(cls, records, dim=FEATURE_DIM, l2=1.0, iterations=300, learning_rate=2.0):
+        """Train on accepted-terms records (prompt, attributes and both terms)."""
+        if not records:
+            raise ValueError("No accepted terms to train on")
+        features = feature_matrix(records, dim)
+        rev_share = np.array(
+            [float(r["commercial_rev_share"]) for r in records], dtype=np.float64
+        )
+        derivatives = np.array(
+            [1.0 if r["derivatives_allowed"] else 0.0 for r in records],
+            dtype=np.float64,
+        )
+
+        # Ridge on the centred share; the dual form only inverts an n x n
+        # matrix, which is the small side for any realistic history
+        rev_intercept = rev_share.mean()
+        centred = rev_share - rev_intercept
+        if len(records) <= dim:
+            gram = features @ features.T + l2 * np.eye(len(records))
+            rev_weights = features.T @ np.linalg.solve(gram, centred)
+        else:
+            gram = features.T @ features + l2 * np.eye(dim)
+            rev_weights = np.linalg.solve(gram, features.T @ centred)
+
+        # L2-regularized logistic regression by batch gradient descent
+        deriv_weights = np.zeros(dim)
+        deriv_intercept = 0.0
+        for _ in range(iterations):
+            logits = features @ deriv_weights + deriv_intercept
+            error = 1.0 / (1.0 + np.exp(-logits)) - derivatives
+            deriv_weights -= learning_rate * (
+                features.T @ error / len(records) + l2 * deriv_weights / len(records)
+            )
+            deriv_intercept -= learning_rate * error.mean()
+
+        return cls(rev_weights, rev_intercept, deriv_weights, deriv_intercept)
+
+    def predict(self, prompt, attributes=None):
+        """Suggested terms for a prompt; a few microseconds, no LLM call."""
+        features = hashed_features(tokenize(prompt, attributes), self.dim)
+        rev_share = self.rev_intercept
+        logit = self.deriv_intercept
+        for index, value in features.items():
+            rev_share += float(self.rev_weights[index]) * value
+            logit += float(self.deriv_weights[index]) * value
+        return {
+            "commercial_rev_share": int(round(min(max(rev_share, 0.0), 100.0))),
+            "derivatives_allowed": logit >= 0.0,
+        }
+
+    def save(self, path=None):
+        path = Path(path or os.getenv("TERM_MODEL_PATH", DEFAULT_MODEL_PATH))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # np.savez appends .npz when it is missing, so write through a handle
+        with path.open("wb") as f:
+            np.savez_compressed(
+                f,
+                rev_weights=self.rev_weights,
+                rev_intercept=self.rev_intercept,
+                deriv_weights=self.deriv_weights,
+                deriv_intercept=self.deriv_intercept,
+            )
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        """Load a saved model, or return None if there is none yet."""
+        path = Path(path or os.getenv("TERM_MODEL_PATH", DEFAULT_MODEL_PATH))
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                data["rev_weights"],
+                data["rev_intercept"],
+                data["deriv_weights"],
+                data["deriv_intercept"],
+            )
+
+
+def history_path(path=None):
+    return Path(path or os.getenv("TERMS_HISTORY_PATH", DEFAULT_HISTORY_PATH))
+
+
+def record_accepted_terms(prompt, attributes, terms, path=None):
+    """Append terms a user accepted to the training history."""
+    path = history_path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        "prompt": prompt,
+        "attributes": attributes or [],
+        "commercial_rev_share": terms["commercial_rev_share"],
+        "derivatives_allowed": terms["derivatives_allowed"],
+    }
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_history(path=None):
+    """Accepted-terms records, skipping lines that do not parse."""
+    path = history_path(path)
+    if not path.exists():
+        return []
+    records = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "commercial_rev_share" in record and "derivatives_allowed" in record:
+                records.append(record)
+    return records
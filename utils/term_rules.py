@@ -0,0 +1,95 @@
+import re
+
+
+# Feedback for revenue share bands outside the reasonable 5-50% range, the
+# same thresholds the interactive negotiation uses to ask for adjustments
+REV_SHARE_ADVICE = {
+    "low": "This may undervalue the work; most digital art asks for 5-20%.",
+    "very high": "A share above 50% is likely to discourage commercial use.",
+    "prohibitive": "A share above 80% will probably prevent any commercial adoption.",
+}
+
+# Default terms per artwork category, matched on words of the prompt in order.
+# Brand marks are protected from derivatives; characters and unique pieces
+# command a higher share; everything else gets the usual 15% with remixing.
+CATEGORY_RULES = [
+    {
+        "category": "brand",
+        "keywords": ["logo", "brand", "emblem", "mascot", "wordmark", "icon"],
+        "commercial_rev_share": 20,
+        "derivatives_allowed": False,
+    },
+    {
+        "category": "character",
+        "keywords": ["character", "portrait", "hero", "avatar", "creature"],
+        "commercial_rev_share": 20,
+        "derivatives_allowed": True,
+    },
+    {
+        "category": "photo",
+        "keywords": ["photo", "photograph", "realistic", "landscape", "texture"],
+        "commercial_rev_share": 10,
+        "derivatives_allowed": True,
+    },
+]
+
+DEFAULT_RULE = {
+    "category": "general",
+    "commercial_rev_share": 15,
+    "derivatives_allowed": True,
+}
+
+
+class TermRules:
+    """Deterministic licensing terms: category defaults and rev-share bands."""
+
+    def __init__(self, category_rules=None, default_rule=None):
+        self.category_rules = category_rules or CATEGORY_RULES
+        self.default_rule = default_rule or DEFAULT_RULE
+
+    def categorize(self, prompt):
+        """The first category whose keywords appear in the prompt."""
+        words = set(re.findall(r"[a-z]+", (prompt or "").lower()))
+        for rule in self.category_rules:
+            if words.intersection(rule["keywords"]):
+                return rule
+        return self.default_rule
+
+    def recommend(self, prompt):
+        """Default terms for a prompt."""
+        rule = self.categorize(prompt)
+        return {
+            "commercial_rev_share": rule["commercial_rev_share"],
+            "derivatives_allowed": rule["derivatives_allowed"],
+            "category": rule["category"],
+        }
+
+    @staticmethod
+    def evaluate(commercial_rev_share):
+        """Band of a revenue share and whether it deserves feedback."""
+        if commercial_rev_share < 5:
+            band = "low"
+        elif commercial_rev_share <= 30:
+            band = "typical"
+        elif commercial_rev_share <= 50:
+            band = "high"
+        elif commercial_rev_share <= 80:
+            band = "very high"
+        else:
+            band = "prohibitive"
+        advice = REV_SHARE_ADVICE.get(band)
+        return {"band": band, "advice": advice, "suggests_changes": advice is not None}
+
+    def apply(self, prompt, requested=None):
+        """Final terms: requested values where valid, category defaults otherwise."""
+        terms = self.recommend(prompt)
+        requested = requested or {}
+
+        rev_share = requested.get("commercial_rev_share")
+        if isinstance(rev_share, (int, float)) and 0 <= rev_share <= 100:
+            terms["commercial_rev_share"] = rev_share
+        if isinstance(requested.get("derivatives_allowed"), bool):
+            terms["derivatives_allowed"] = requested["derivatives_allowed"]
+
+        terms.update(self.evaluate(terms["commercial_rev_share"]))
+        return terms
@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+
+from loguru import logger
+
+from graph.workflow import create_workflow_graph
+from tools.ipfs_tools import get_ipfs_tools, get_specific_tools
+from tools.mcp_pool import MCPSessionPool
+from tools.signer_pool import SignerPool
+from utils.batch import run_row
+from utils.chain import ChainClient
+from utils.helpers import create_memory_saver
+from utils.interrupts import COMPLETED, ERROR, InterruptDispatcher, PolicyResponder
+from utils.llm_cache import DiskLLMCache
+from utils.metrics import node_metrics
+from utils.nonces import nonce_manager_from_env
+
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+# How often the supervisor checks that its workers are alive
+MONITOR_SECONDS = 0.5
+# How long close() waits for a worker to finish before killing it
+STOP_SECONDS = 30
+
+
+def route(thread_id, workers):
+    """The worker a thread belongs to, by rendezvous hashing.
+
+    Every thread_id maps to the same worker as long as that worker is
+    alive; when one dies only its threads move, spread over the others.
+    """
+    if not workers:
+        raise RuntimeError("No worker processes are alive")
+    return max(
+        workers,
+        key=lambda worker: hashlib.sha1(f"{worker}:{thread_id}".encode()).digest(),
+    )
+
+
+@asynccontextmanager
+async def workflow_graph(index, workers, options):
+    """Build a worker's graph the way batch_agent does.
+
+    Each worker starts its own MCP session pool and takes every workers-th
+    key of WALLET_PRIVATE_KEYS, so no signer is shared between processes.
+    Nonces of one signer cannot be allocated from several processes, so
+    MANAGE_NONCES only applies to a single worker. Checkpoints, the LLM
+    cache and the mint ledger are SQLite files shared by all workers.
+    """
+    mcp_sessions = options.get("mcp_sessions", 4)
+    chain = ChainClient.from_env()
+    nonces = None
+    keys = [
+        key.strip()
+        for key in os.getenv("WALLET_PRIVATE_KEYS", "").split(",")
+        if key.strip()
+    ][index::workers]
+
+    async with AsyncExitStack() as stack:
+        pool = await stack.enter_async_context(
+            MCPSessionPool(
+                size=mcp_sessions,
+                **{
+                    name: options[f"mcp_{name}"]
+                    for name in ("command", "args", "env")
+                    if f"mcp_{name}" in options
+                },
+            )
+        )
+        memory = stack.enter_context(create_memory_saver())
+        signers = None
+        if keys:
+            signers = await stack.enter_async_context(
+                SignerPool(
+                    keys,
+                    chain,
+                    sessions_per_signer=options.get("sessions_per_signer", 2),
+                )
+            )
+        elif workers == 1:
+            nonces = nonce_manager_from_env(chain, max_in_flight=mcp_sessions)
+            if nonces is not None:
+                stack.push_async_callback(nonces.close)
+        elif os.getenv("MANAGE_NONCES"):
+            logger.warning(
+                f"Worker {index}: MANAGE_NONCES is ignored with several workers; "
+                "set WALLET_PRIVATE_KEYS to give each worker its own signers"
+            )
+
+        yield create_workflow_graph(
+            get_specific_tools(await get_ipfs_tools(pool)),
+            memory=memory,
+            num_candidates=options.get("candidates", 1),
+            llm_cache=DiskLLMCache(),
+            negotiation="rules",
+            chain=chain,
+            # False keeps create_workflow_graph from reading MANAGE_NONCES
+            nonces=nonces or False,
+            signers=signers,
+        )
+
+
+def worker_main(index, workers, inbox, outbox, build, options):
+    """Entry point of a worker process."""
+    asyncio.run(_serve(index, workers, inbox, outbox, build, options))
+
+
+async def _serve(index, workers, inbox, outbox, build, options):
+    defaults = options.get("defaults")
+    prune_finished = options.get("prune_finished", True)
+    semaphore = asyncio.Semaphore(options.get("concurrency", 8))
+    tasks = set()
+
+    async with build(index, workers, options) as graph:
+
+        async def run_one(thread_id, row):
+            async with semaphore:
+                try:
+                    # Checkpoints are only deleted once the result is sent,
+                    # so a worker taking over never runs a thread twice
+                    record = await run_row(
+                        graph, row, defaults, False, dispatcher, thread_id
+                    )
+                except Exception as e:
+                    record = {
+                        "id": row["id"],
+                        "prompt": row.get("prompt"),
+                        "thread_id": thread_id,
+                        "status": ERROR,
+                        "error": str(e),
+                    }
+            record["worker"] = index
+            # The thread's node metrics go along, for the supervisor to merge
+            outbox.put(("result", index, record, node_metrics.pop_thread(thread_id)))
+            if prune_finished and record["status"] in (COMPLETED, "failed"):
+                try:
+                    await graph.checkpointer.adelete_thread(thread_id)
+                except Exception as e:
+                    logger.warning(
+                        f"Could not delete the checkpoints of {thread_id}: {e}"
+                    )
+
+        async with InterruptDispatcher(graph, PolicyResponder()) as dispatcher:
+            outbox.put(("ready", index, None))
+            while (message := await asyncio.to_thread(inbox.get)) is not None:
+                task = asyncio.create_task(run_one(*message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+
+
+class WorkerPool:
+    """Runs manifest rows on worker processes, each with its own graph.
+
+    build(index, workers, options) is an async context manager yielding a
+    worker's compiled graph (workflow_graph by default); it and options
+    must be picklable, as workers are spawned, not forked. Rows are routed
+    to workers by thread_id with route(). Workers share the SQLite
+    checkpointer, so when one dies its unfinished threads are sent to the
+    workers left and carry on from their last checkpoint. Each result
+    brings the thread's node metrics, merged into node_metrics here.
+    """
+
+    def __init__(self, workers=None, build=workflow_graph, options=None):
+        self.workers = workers or DEFAULT_WORKERS
+        self.build = build
+        self.options = options or {}
+        self.processes = {}
+        self.takeovers = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes = {}
+        self._outbox = self._context.Queue()
+        # thread_id -> (worker, row) until the thread's result comes back
+        self._assigned = {}
+        # Workers alive when results() last looked
+        self._alive = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Spawn the workers and wait until each has built its graph."""
+        for index in range(self.workers):
+            inbox = self._context.Queue()
+            process = self._context.Process(
+                target=worker_main,
+                args=(
+                    index,
+                    self.workers,
+                    inbox,
+                    self._outbox,
+                    self.build,
+                    self.options,
+                ),
+                name=f"story-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes[index] = inbox
+            self.processes[index] = process
+
+        ready = set()
+        while len(ready) < self.workers:
+            message = await self._receive()
+            if message is not None and message[0] == "ready":
+                ready.add(message[1])
+            elif message is None and len(self.alive()) < self.workers:
+                raise RuntimeError("A worker process died while starting")
+        self._alive = self.workers
+
+    async def close(self):
+        """Let every worker finish its threads, then stop it."""
+        for index in self.alive():
+            self._inboxes[index].put(None)
+        for process in self.processes.values():
+            await asyncio.to_thread(process.join, STOP_SECONDS)
+            if process.is_alive():
+                process.kill()
+
+    def alive(self):
+        return [index for index, p in self.processes.items() if p.is_alive()]
+
+    def submit(self, row, thread_id=None):
+        """Send a row to the worker its thread belongs to."""
+        thread_id = thread_id or str(uuid.uuid4())
+        worker = route(thread_id, self.alive())
+        self._assigned[thread_id] = (worker, row)
+        self._inboxes[worker].put((thread_id, row))
+        return thread_id
+
+    async def results(self):
+        """Yield result records until every submitted row has one.
+
+        Threads of a worker that died are handed to the workers left.
+        """
+        while self._assigned:
+            # Checked before every message, not only when the outbox falls
+            # quiet: the workers left keep sending results meanwhile
+            alive = self.alive()
+            if len(alive) < self._alive:
+                self._alive = len(alive)
+                self._take_over(alive)
+            message = await self._receive()
+            if message is not None and message[0] == "result":
+                record = message[2]
+                node_metrics.merge(message[3])
+                if self._assigned.pop(record["thread_id"], None) is not None:
+                    yield record
+
+    async def _receive(self):
+        try:
+            return await asyncio.to_thread(self._outbox.get, True, MONITOR_SECONDS)
+        except queue.Empty:
+            return None
+
+    def _take_over(self, alive):
+        for thread_id, (worker, row) in list(self._assigned.items()):
+            if worker not in alive:
+                new_worker = route(thread_id, alive)
+                logger.warning(
+                    f"Worker {worker} died; thread {thread_id} moves to "
+                    f"worker {new_worker}"
+                )
+                self._assigned[thread_id] = (new_worker, row)
+                self._inboxes[new_worker].put((thread_id, row))
+                self.takeovers += 1
+
+
+async def run_sharded_batch(
+    rows, output_path, workers=None, build=workflow_graph, options=None
+):
+    """Run one workflow thread per row on a WorkerPool, like run_batch."""
+    output_path = Path(output_path)
+    results = []
+    started = time.perf_counter()
+
+    async with WorkerPool(workers, build, options) as pool:
+        print(f"Started {pool.workers} workers in {time.perf_counter() - started:.1f}s")
+        for row in rows:
+            pool.submit(row)
+        with output_path.open("a", encoding="utf-8") as output:
+            async for record in pool.results():
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                results.append(record)
+                print(
+                    f"[{record['id']}] {record['status']} on worker "
+                    f"{record['worker']} in {record.get('total_seconds', 0)}s"
+                )
+
+    return results